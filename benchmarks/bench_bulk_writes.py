@@ -0,0 +1,71 @@
+"""
+Benchmark de la creación de snippets uno a uno frente a create_snippets.
+
+Crea N snippets (2k por defecto) con dos tags y una variable cada uno en una
+base de datos en disco vacía, con ``create_snippet`` en bucle (una transacción
+por snippet) y con ``create_snippets`` (una transacción con executemany).
+
+Uso:
+    python benchmarks/bench_bulk_writes.py [--count 2000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.database import Database  # noqa: E402
+from core.models import Snippet  # noqa: E402
+from core.snippet_manager import SnippetManager  # noqa: E402
+
+
+def make_items(count: int) -> list[dict]:
+    """``count`` snippets sintéticos como los que envía un script de aprovisionamiento."""
+    return [
+        {
+            "name": f"Snippet {i}",
+            "abbreviation": f";s{i}",
+            "tags": ["equipo", "soporte"],
+            "content_text": f"Hola {{{{nombre}}}}, respuesta {i}",
+            "variables": [{"key": "nombre", "label": "Nombre"}],
+        }
+        for i in range(count)
+    ]
+
+
+def run(tmp: str, label: str, count: int, write) -> float:
+    """ms que tarda ``write(manager, items)`` sobre una base de datos nueva."""
+    manager = SnippetManager(Database(os.path.join(tmp, f"{label}.db")))
+    manager.db.get_session().close()  # Esquema y datos por defecto fuera de la medida
+    items = make_items(count)
+    start = time.perf_counter()
+    write(manager, items)
+    elapsed = (time.perf_counter() - start) * 1000
+    manager.wait_for_expansion_snapshot()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=2_000)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run(
+            tmp, "loop", options.count,
+            lambda manager, items: [manager.create_snippet(Snippet(**item)) for item in items],
+        )
+        after = run(tmp, "bulk", options.count, lambda manager, items: manager.create_snippets(items))
+
+    print(f"{options.count} snippets con 2 tags y 1 variable")
+    print(f"{'camino':<28}{'total ms':>10}{'µs/snippet':>12}")
+    for label, ms in (("create_snippet en bucle", before), ("create_snippets", after)):
+        print(f"{label:<28}{ms:>10.1f}{ms * 1000 / options.count:>12.1f}")
+    print(f"Aceleración: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
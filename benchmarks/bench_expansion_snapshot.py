@@ -0,0 +1,110 @@
+"""
+Benchmark del arranque en frío hasta la respuesta de la primera expansión.
+
+Lanza ``python_backend.py expand_snippet`` como proceso nuevo sobre una base de
+datos con N snippets (5k por defecto), con la instantánea de expansiones al día
+y sin ella (el backend carga entonces SQLAlchemy, Pydantic y el índice).
+
+Uso:
+    python benchmarks/bench_expansion_snapshot.py [--count 5000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import suppress
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.database import Database  # noqa: E402
+from core.models import SnippetDB, SnippetVariableDB  # noqa: E402
+from core.snippet_manager import SnippetManager  # noqa: E402
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..", "electron-app", "python_backend.py")
+
+
+def populate(db: Database, count: int) -> None:
+    """Insertar ``count`` snippets sintéticos con abreviatura."""
+    now = datetime.now()
+    snippets = [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Snippet {i}",
+            "abbreviation": f";s{i}",
+            "snippet_type": "text",
+            "content_text": f"Hola {{{{nombre}}}}, texto del snippet {i}",
+            "scope_type": "global",
+            "enabled": True,
+            "usage_count": i % 7,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+    with db.get_session() as session:
+        session.query(SnippetVariableDB).delete()
+        session.query(SnippetDB).delete()
+        session.execute(SnippetDB.__table__.insert(), snippets)
+        session.commit()
+
+
+def median_ms(func, repeat: int) -> float:
+    """Mediana de los ms que devuelven ``repeat`` ejecuciones."""
+    return statistics.median(func() for _ in range(repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        os.makedirs(os.path.join(home, ".aparetext"))
+        db = Database(os.path.join(home, ".aparetext", "aparetext.db"))
+        populate(db, options.count)
+        manager = SnippetManager(db)
+        request = json.dumps({"abbreviation": f";s{options.count // 2}", "variables": {"nombre": "Ana"}})
+        env = {**os.environ, "HOME": home, "PYTHONUNBUFFERED": "1"}
+
+        def first_expansion() -> float:
+            """ms hasta la respuesta: después el proceso aún registra el uso con el ORM."""
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, BACKEND, "expand_snippet", request], env=env, stdout=subprocess.PIPE, text=True
+            )
+            line = process.stdout.readline()
+            elapsed = (time.perf_counter() - start) * 1000
+            process.wait()
+            process.stdout.close()
+            assert json.loads(line)["expanded"].startswith("Hola Ana"), line
+            return elapsed
+
+        # El registro de uso no mueve la generación: la instantánea sigue al día
+        manager.refresh_expansion_snapshot(force=True)
+        with_snapshot = median_ms(first_expansion, options.repeat)
+        size = os.path.getsize(db.expansions_path)
+
+        def without_snapshot() -> float:
+            with suppress(FileNotFoundError):
+                os.remove(db.expansions_path)
+            return first_expansion()
+
+        before = median_ms(without_snapshot, options.repeat)
+
+    print(f"{options.count} snippets, instantánea de {size / 1024:.0f} KiB, mediana de {options.repeat} procesos")
+    print(f"{'camino':<24}{'ms':>10}")
+    for label, ms in (("ORM (antes)", before), ("instantánea", with_snapshot)):
+        print(f"{label:<24}{ms:>10.1f}")
+    print(f"Aceleración: x{before / with_snapshot:.1f}")
+
+
+if __name__ == "__main__":
+    main()
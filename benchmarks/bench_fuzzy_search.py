@@ -0,0 +1,71 @@
+"""
+Benchmark de la búsqueda fuzzy de la paleta.
+
+Mide la latencia por pulsación de FuzzyIndex.search (sin hidratar snippets)
+tecleando varias consultas letra a letra sobre N snippets (50k por defecto).
+
+Uso:
+    python benchmarks/bench_fuzzy_search.py [--count 50000] [--limit 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.fuzzy import FuzzyIndex  # noqa: E402
+
+from bench_search_index import TAGS, WORDS  # noqa: E402
+
+QUERIES = ["firma", "fct12", "reunion client", "soporte", "zq", "agenda 4999"]
+
+
+def build_index(count: int, seed: int = 42) -> FuzzyIndex:
+    """Índice con ``count`` snippets sintéticos y un uso de cola larga."""
+    rng = random.Random(seed)
+    index = FuzzyIndex(("name", "abbreviation", "tags"))
+    for i in range(count):
+        name_words = rng.sample(WORDS, 3)
+        index.add(
+            str(i),
+            (
+                f"{' '.join(name_words).capitalize()} {i}",
+                f";{name_words[0][:4]}{i}",
+                ",".join(rng.sample(TAGS, rng.randint(0, 3))) or None,
+            ),
+            usage_count=int(rng.paretovariate(1.5)) - 1,
+            enabled=rng.random() > 0.1,
+        )
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=20)
+    options = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(options.count)
+    print(f"Índice de {options.count} snippets en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    index.search("e", limit=options.limit)  # Orden por uso (se calcula una vez por cambio)
+
+    print(f"\n{'consulta':<18}{'mediana ms':>12}{'máx ms':>10}  mejor resultado")
+    for query in QUERIES:
+        samples = []
+        matches = []
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            matches = index.search(query[:end], limit=options.limit)
+            samples.append((time.perf_counter() - start) * 1000)
+        best = f"{matches[0].field}={matches[0].positions}" if matches else "-"
+        print(f"{query!r:<18}{statistics.median(samples):>12.2f}{max(samples):>10.2f}  {best}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark de la conversión de filas SnippetDB a modelos Pydantic.
+
+Compara la construcción validada (``Snippet(...)``, el camino anterior y el que
+siguen usando los datos de la API) con la hidratación de confianza de
+``SnippetManager._db_to_pydantic`` (``construct_trusted``) sobre N filas ya
+cargadas, con una variable cada una (10k por defecto).
+
+Uso:
+    python benchmarks/bench_hydration.py [--count 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy.orm import selectinload, undefer_group  # noqa: E402
+
+from core.database import Database  # noqa: E402
+from core.models import Snippet, SnippetDB, SnippetVariable, SnippetVariableDB  # noqa: E402
+from core.snippet_manager import SnippetManager  # noqa: E402
+
+
+def populate(db: Database, count: int) -> None:
+    """Insertar ``count`` snippets sintéticos con una variable cada uno."""
+    now = datetime.now()
+    snippets, variables = [], []
+    for i in range(count):
+        snippet_id = str(uuid.uuid4())
+        snippets.append({
+            "id": snippet_id,
+            "name": f"Snippet {i}",
+            "abbreviation": f";s{i}",
+            "tags": "work,email",
+            "snippet_type": "text",
+            "content_text": f"Hola {{{{nombre}}}}, texto del snippet {i}",
+            "scope_type": "domains",
+            "scope_values": json.dumps(["example.com", "mail.google.com"]),
+            "caret_marker": "{{|}}",
+            "enabled": True,
+            "usage_count": i % 7,
+            "created_at": now,
+            "updated_at": now,
+        })
+        variables.append({
+            "id": str(uuid.uuid4()),
+            "snippet_id": snippet_id,
+            "key": "nombre",
+            "label": "Nombre",
+            "type": "text",
+            "required": False,
+        })
+
+    with db.get_session() as session:
+        session.query(SnippetVariableDB).delete()
+        session.query(SnippetDB).delete()
+        session.execute(SnippetDB.__table__.insert(), snippets)
+        session.execute(SnippetVariableDB.__table__.insert(), variables)
+        session.commit()
+
+
+def validated(manager: SnippetManager, snippet_db: SnippetDB) -> Snippet:
+    """Conversión con validación completa (la de antes)."""
+    return Snippet(
+        id=snippet_db.id,
+        name=snippet_db.name,
+        abbreviation=snippet_db.abbreviation,
+        snippet_type=snippet_db.snippet_type,
+        tags=manager._string_to_tags(snippet_db.tags),
+        category=snippet_db.category,
+        content_text=snippet_db.content_text,
+        content_html=snippet_db.content_html,
+        is_rich=snippet_db.is_rich,
+        image_data=snippet_db.image_data,
+        thumbnail=snippet_db.thumbnail,
+        scope_type=snippet_db.scope_type,
+        scope_values=json.loads(snippet_db.scope_values) if snippet_db.scope_values else [],
+        caret_marker=snippet_db.caret_marker,
+        variables=[
+            SnippetVariable(
+                id=var.id,
+                snippet_id=var.snippet_id,
+                key=var.key,
+                label=var.label,
+                type=var.type,
+                placeholder=var.placeholder,
+                default_value=var.default_value,
+                required=var.required,
+                regex=var.regex,
+                options=json.loads(var.options) if var.options else None,
+            )
+            for var in snippet_db.variables
+        ],
+        usage_count=snippet_db.usage_count,
+        enabled=snippet_db.enabled,
+        created_at=snippet_db.created_at,
+        updated_at=snippet_db.updated_at,
+    )
+
+
+def time_ms(func, repeat: int) -> float:
+    """Mediana en ms de ``repeat`` ejecuciones."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        populate(db, options.count)
+        manager = SnippetManager(db)
+
+        with db.get_session() as session:
+            rows = (
+                session.query(SnippetDB)
+                .options(selectinload(SnippetDB.variables), undefer_group("media"))
+                .all()
+            )
+
+            # Misma salida por ambos caminos
+            assert validated(manager, rows[0]) == manager._db_to_pydantic(rows[0])
+
+            before = time_ms(lambda: [validated(manager, row) for row in rows], options.repeat)
+            after = time_ms(lambda: [manager._db_to_pydantic(row) for row in rows], options.repeat)
+
+    print(f"{len(rows)} filas ya cargadas, mediana de {options.repeat} ejecuciones")
+    print(f"{'camino':<24}{'total ms':>10}{'µs/fila':>10}")
+    for label, ms in (("validado (antes)", before), ("de confianza", after)):
+        print(f"{label:<24}{ms:>10.1f}{ms * 1000 / len(rows):>10.2f}")
+    print(f"Aceleración: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
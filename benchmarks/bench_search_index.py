@@ -0,0 +1,103 @@
+"""
+Benchmark de search_snippets: índice de trigramas frente a ilike.
+
+Crea una base de datos temporal con N snippets (100k por defecto) y mide la
+construcción del índice y la latencia de varias consultas por ambos caminos.
+
+Uso:
+    python benchmarks/bench_search_index.py [--count 100000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.database import Database  # noqa: E402
+from core.models import SnippetDB, SnippetVariableDB  # noqa: E402
+from core.snippet_manager import SnippetManager  # noqa: E402
+
+WORDS = [
+    "email", "firma", "reunión", "informe", "cliente", "factura", "saludo", "pedido",
+    "respuesta", "soporte", "agenda", "contrato", "oferta", "recordatorio", "proyecto",
+]
+TAGS = ["work", "personal", "sales", "support", "dev", "legal", "hr", "misc"]
+QUERIES = ["fi", "firma", "client", "factura 12", "zzz", "soporte agenda"]
+
+
+def populate(db: Database, count: int, seed: int = 42) -> None:
+    """Insertar ``count`` snippets sintéticos en bloque."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    rows = []
+    for i in range(count):
+        name_words = rng.sample(WORDS, 3)
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "name": f"{' '.join(name_words)} {i}",
+            "abbreviation": f";{name_words[0][:4]}{i}",
+            "tags": ",".join(rng.sample(TAGS, rng.randint(0, 3))),
+            "content_type": "text",
+            "content_text": f"Texto del snippet {i}",
+            "scope_type": "global",
+            "enabled": rng.random() > 0.1,
+            "usage_count": 0,
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    with db.get_session() as session:
+        session.query(SnippetVariableDB).delete()
+        session.query(SnippetDB).delete()
+        session.execute(SnippetDB.__table__.insert(), rows)
+        session.commit()
+
+
+def time_ms(func, repeat: int) -> tuple[float, int]:
+    """Mediana en ms de ``repeat`` ejecuciones y tamaño del último resultado."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(result)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        populate(db, options.count)
+        print(f"{options.count} snippets insertados en {time.perf_counter() - start:.1f} s")
+
+        indexed = SnippetManager(db)
+        plain = SnippetManager(db, use_search_index=False)
+
+        start = time.perf_counter()
+        with db.get_session() as session, indexed._search_index.use(session):
+            pass
+        print(f"Construcción del índice: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        print(f"\n{'consulta':<18}{'ilike ms':>10}{'índice ms':>11}{'resultados':>12}")
+        for query in QUERIES:
+            sql_ms, sql_count = time_ms(lambda: plain.search_snippets(query), options.repeat)
+            index_ms, index_count = time_ms(lambda: indexed.search_snippets(query), options.repeat)
+            assert sql_count == index_count, query
+            print(f"{query!r:<18}{sql_ms:>10.1f}{index_ms:>11.1f}{index_count:>12}")
+
+
+if __name__ == "__main__":
+    main()
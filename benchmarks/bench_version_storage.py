@@ -0,0 +1,83 @@
+"""
+Benchmark del espacio que ocupa el historial de versiones antes y después de compactar.
+
+Crea N snippets (200 por defecto) con ~4 KB de HTML y les aplica E ediciones
+pequeñas (30 por defecto), cada una con su versión completa. Después mide los
+bytes de snippet_versions, compacta con ``compact_versions`` (sin retención,
+solo deltas) y vuelve a medir. Mide también lo que tarda en reconstruirse el
+historial de un snippet.
+
+Uso:
+    python benchmarks/bench_version_storage.py [--count 200] [--edits 30]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.database import Database  # noqa: E402
+from core.snippet_manager import SnippetManager  # noqa: E402
+from core.versions import VersionRetention  # noqa: E402
+
+
+def table_bytes(db_path: str) -> int:
+    """Bytes de snippet_versions y snippet_version_variables (dbstat, tras VACUUM)."""
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("VACUUM")
+        return connection.execute(
+            "SELECT sum(pgsize) FROM dbstat WHERE name IN ('snippet_versions', 'snippet_version_variables')"
+        ).fetchone()[0]
+
+
+def paragraph(snippet: int, edit: int) -> str:
+    """Párrafo HTML del snippet; cada edición cambia una frase."""
+    sentences = [f"<p>Frase {i} del snippet {snippet}, con texto de relleno para el cuerpo.</p>" for i in range(50)]
+    sentences[edit % 50] = f"<p>Frase editada en la versión {edit}.</p>"
+    return "\n".join(sentences)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=30)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "versions.db")
+        manager = SnippetManager(Database(path), compact_versions=False)
+        items = [
+            {"id": f"s{i}", "name": f"Snippet {i}", "content_html": paragraph(i, 0), "is_rich": True,
+             "variables": [{"key": "nombre"}]}
+            for i in range(options.count)
+        ]
+        manager.create_snippets(items)
+        for edit in range(1, options.edits + 1):
+            for index, item in enumerate(items):
+                item["content_html"] = paragraph(index, edit)
+            manager.upsert_snippets(items)
+
+        before = table_bytes(path)
+        start = time.perf_counter()
+        stats = manager.compact_versions(retention=VersionRetention(keep_last=0))
+        compact_ms = (time.perf_counter() - start) * 1000
+        after = table_bytes(path)
+
+        start = time.perf_counter()
+        history = manager.get_snippet_versions("s0")
+        read_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{options.count} snippets x {options.edits} ediciones ({stats['rewritten']} versiones recodificadas)")
+    print(f"{'historial':<24}{'KiB':>10}")
+    for label, size in (("versiones completas", before), ("deltas + keyframes", after)):
+        print(f"{label:<24}{size / 1024:>10.0f}")
+    print(f"Reducción: x{before / after:.1f}; compactar {compact_ms:.0f} ms; "
+          f"leer {len(history)} versiones de un snippet {read_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
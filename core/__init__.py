@@ -2,21 +2,46 @@
 ApareText Core Module
 
 Motor central de snippets, parser de plantillas y gestión de base de datos.
+
+Los submódulos se importan bajo demanda: ``import core`` o
+``from core.template_parser import TemplateParser`` no cargan SQLAlchemy ni
+Pydantic. Solo se pagan cuando se usa algo que los necesita.
 """
 
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 __version__ = "0.1.0"
 
-from core.models import Snippet, SnippetVariable, Settings
-from core.database import Database, get_db
-from core.snippet_manager import SnippetManager
-from core.template_parser import TemplateParser
-
-__all__ = [
-    "Snippet",
-    "SnippetVariable",
-    "Settings",
-    "Database",
-    "get_db",
-    "SnippetManager",
-    "TemplateParser",
-]
+# Nombre público -> submódulo que lo define
+_LAZY_EXPORTS = {
+    "Snippet": "core.models",
+    "SnippetVariable": "core.models",
+    "Settings": "core.models",
+    "Database": "core.database",
+    "get_db": "core.database",
+    "SnippetManager": "core.snippet_manager",
+    "TemplateParser": "core.template_parser",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+if TYPE_CHECKING:
+    from core.database import Database, get_db
+    from core.models import Settings, Snippet, SnippetVariable
+    from core.snippet_manager import SnippetManager
+    from core.template_parser import TemplateParser
+
+
+def __getattr__(name: str):
+    """Importar el submódulo que define ``name`` en el primer acceso."""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'core' has no attribute '{name}'")
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value  # Los siguientes accesos no pasan por __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,152 @@
+"""
+Trie de abreviaturas para la expansión al teclear.
+
+Las abreviaturas se guardan invertidas: recorrer el buffer tecleado desde el
+final baja por el trie, así la abreviatura más larga que termina en el cursor se
+encuentra en O(longitud de la abreviatura) sin consultar la base de datos.
+"""
+
+from typing import NamedTuple, Optional, Sequence
+
+from core.scopes import scope_matches
+
+
+class AbbreviationMatch(NamedTuple):
+    """Abreviatura encontrada al final del buffer."""
+
+    snippet_id: str
+    abbreviation: str
+
+
+class AbbreviationTarget(NamedTuple):
+    """Snippet al que apunta una abreviatura, con su scope."""
+
+    snippet_id: str
+    scope_type: str
+    scope_values: tuple[str, ...]
+
+
+class AbbreviationTrie:
+    """Trie de abreviaturas invertidas de los snippets habilitados."""
+
+    def __init__(self):
+        self._root: dict = {}
+        self._abbreviations: dict[str, str] = {}  # snippet_id -> abbreviation
+        self.max_length = 0  # Cota superior: cuánto buffer hace falta conservar
+
+    def __len__(self) -> int:
+        return len(self._abbreviations)
+
+    def __contains__(self, snippet_id: str) -> bool:
+        return snippet_id in self._abbreviations
+
+    def add(
+        self,
+        snippet_id: str,
+        abbreviation: str,
+        scope_type: str = "global",
+        scope_values: Sequence[str] = (),
+    ) -> None:
+        """
+        Añadir (o reemplazar) la abreviatura de un snippet.
+
+        Args:
+            snippet_id: ID del snippet
+            abbreviation: Abreviatura exacta
+            scope_type: "global", "apps" o "domains"
+            scope_values: Apps o dominios del scope
+        """
+        if snippet_id in self._abbreviations:
+            self.remove(snippet_id)
+        if not abbreviation:
+            return
+
+        node = self._root
+        for char in reversed(abbreviation):
+            node = node.setdefault(char, {})
+        targets = node.setdefault(None, [])
+        targets.append(make_target(snippet_id, scope_type, scope_values))
+        self._abbreviations[snippet_id] = abbreviation
+        self.max_length = max(self.max_length, len(abbreviation))
+
+    def remove(self, snippet_id: str) -> None:
+        """Quitar la abreviatura de un snippet (no hace nada si no estaba)."""
+        abbreviation = self._abbreviations.pop(snippet_id, None)
+        if abbreviation is None:
+            return
+
+        path = [self._root]
+        for char in reversed(abbreviation):
+            path.append(path[-1][char])
+        targets = path[-1][None]
+        targets[:] = [target for target in targets if target.snippet_id != snippet_id]
+        if not targets:
+            del path[-1][None]
+        # Podar nodos que se quedaron vacíos
+        for depth in range(len(abbreviation), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][abbreviation[len(abbreviation) - depth]]
+
+    def lookup(self, abbreviation: str) -> list[AbbreviationTarget]:
+        """Destinos de una abreviatura exacta (vacío si no existe)."""
+        node = self._root
+        for char in reversed(abbreviation):
+            node = node.get(char)
+            if node is None:
+                return []
+        return list(node.get(None, ()))
+
+    def match_suffix(
+        self,
+        typed_buffer: str,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+    ) -> Optional[AbbreviationMatch]:
+        """
+        Abreviatura más larga en la que termina ``typed_buffer``.
+
+        Entre snippets con la misma abreviatura gana uno con scope específico
+        que aplique al contexto sobre uno global.
+
+        Args:
+            typed_buffer: Texto tecleado hasta el cursor
+            app: App activa (para scopes "apps")
+            domain: Dominio activo (para scopes "domains")
+
+        Returns:
+            AbbreviationMatch o None
+        """
+        node = self._root
+        best = None
+        for index in range(len(typed_buffer) - 1, -1, -1):
+            node = node.get(typed_buffer[index])
+            if node is None:
+                break
+            targets = node.get(None)
+            if targets:
+                target = pick_target(targets, app, domain)
+                if target is not None:
+                    best = AbbreviationMatch(target.snippet_id, typed_buffer[index:])
+        return best
+
+
+def make_target(snippet_id: str, scope_type: Optional[str], scope_values: Sequence[str]) -> AbbreviationTarget:
+    """Destino con los valores de scope normalizados a minúsculas."""
+    return AbbreviationTarget(snippet_id, scope_type or "global", tuple(value.lower() for value in scope_values))
+
+
+def pick_target(
+    targets: Sequence[AbbreviationTarget],
+    app: Optional[str],
+    domain: Optional[str],
+) -> Optional[AbbreviationTarget]:
+    """Primer destino con scope específico aplicable, o el primero global."""
+    fallback = None
+    for target in targets:
+        if target.scope_type == "global":
+            if fallback is None:
+                fallback = target
+        elif scope_matches(target.scope_type, target.scope_values, app, domain):
+            return target
+    return fallback
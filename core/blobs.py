@@ -0,0 +1,330 @@
+"""
+Almacén de blobs direccionado por contenido para las imágenes de los snippets.
+
+Las imágenes llegan como data URL en base64 (``data:image/png;base64,...``).
+Guardadas así en ``snippets.image_data`` ocupan un 33 % más y cada edición copia
+el texto entero en ``snippet_versions``. El almacén escribe el binario una sola
+vez en ``<base de datos>-blobs/ab/abcdef...``, con su SHA-256 como nombre, y las
+filas guardan solo el hash en ``image_blob``.
+
+La tabla ``blobs`` lleva el tipo MIME, el tamaño y el número de filas que usan
+cada blob. Ese contador lo mantienen triggers de SQLite, que también ven los
+borrados en cascada. :meth:`BlobStore.collect_garbage` lo recalcula y borra los
+blobs sin referencias y los ficheros huérfanos.
+"""
+
+import base64
+import binascii
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager, suppress
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Union
+
+from sqlalchemy.dialects.sqlite import insert
+
+from core.models import BlobDB, SnippetDB, SnippetVersionDB, utc_now
+
+if TYPE_CHECKING:
+    from core.database import Database
+
+# Tablas que apuntan a blobs con su columna image_blob
+REFERENCING_TABLES = ("snippets", "snippet_versions")
+
+# Un blob sin referencias o un fichero huérfano no se borra hasta pasado este
+# tiempo: puede ser de una escritura que todavía no ha hecho commit
+GC_GRACE_SECONDS = 3600
+
+# Filas por consulta al migrar imágenes en línea
+MIGRATE_CHUNK = 100
+
+# Prefijo de los ficheros temporales de put()
+_TMP_PREFIX = ".tmp-"
+
+_DATA_URL_RE = re.compile(r"data:([\w.+-]+/[\w.+-]+);base64,", re.ASCII)
+
+
+def parse_data_url(value: Optional[str]) -> Optional[tuple[str, bytes]]:
+    """
+    Separar un data URL en base64 en (tipo MIME, binario).
+
+    Returns:
+        None si no es un data URL en base64 válido
+    """
+    if not value:
+        return None
+    match = _DATA_URL_RE.match(value)
+    if match is None:
+        return None
+    try:
+        data = base64.b64decode(value[match.end():], validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return match.group(1), data
+
+
+def make_data_url(mime_type: str, data: Any) -> str:
+    """Data URL en base64 de ``data`` (bytes, mmap o cualquier buffer)."""
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _trigger_statements(table: str) -> list[str]:
+    """Triggers que mantienen blobs.ref_count al escribir en ``table``."""
+    increment = "UPDATE blobs SET ref_count = ref_count + 1 WHERE hash = NEW.image_blob;"
+    decrement = "UPDATE blobs SET ref_count = ref_count - 1 WHERE hash = OLD.image_blob;"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_blob_insert AFTER INSERT ON {table} "
+        f"WHEN NEW.image_blob IS NOT NULL BEGIN {increment} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_blob_delete AFTER DELETE ON {table} "
+        f"WHEN OLD.image_blob IS NOT NULL BEGIN {decrement} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_blob_update AFTER UPDATE OF image_blob ON {table} "
+        f"WHEN OLD.image_blob IS NOT NEW.image_blob BEGIN {decrement} {increment} END",
+    ]
+
+
+def ensure_schema(connection) -> None:
+    """
+    Añadir ``image_blob`` a las bases de datos anteriores y crear los triggers.
+
+    Args:
+        connection: Conexión SQLAlchemy (la tabla blobs ya existe)
+    """
+    for table in REFERENCING_TABLES:
+        columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+        if "image_blob" not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN image_blob VARCHAR REFERENCES blobs (hash)")
+            connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_{table}_image_blob ON {table} (image_blob)")
+        for statement in _trigger_statements(table):
+            connection.exec_driver_sql(statement)
+
+
+class BlobStore:
+    """Ficheros de blobs de una base de datos y su tabla ``blobs``."""
+
+    def __init__(self, db: "Database", root: str):
+        """
+        Args:
+            db: Base de datos cuyas filas apuntan a los blobs
+            root: Directorio de los ficheros (se crea en la primera escritura)
+        """
+        self.db = db
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        """Ruta del fichero de un blob."""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: bytes) -> str:
+        """
+        Escribir un blob (si no existía) y devolver su hash.
+
+        La escritura es atómica: fichero temporal y ``os.replace``.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            # Renovar la fecha: el GC no lo borra mientras la fila que lo usa hace commit
+            os.utime(path)
+            return digest
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=_TMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    @contextmanager
+    def open(self, digest: str) -> Iterator[Union[mmap.mmap, bytes]]:
+        """
+        Contenido de un blob mapeado en memoria (no se copia al heap de Python).
+
+        Raises:
+            FileNotFoundError: Si el fichero no existe
+        """
+        with open(self.path(digest), "rb") as blob_file:
+            if os.fstat(blob_file.fileno()).st_size == 0:
+                yield b""  # mmap no admite ficheros vacíos
+                return
+            mapped = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+    def read(self, digest: str) -> bytes:
+        """Contenido de un blob."""
+        with self.open(digest) as data:
+            return bytes(data)
+
+    def data_url(self, digest: str, mime_type: str) -> Optional[str]:
+        """Data URL de un blob, o None si falta el fichero."""
+        try:
+            with self.open(digest) as data:
+                return make_data_url(mime_type, data)
+        except FileNotFoundError:
+            return None
+
+    def store(self, session, image_data: Optional[str]) -> Optional[str]:
+        """
+        Guardar en el almacén la imagen de un data URL.
+
+        Crea la fila de ``blobs`` si hace falta (con 0 referencias: las suman los
+        triggers al escribir la fila del snippet o de la versión).
+
+        Args:
+            session: Sesión de la transacción que va a referenciar el blob
+            image_data: Data URL recibido
+
+        Returns:
+            Hash del blob, o None si no es un data URL en base64 que se pueda
+            reconstruir byte a byte (se guarda tal cual en image_data)
+        """
+        parsed = self._storable(image_data)
+        if parsed is None:
+            return None
+        mime_type, data = parsed
+
+        digest = self.put(data)
+        session.execute(
+            insert(BlobDB)
+            .values(hash=digest, mime_type=mime_type, size=len(data), ref_count=0, created_at=utc_now())
+            .on_conflict_do_nothing(index_elements=["hash"])
+        )
+        return digest
+
+    def digest(self, image_data: Optional[str]) -> Optional[str]:
+        """Hash con el que :meth:`store` guardaría ``image_data``, sin escribir nada."""
+        parsed = self._storable(image_data)
+        return hashlib.sha256(parsed[1]).hexdigest() if parsed else None
+
+    @staticmethod
+    def _storable(image_data: Optional[str]) -> Optional[tuple[str, bytes]]:
+        """(mime_type, bytes) de un data URL que el almacén puede servir idéntico."""
+        parsed = parse_data_url(image_data)
+        if parsed is None:
+            return None
+        if make_data_url(*parsed) != image_data:
+            return None  # Base64 no canónico: al servirlo no saldría igual
+        return parsed
+
+    def migrate(self, session) -> int:
+        """
+        Pasar al almacén las imágenes que aún están en línea en ``image_data``.
+
+        Se ejecuta al abrir la base de datos; tras la primera vez solo consulta
+        las filas con imagen en línea, que ya no quedan.
+
+        Returns:
+            Filas migradas (snippets y versiones)
+        """
+        migrated = 0
+        connection = session.connection()
+        for model in (SnippetDB, SnippetVersionDB):
+            pending = [
+                row.id
+                for row in session.query(model.id).filter(
+                    model.image_blob.is_(None),
+                    model.image_data.isnot(None),
+                    model.image_data.like("data:%;base64,%"),
+                )
+            ]
+            # SQL directo: un UPDATE del ORM tocaría updated_at (onupdate)
+            update_sql = f"UPDATE {model.__tablename__} SET image_data = NULL, image_blob = ? WHERE id = ?"
+            for chunk_start in range(0, len(pending), MIGRATE_CHUNK):
+                chunk = pending[chunk_start:chunk_start + MIGRATE_CHUNK]
+                rows = session.query(model.id, model.image_data).filter(model.id.in_(chunk)).all()
+                params = []
+                for row_id, image_data in rows:
+                    digest = self.store(session, image_data)
+                    if digest is not None:
+                        params.append((digest, row_id))
+                if params:
+                    connection.exec_driver_sql(update_sql, params)
+                    migrated += len(params)
+        return migrated
+
+    def collect_garbage(self, grace_seconds: float = GC_GRACE_SECONDS) -> dict[str, int]:
+        """
+        Borrar blobs sin referencias y ficheros sin fila en ``blobs``.
+
+        Antes recalcula ``ref_count`` desde las filas que apuntan a cada blob,
+        por si alguna escritura se hizo sin los triggers (p. ej. una copia
+        restaurada de una versión anterior).
+
+        Args:
+            grace_seconds: Antigüedad mínima de un fichero para borrarlo
+
+        Returns:
+            Dict con 'blobs' (filas borradas), 'files' (ficheros borrados) y
+            'bytes' (espacio liberado)
+        """
+        cutoff = time.time() - grace_seconds
+        references = " + ".join(
+            f"(SELECT count(*) FROM {table} WHERE {table}.image_blob = blobs.hash)"
+            for table in REFERENCING_TABLES
+        )
+        with self.db.get_session() as session:
+            connection = session.connection()
+            connection.exec_driver_sql(f"UPDATE blobs SET ref_count = {references}")
+            unreferenced = [
+                row.hash
+                for row in session.query(BlobDB.hash).filter(BlobDB.ref_count <= 0)
+                if self._older_than(self.path(row.hash), cutoff)
+            ]
+            if unreferenced:
+                session.query(BlobDB).filter(BlobDB.hash.in_(unreferenced)).delete(synchronize_session=False)
+            known = {row.hash for row in session.query(BlobDB.hash)}
+            session.commit()
+
+        stats = {"blobs": len(unreferenced), "files": 0, "bytes": 0}
+        for digest, path in self._files():
+            if digest in known or not self._older_than(path, cutoff):
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            stats["files"] += 1
+            stats["bytes"] += size
+        return stats
+
+    def stats(self) -> dict[str, int]:
+        """Número de blobs, bytes que ocupan y cuántos no usa ninguna fila."""
+        from sqlalchemy import func
+
+        with self.db.get_session() as session:
+            count, total = session.query(func.count(BlobDB.hash), func.coalesce(func.sum(BlobDB.size), 0)).one()
+            unreferenced = session.query(func.count(BlobDB.hash)).filter(BlobDB.ref_count <= 0).scalar()
+        return {"blobs": count, "bytes": total, "unreferenced": unreferenced}
+
+    def _files(self) -> Iterator[tuple[str, str]]:
+        """(hash o nombre temporal, ruta) de cada fichero del almacén."""
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file():
+                    yield entry.name, entry.path
+
+    @staticmethod
+    def _older_than(path: str, cutoff: float) -> bool:
+        """El fichero es anterior a ``cutoff`` (o ya no existe)."""
+        try:
+            return os.path.getmtime(path) < cutoff
+        except FileNotFoundError:
+            return True
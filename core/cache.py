@@ -0,0 +1,122 @@
+"""
+Cachés en memoria de SnippetManager.
+
+Se invalidan con un contador de generación: cada escritura lo incrementa y un
+resultado calculado con una generación anterior ya no se sirve ni se guarda, así
+una consulta que coincide con una escritura concurrente no deja datos viejos.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+
+class LRUCache:
+    """Caché LRU acotada por número de entradas y, opcionalmente, por bytes."""
+
+    def __init__(
+        self,
+        capacity: int,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        """
+        Args:
+            capacity: Máximo de entradas (0 desactiva la caché)
+            max_bytes: Máximo de bytes aproximados entre todas las entradas
+            sizeof: Tamaño aproximado de un valor (obligatorio con ``max_bytes``)
+        """
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Valor guardado (y marcado como reciente) o None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Valor guardado sin contar acierto ni cambiar el orden."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: Any, generation: int) -> None:
+        """
+        Guardar un valor calculado durante ``generation``.
+
+        Args:
+            key: Clave
+            value: Valor (no None)
+            generation: Valor de :attr:`generation` al empezar a calcularlo
+        """
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if generation != self.generation or self.capacity <= 0:
+                return
+            if self.max_bytes is not None and size > self.max_bytes // 4:
+                return  # Un solo valor enorme vaciaría la caché
+            self._pop(key)
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.capacity or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """
+        Incrementar la generación y descartar entradas.
+
+        Args:
+            keys: Claves afectadas; None descarta todo
+        """
+        with self._lock:
+            self.generation += 1
+            if keys is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                for key in keys:
+                    self._pop(key)
+
+    def stats(self) -> dict[str, Any]:
+        """Contadores para ajustar el tamaño."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "generation": self.generation,
+            }
+            if self.max_bytes is not None:
+                stats["bytes"] = self.bytes
+                stats["max_bytes"] = self.max_bytes
+            return stats
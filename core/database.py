@@ -4,13 +4,88 @@ Gestión de base de datos SQLite con SQLAlchemy.
 
 import json
 import os
+import threading
+import weakref
+from contextlib import contextmanager, suppress
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from core.models import Base, SettingsDB, SnippetDB, SnippetVariableDB, UsageLogDB
+from core.blobs import BlobStore, ensure_schema as ensure_blob_schema
+from core.expansions import ensure_schema as ensure_expansion_schema, snapshot_path
+from core.fulltext import FullTextIndex
+from core.models import (
+    Base, SettingsDB, SnippetDB, SnippetTagDB, SnippetVariableDB, UsageLogDB, parse_tag_csv,
+)
+from core.paths import default_db_path
+from core.versions import ensure_schema as ensure_version_schema
+
+
+# Comprobación de cancelación activa en el hilo actual (ver Database.interruptible)
+_interrupt_state = threading.local()
+
+# Cada cuántas instrucciones de la VM de SQLite se consulta la cancelación
+PROGRESS_HANDLER_STEPS = 1000
+
+
+def _progress_handler() -> int:
+    """Handler de progreso de SQLite: un valor distinto de 0 interrumpe la consulta."""
+    should_cancel = getattr(_interrupt_state, "should_cancel", None)
+    return 1 if should_cancel is not None and should_cancel() else 0
+
+
+# Contadores de sentencias activos en el hilo actual (ver Database.count_statements)
+_statement_state = threading.local()
+
+
+class StatementCounter:
+    """Sentencias SQL ejecutadas dentro de :meth:`Database.count_statements`."""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Listener before_cursor_execute: anotar la sentencia en los contadores del hilo."""
+    for counter in getattr(_statement_state, "counters", ()):
+        counter.statements.append(statement)
+
+
+def _merge_changes(changes: list[Optional[list[str]]]) -> Optional[list[str]]:
+    """Unir los avisos de cambio acumulados en un snapshot (None si alguno es "todos")."""
+    if any(ids is None for ids in changes):
+        return None
+    return list(dict.fromkeys(snippet_id for ids in changes for snippet_id in ids))
+
+
+def _listener_ref(listener: Callable) -> Callable[[], Optional[Callable]]:
+    """Referencia a un observador: débil para métodos ligados, para no retener a su objeto."""
+    if hasattr(listener, "__self__"):
+        return weakref.WeakMethod(listener)
+    return lambda: listener
+
+
+def _call_listeners(refs: list[Callable[[], Optional[Callable]]], argument) -> list:
+    """Llamar a los observadores vivos y devolver sus referencias (sin las muertas)."""
+    alive = []
+    for ref in refs:
+        listener = ref()
+        if listener is not None:
+            alive.append(ref)
+            listener(argument)
+    return alive
+
+
+def _on_connect(dbapi_connection, connection_record) -> None:
+    """Instalar el handler de progreso en cada conexión nueva."""
+    dbapi_connection.set_progress_handler(_progress_handler, PROGRESS_HANDLER_STEPS)
 
 
 class Database:
@@ -24,35 +99,102 @@ class Database:
             db_path: Ruta al archivo SQLite. Si es None, usa ~/.aparetext/aparetext.db
         """
         if db_path is None:
-            # Directorio por defecto
-            home = Path.home()
-            aparetext_dir = home / ".aparetext"
-            aparetext_dir.mkdir(exist_ok=True)
-            db_path = str(aparetext_dir / "aparetext.db")
+            db_path = default_db_path()
 
         self.db_path = db_path
-        self.engine = create_engine(
-            f"sqlite:///{db_path}",
-            echo=False,
-            connect_args={"check_same_thread": False},  # Allow multi-threading
-            pool_pre_ping=True,  # Check connection before use
-        )
+        self.engine = self._create_engine()
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
 
         # Defer heavy DB initialization (create_all / default inserts) until first session is requested.
         # This reduces startup/import cost when the application is packaged.
         self._initialized = False
 
+        # Conexión compartida por hilo mientras hay un snapshot activo (ver snapshot())
+        self._snapshot_state = threading.local()
+
+        # Observadores de cambios en snippets (índices y cachés en memoria)
+        self._change_listeners: list[Callable[[], Optional[Callable]]] = []
+        self._usage_listeners: list[Callable[[], Optional[Callable]]] = []
+
+        # Índice de texto completo (tabla FTS5), sincronizado como observador
+        self.fulltext = FullTextIndex(self)
+
+        # Imágenes en disco junto a la base de datos (las bases en memoria las guardan en línea)
+        self.blobs = BlobStore(self, f"{db_path}-blobs") if db_path != ":memory:" else None
+
+        # Instantánea de expansiones que el backend mapea al arrancar (ver core.expansions)
+        self.expansions_path = snapshot_path(db_path) if db_path != ":memory:" else None
+
+    def _create_engine(self) -> Engine:
+        """Crear engine SQLite con soporte de cancelación de consultas."""
+        engine = create_engine(
+            f"sqlite:///{self.db_path}",
+            echo=False,
+            connect_args={"check_same_thread": False},  # Allow multi-threading
+            pool_pre_ping=True,  # Check connection before use
+        )
+        event.listen(engine, "connect", _on_connect)
+        event.listen(engine, "before_cursor_execute", _count_statement)
+        return engine
+
+    @contextmanager
+    def count_statements(self) -> Iterator[StatementCounter]:
+        """
+        Contar las sentencias SQL que ejecuta el hilo actual.
+
+        Sirve para detectar consultas N+1: una lectura debe lanzar el mismo
+        número de sentencias tenga la biblioteca 10 snippets o 10.000. Los
+        contextos se pueden anidar; los demás hilos no cuentan.
+
+        Yields:
+            StatementCounter con las sentencias ejecutadas hasta el momento
+        """
+        counter = StatementCounter()
+        counters = getattr(_statement_state, "counters", ())
+        _statement_state.counters = counters + (counter,)
+        try:
+            yield counter
+        finally:
+            _statement_state.counters = counters
+
+    @contextmanager
+    def interruptible(self, should_cancel: Callable[[], bool]) -> Iterator[None]:
+        """
+        Permitir cancelar las consultas que lance el hilo actual.
+
+        Mientras el contexto está activo, SQLite consulta periódicamente
+        ``should_cancel`` y aborta la sentencia en curso (OperationalError
+        "interrupted") en cuanto devuelve True.
+
+        Args:
+            should_cancel: Función sin argumentos que indica si hay que abortar
+        """
+        previous = getattr(_interrupt_state, "should_cancel", None)
+        _interrupt_state.should_cancel = should_cancel
+        try:
+            yield
+        finally:
+            _interrupt_state.should_cancel = previous
+
     def _init_db(self) -> None:
         """Crear tablas en la base de datos."""
+        # Bases de datos anteriores a snippet_tags: se rellena desde el CSV tras crearla
+        needs_tag_backfill = not inspect(self.engine).has_table(SnippetTagDB.__tablename__)
         Base.metadata.create_all(bind=self.engine)
         # Enable foreign keys for SQLite
         with self.engine.connect() as conn:
-            conn.execute("PRAGMA foreign_keys=ON;")
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON;")
+            ensure_blob_schema(conn)
+            ensure_expansion_schema(conn)
+            ensure_version_schema(conn)
             conn.commit()
 
         # Insertar configuración por defecto si no existe
         with self.SessionLocal() as session:
+            if needs_tag_backfill:
+                self._backfill_tags(session)
+                session.commit()
+
             if session.query(SettingsDB).count() == 0:
                 self._insert_default_settings(session)
                 session.commit()
@@ -62,6 +204,27 @@ class Database:
                 self._insert_default_snippets(session)
                 session.commit()
 
+            # Imágenes guardadas en línea por versiones anteriores
+            if self.blobs is not None and self.blobs.migrate(session):
+                session.commit()
+
+            # Crear y llenar la tabla FTS si la base de datos aún no la tenía
+            if self.fulltext.ensure_schema(session.connection()):
+                self.fulltext.populate(session)
+            session.commit()
+
+    @staticmethod
+    def _backfill_tags(session: Session) -> None:
+        """Llenar snippet_tags a partir de la columna CSV ``tags``."""
+        rows = session.query(SnippetDB.id, SnippetDB.tags).filter(SnippetDB.tags.isnot(None))
+        params = [
+            {"tag": tag, "snippet_id": snippet_id}
+            for snippet_id, tags in rows
+            for tag in parse_tag_csv(tags)
+        ]
+        if params:
+            session.execute(SnippetTagDB.__table__.insert(), params)
+
     def _insert_default_settings(self, session: Session) -> None:
         """Insertar configuración por defecto."""
         default_settings = {
@@ -78,6 +241,9 @@ class Database:
             "log_usage": "false",
             "backup_enabled": "false",
             "backup_frequency": "7",
+            "version_keep_last": "20",
+            "version_daily_after_days": "7",
+            "version_weekly_after_days": "30",
         }
 
         for key, value in default_settings.items():
@@ -285,17 +451,145 @@ class Database:
                 variable = SnippetVariableDB(**var_data)
                 session.add(variable)
 
-    def get_session(self) -> Session:
-        """Obtener nueva sesión de base de datos."""
-        # Ensure DB schema and defaults are created on first real use.
+    def add_change_listener(self, listener: Callable[[Optional[list[str]]], None]) -> None:
+        """
+        Registrar un observador de cambios en snippets.
+
+        El observador recibe la lista de IDs modificados, o None si el cambio es
+        masivo (importación con reemplazo, restauración de backup). Los métodos
+        ligados se guardan con referencia débil para no retener a su objeto.
+
+        Args:
+            listener: Función o método ligado
+        """
+        self._change_listeners.append(_listener_ref(listener))
+
+    def add_usage_listener(self, listener: Callable[[dict[str, int]], None]) -> None:
+        """
+        Registrar un observador de cambios de ``usage_count``.
+
+        El uso se avisa aparte de :meth:`notify_snippets_changed`: solo cambia
+        el orden por uso, no el texto indexado ni las abreviaturas.
+
+        Args:
+            listener: Función o método ligado; recibe el nuevo contador por ID
+        """
+        self._usage_listeners.append(_listener_ref(listener))
+
+    def notify_snippets_changed(self, snippet_ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Avisar a los observadores de que cambiaron snippets.
+
+        Args:
+            snippet_ids: IDs creados, modificados o eliminados; None para "todos".
+                Dentro de :meth:`snapshot` el aviso se guarda hasta que se confirma
+                la transacción (y se descarta si se deshace)
+        """
+        ids = list(snippet_ids) if snippet_ids is not None else None
+        if self.in_snapshot:
+            # Los demás hilos aún no ven el cambio: se avisa al confirmar el snapshot
+            self._snapshot_state.changes.append(ids)
+            return
+        self._change_listeners = _call_listeners(self._change_listeners, ids)
+
+    def notify_usage_changed(self, usage_counts: dict[str, int]) -> None:
+        """
+        Avisar a los observadores de uso de que cambió ``usage_count``.
+
+        Args:
+            usage_counts: Nuevo contador por ID. Dentro de :meth:`snapshot` se
+                avisa al confirmar, igual que con notify_snippets_changed
+        """
+        if self.in_snapshot:
+            self._snapshot_state.usage.update(usage_counts)
+            return
+        self._usage_listeners = _call_listeners(self._usage_listeners, dict(usage_counts))
+
+    def _ensure_initialized(self) -> None:
+        """Crear esquema y datos por defecto en el primer uso real."""
         if not getattr(self, "_initialized", False):
             try:
                 self._init_db()
             finally:
                 # Even if _init_db raises, avoid retry storms; mark initialized to allow subsequent errors to surface normally
                 self._initialized = True
+
+    def get_session(self) -> Session:
+        """Obtener nueva sesión de base de datos."""
+        self._ensure_initialized()
+        connection = getattr(self._snapshot_state, "connection", None)
+        if connection is not None:
+            # Dentro de un snapshot: cada sesión es un SAVEPOINT sobre la conexión compartida,
+            # así el commit/rollback de una sesión no afecta a las demás
+            return self.SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
         return self.SessionLocal()
 
+    @property
+    def in_snapshot(self) -> bool:
+        """Indicar si el hilo actual está dentro de :meth:`snapshot`."""
+        return getattr(self._snapshot_state, "connection", None) is not None
+
+    @property
+    def snapshot_changed(self) -> bool:
+        """Indicar si el snapshot del hilo actual escribió snippets (aún sin avisar)."""
+        return bool(getattr(self._snapshot_state, "changes", None))
+
+    @contextmanager
+    def snapshot(self, immediate: bool = False) -> Iterator[None]:
+        """
+        Compartir una conexión y una transacción entre todas las sesiones del hilo actual.
+
+        Todas las lecturas dentro del contexto ven el mismo estado de la base de datos.
+        Cada sesión abierta con get_session() trabaja sobre un SAVEPOINT, de modo que
+        un error en una operación solo deshace esa operación. Las escrituras se
+        confirman al salir del contexto, y solo entonces se avisa a los observadores
+        de cambios. Los snapshots anidados reutilizan el exterior.
+
+        Args:
+            immediate: Tomar el bloqueo de escritura al empezar (BEGIN IMMEDIATE),
+                para leer y luego escribir sin que otra escritura se cuele entre medias
+        """
+        if self.in_snapshot:
+            yield
+            return
+
+        self._ensure_initialized()
+        with self.engine.connect() as connection:
+            # BEGIN explícito: pysqlite no abre transacción para lecturas
+            connection.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            self._snapshot_state.connection = connection
+            self._snapshot_state.changes = changes = []
+            self._snapshot_state.usage = usage = {}
+            try:
+                yield
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                self._snapshot_state.connection = None
+                self._snapshot_state.changes = None
+                self._snapshot_state.usage = None
+        if changes:
+            self._change_listeners = _call_listeners(self._change_listeners, _merge_changes(changes))
+        if usage:
+            self._usage_listeners = _call_listeners(self._usage_listeners, usage)
+
+    def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Leer un valor de la tabla de configuración.
+
+        Args:
+            key: Clave (p. ej. "abbreviation_trigger")
+            default: Valor si la clave no existe
+
+        Returns:
+            Valor guardado o ``default``
+        """
+        with self.get_session() as session:
+            setting = session.get(SettingsDB, key)
+            return setting.value if setting is not None and setting.value is not None else default
+
     def close(self) -> None:
         """Cerrar conexión a base de datos."""
         self.engine.dispose()
@@ -313,6 +607,9 @@ class Database:
         backup_dir = Path(backup_path).parent
         backup_dir.mkdir(parents=True, exist_ok=True)
         shutil.copy2(self.db_path, backup_path)
+        # Las imágenes viven fuera del fichero SQLite
+        if self.blobs is not None and os.path.isdir(self.blobs.root):
+            shutil.copytree(self.blobs.root, f"{backup_path}-blobs", dirs_exist_ok=True)
 
     def restore(self, backup_path: str) -> None:
         """
@@ -329,14 +626,21 @@ class Database:
         # Cerrar conexión actual
         self.close()
 
-        # Restaurar archivo
+        # Restaurar archivo (y las imágenes; las que sobren las borra collect_garbage)
         shutil.copy2(backup_path, self.db_path)
+        if self.blobs is not None and os.path.isdir(f"{backup_path}-blobs"):
+            shutil.copytree(f"{backup_path}-blobs", self.blobs.root, dirs_exist_ok=True)
+        # La generación del backup puede coincidir con la de la instantánea actual
+        if self.expansions_path is not None:
+            with suppress(FileNotFoundError):
+                os.remove(self.expansions_path)
 
         # Reconectar
-        self.engine = create_engine(f"sqlite:///{self.db_path}", echo=False)
+        self.engine = self._create_engine()
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         # Reset initialized flag so schema/defaults will be ensured on next use
         self._initialized = False
+        self.notify_snippets_changed(None)
 
     def export_to_json(self, output_path: str) -> None:
         """
@@ -420,12 +724,16 @@ class Database:
 
         with self.get_session() as session:
             if replace:
+                # Borrado masivo: sin cascada del ORM, las filas dependientes se borran aparte
+                session.query(SnippetTagDB).delete()
                 session.query(SnippetDB).delete()
                 session.commit()
 
             imported = 0
             skipped = 0
+            imported_ids = []
             for snippet_data in data["snippets"]:
+                imported_ids.append(snippet_data["id"])
                 # Verificar si existe por ID
                 existing = session.query(SnippetDB).filter_by(id=snippet_data["id"]).first()
                 if existing:
@@ -438,6 +746,7 @@ class Database:
                     existing.content_html = snippet_data.get("content_html")
                     existing.is_rich = snippet_data.get("is_rich", False)
                     existing.image_data = snippet_data.get("image_data")
+                    existing.image_blob = None  # migrate() lo pasa al almacén al terminar
                     existing.scope_type = snippet_data.get("scope_type", "global")
                     existing.scope_values = json.dumps(snippet_data.get("scope_values", []))
                     existing.caret_marker = snippet_data.get("caret_marker", "{{|}}")
@@ -529,8 +838,12 @@ class Database:
 
                     imported += 1
 
+            session.flush()
+            if self.blobs is not None:
+                self.blobs.migrate(session)
             session.commit()
 
+        self.notify_snippets_changed(None if replace else imported_ids)
         return {"imported": imported, "skipped": skipped}
 
 
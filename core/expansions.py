@@ -0,0 +1,344 @@
+"""
+Instantánea precompilada de las expansiones, mapeada en memoria al arrancar.
+
+Junto a ``aparetext.db`` se guarda ``aparetext.db-expansions`` con lo necesario
+para resolver y expandir la abreviatura de un snippet habilitado: abreviatura,
+nombre, tipo, scope, rango de uso y la plantilla ya partida con
+``TemplateParser.tokenize``. El backend la abre con mmap y sirve la primera
+expansión sin importar SQLAlchemy ni Pydantic; de cada consulta solo se leen
+las entradas que toca.
+
+Formato (little-endian):
+
+- Cabecera: magic, versión del formato, número de entradas, longitud máxima de
+  abreviatura y generación de la base de datos con la que se escribió.
+- Índice: offset y longitud de la clave y del registro de cada entrada,
+  ordenado por clave. La clave es la abreviatura invertida en UTF-8, así los
+  sufijos del texto tecleado son prefijos de las claves.
+- Datos: claves y registros; cada registro es un array JSON.
+
+La tabla ``snippet_generation`` guarda un contador que incrementan triggers de
+SQLite en cada cambio de las columnas de la instantánea, lo haga quien lo haga.
+Una instantánea de otra generación está obsoleta y no se usa. El contador de uso
+no cuenta como cambio: los rangos se ponen al día en la siguiente reescritura.
+"""
+
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from core.abbreviations import AbbreviationMatch, make_target, pick_target
+from core.template_parser import TemplateParser
+
+MAGIC = b"APXEXPND"
+FORMAT_VERSION = 1
+
+# magic, versión, reservado, entradas, longitud máxima de abreviatura, generación
+_HEADER = struct.Struct("<8sHHIIq")
+# offset y longitud de la clave, offset y longitud del registro
+_INDEX_ENTRY = struct.Struct("<IIII")
+
+# Columnas de snippets que cambian la instantánea (usage_count no, ver arriba)
+SNAPSHOT_COLUMNS = (
+    "name", "abbreviation", "snippet_type", "content_text", "content_html",
+    "scope_type", "scope_values", "enabled",
+)
+
+GENERATION_SQL = "SELECT value FROM snippet_generation"
+
+
+def snapshot_path(db_path: str) -> str:
+    """Ruta de la instantánea de una base de datos."""
+    return f"{db_path}-expansions"
+
+
+def _trigger_statements() -> list[str]:
+    """Triggers que incrementan snippet_generation al cambiar snippets."""
+    bump = "UPDATE snippet_generation SET value = value + 1;"
+    columns = ", ".join(SNAPSHOT_COLUMNS)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS snippets_generation_insert AFTER INSERT ON snippets BEGIN {bump} END",
+        f"CREATE TRIGGER IF NOT EXISTS snippets_generation_delete AFTER DELETE ON snippets BEGIN {bump} END",
+        f"CREATE TRIGGER IF NOT EXISTS snippets_generation_update AFTER UPDATE OF {columns} ON snippets "
+        f"BEGIN {bump} END",
+    ]
+
+
+def ensure_schema(connection) -> None:
+    """
+    Crear la tabla snippet_generation (con su única fila) y los triggers.
+
+    Args:
+        connection: Conexión SQLAlchemy (la tabla snippets ya existe)
+    """
+    connection.exec_driver_sql("CREATE TABLE IF NOT EXISTS snippet_generation (value INTEGER NOT NULL)")
+    connection.exec_driver_sql(
+        "INSERT INTO snippet_generation (value) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM snippet_generation)"
+    )
+    for statement in _trigger_statements():
+        connection.exec_driver_sql(statement)
+
+
+def read_generation(db_path: str) -> Optional[int]:
+    """
+    Generación actual de la base de datos, leída con sqlite3 en solo lectura.
+
+    Returns:
+        None si la base de datos no existe o aún no tiene snippet_generation
+    """
+    if not os.path.exists(db_path):
+        return None
+    try:
+        connection = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            row = connection.execute(GENERATION_SQL).fetchone()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+class ExpansionEntry(NamedTuple):
+    """Snippet habilitado tal como lo guarda la instantánea."""
+
+    snippet_id: str
+    abbreviation: str
+    name: str
+    snippet_type: str
+    scope_type: str
+    scope_values: tuple[str, ...]
+    usage_rank: int  # 1 = el más usado
+    parts: Optional[list[str]]  # TemplateParser.tokenize(); None si la plantilla usa funciones
+    template: Optional[str]  # Plantilla original, solo cuando parts es None
+
+    def expand(self, parser: TemplateParser, variables: Optional[dict[str, Any]] = None) -> str:
+        """Texto expandido (igual que ``parser.parse`` sobre la plantilla)."""
+        if self.parts is not None:
+            return parser.render(self.parts, variables)
+        return parser.parse(self.template or "", variables)
+
+
+def make_entry(
+    parser: TemplateParser,
+    snippet_id: str,
+    abbreviation: str,
+    name: str,
+    snippet_type: Optional[str],
+    template: str,
+    scope_type: Optional[str],
+    scope_values: Iterable[str],
+    usage_rank: int,
+) -> ExpansionEntry:
+    """Entrada de un snippet con la plantilla ya partida."""
+    parts = parser.tokenize(template)
+    return ExpansionEntry(
+        snippet_id,
+        abbreviation,
+        name,
+        snippet_type or "text",
+        scope_type or "global",
+        tuple(scope_values),
+        usage_rank,
+        parts,
+        template if parts is None else None,
+    )
+
+
+def write_snapshot(path: str, generation: int, entries: Iterable[ExpansionEntry]) -> None:
+    """
+    Escribir la instantánea de forma atómica (fichero temporal y ``os.replace``).
+
+    Las entradas con la misma abreviatura conservan el orden recibido, que es el
+    que sigue el desempate entre scopes del trie.
+    """
+    keyed = sorted(
+        ((entry.abbreviation[::-1].encode("utf-8"), entry) for entry in entries),
+        key=lambda item: item[0],
+    )
+    data_offset = _HEADER.size + len(keyed) * _INDEX_ENTRY.size
+    index = bytearray()
+    data = bytearray()
+    max_length = 0
+    for key, entry in keyed:
+        record = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        key_offset = data_offset + len(data)
+        index += _INDEX_ENTRY.pack(key_offset, len(key), key_offset + len(key), len(record))
+        data += key
+        data += record
+        max_length = max(max_length, len(entry.abbreviation))
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(keyed), max_length, generation)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(path)}.tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(header)
+            tmp_file.write(index)
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+
+def snapshot_generation(path: str) -> Optional[int]:
+    """Generación de la instantánea guardada en ``path`` (None si falta o no es válida)."""
+    try:
+        with open(path, "rb") as snapshot_file:
+            header = snapshot_file.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, version, _, _, _, generation = _HEADER.unpack(header)
+    return generation if magic == MAGIC and version == FORMAT_VERSION else None
+
+
+class ExpansionSnapshot:
+    """Instantánea de expansiones mapeada en memoria (solo lectura)."""
+
+    def __init__(self, mapped: mmap.mmap):
+        """
+        Args:
+            mapped: Fichero mapeado con cabecera ya validada (ver :meth:`open`)
+        """
+        self._map = mapped
+        _, _, _, self.count, self.max_length, self.generation = _HEADER.unpack_from(mapped)
+
+    @classmethod
+    def open(cls, path: str) -> Optional["ExpansionSnapshot"]:
+        """
+        Mapear la instantánea de ``path``.
+
+        Returns:
+            None si no existe, está truncada o es de otro formato
+        """
+        try:
+            with open(path, "rb") as snapshot_file:
+                if os.fstat(snapshot_file.fileno()).st_size < _HEADER.size:
+                    return None
+                mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError:
+            return None
+        magic, version, _, count, _, _ = _HEADER.unpack_from(mapped)
+        truncated = len(mapped) < _HEADER.size + count * _INDEX_ENTRY.size
+        if magic != MAGIC or version != FORMAT_VERSION or truncated:
+            mapped.close()
+            return None
+        return cls(mapped)
+
+    @classmethod
+    def open_fresh(cls, db_path: str) -> Optional["ExpansionSnapshot"]:
+        """Instantánea de una base de datos, solo si está al día con ella."""
+        snapshot = cls.open(snapshot_path(db_path))
+        if snapshot is not None and not snapshot.is_fresh(db_path):
+            snapshot.close()
+            return None
+        return snapshot
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        """Liberar el mapeo."""
+        self._map.close()
+
+    def is_fresh(self, db_path: str) -> bool:
+        """La base de datos sigue en la generación con la que se escribió la instantánea."""
+        return read_generation(db_path) == self.generation
+
+    def entries(self) -> Iterator[ExpansionEntry]:
+        """Todas las entradas, en orden de clave."""
+        for position in range(self.count):
+            yield self._entry(position)
+
+    def lookup(
+        self,
+        abbreviation: str,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+    ) -> Optional[ExpansionEntry]:
+        """
+        Snippet de una abreviatura exacta que aplica al contexto.
+
+        Desempata igual que ``SnippetManager.get_snippet_by_abbreviation``: sin
+        contexto se prefiere el global y, si no lo hay, el primero.
+        """
+        return self._pick(abbreviation[::-1], app, domain, fallback=app is None and domain is None)
+
+    def match_suffix(
+        self,
+        typed_buffer: str,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+    ) -> Optional[AbbreviationMatch]:
+        """
+        Abreviatura más larga en la que termina ``typed_buffer``.
+
+        Mismo resultado que ``AbbreviationTrie.match_suffix``: una búsqueda
+        binaria por cada longitud posible, de la más larga a la más corta.
+        """
+        if not self.max_length:
+            return None
+        reversed_tail = typed_buffer[-self.max_length:][::-1]
+        for length in range(len(reversed_tail), 0, -1):
+            entry = self._pick(reversed_tail[:length], app, domain)
+            if entry is not None:
+                return AbbreviationMatch(entry.snippet_id, entry.abbreviation)
+        return None
+
+    def _pick(
+        self,
+        reversed_abbreviation: str,
+        app: Optional[str],
+        domain: Optional[str],
+        fallback: bool = False,
+    ) -> Optional[ExpansionEntry]:
+        """Entrada de la clave que gana en el contexto dado (o la primera, con ``fallback``)."""
+        key = reversed_abbreviation.encode("utf-8")
+        position = self._lower_bound(key)
+        entries = []
+        while position < self.count and self._key(position) == key:
+            entries.append(self._entry(position))
+            position += 1
+        if not entries:
+            return None
+        targets = [make_target(entry.snippet_id, entry.scope_type, entry.scope_values) for entry in entries]
+        target = pick_target(targets, app, domain)
+        if target is None:
+            return entries[0] if fallback else None
+        return entries[targets.index(target)]
+
+    def _lower_bound(self, key: bytes) -> int:
+        """Primera posición cuya clave no es menor que ``key``."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _index_entry(self, position: int) -> tuple[int, int, int, int]:
+        return _INDEX_ENTRY.unpack_from(self._map, _HEADER.size + position * _INDEX_ENTRY.size)
+
+    def _key(self, position: int) -> bytes:
+        key_offset, key_length, _, _ = self._index_entry(position)
+        return self._map[key_offset:key_offset + key_length]
+
+    def _entry(self, position: int) -> ExpansionEntry:
+        _, _, offset, length = self._index_entry(position)
+        record = json.loads(self._map[offset:offset + length])
+        record[5] = tuple(record[5])
+        return ExpansionEntry(*record)
@@ -0,0 +1,306 @@
+"""
+Búsqueda de texto completo con SQLite FTS5.
+
+La tabla virtual ``snippets_fts`` replica nombre, abreviatura, tags, categoría y
+el texto plano del contenido (``content_text`` o, si no hay, ``content_html`` sin
+etiquetas). ``snippets_fts_ids`` asocia cada rowid de la tabla FTS con el ID del
+snippet, así reindexar o borrar un snippet no recorre la tabla FTS.
+
+Se mantiene al día desde los avisos de cambios de Database, no con triggers: el
+texto plano del HTML se extrae en Python. Si la tabla se pierde o se
+desincroniza, :meth:`FullTextIndex.rebuild` la regenera desde ``snippets``.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional
+
+from sqlalchemy import exc, text
+
+from core.models import SnippetDB
+
+if TYPE_CHECKING:
+    from core.database import Database
+
+FTS_TABLE = "snippets_fts"
+FTS_IDS_TABLE = "snippets_fts_ids"
+
+# Columnas indexadas, en el orden de BM25_WEIGHTS
+FTS_COLUMNS = ("name", "abbreviation", "tags", "category", "body")
+
+# Columnas de snippets que alimentan la tabla FTS
+_SOURCE_COLUMNS = (
+    SnippetDB.id,
+    SnippetDB.name,
+    SnippetDB.abbreviation,
+    SnippetDB.tags,
+    SnippetDB.category,
+    SnippetDB.content_text,
+    SnippetDB.content_html,
+)
+
+# Peso de cada columna en bm25(): un acierto en el nombre vale más que en el cuerpo
+BM25_WEIGHTS = (10.0, 8.0, 4.0, 2.0, 1.0)
+
+# Marcadores de resaltado: caracteres de control que no aparecen en texto normal,
+# así la interfaz puede escapar el HTML antes de sustituirlos por <mark>
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+# Tokens alrededor del acierto en el extracto del cuerpo
+EXCERPT_TOKENS = 12
+
+# Filas por INSERT durante una reconstrucción
+REBUILD_CHUNK = 500
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class _TextExtractor(HTMLParser):
+    """Recoge el texto visible de un fragmento HTML."""
+
+    _SKIPPED = {"script", "style"}
+    _BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED:
+            self._skip_depth += 1
+        elif tag in self._BLOCKS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIPPED and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Texto visible de un HTML (sin etiquetas, scripts ni estilos)."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return " ".join("".join(extractor.parts).split())
+
+
+def plain_body(content_text: Optional[str], content_html: Optional[str]) -> str:
+    """Texto plano del contenido de un snippet."""
+    if content_text:
+        return content_text
+    if content_html:
+        return html_to_text(content_html)
+    return ""
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Traducir lo que escribe el usuario a una expresión MATCH segura.
+
+    Cada palabra se entrecomilla (la sintaxis de FTS5 no llega al usuario) y la
+    última se busca como prefijo, para que la búsqueda funcione mientras se teclea.
+
+    Returns:
+        Expresión MATCH, o None si la consulta no tiene palabras
+    """
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class FullTextHit(NamedTuple):
+    """Resultado de :meth:`FullTextIndex.search`."""
+
+    snippet_id: str
+    rank: float  # bm25: más negativo = más relevante
+    name_highlight: str
+    excerpt: str
+
+
+class FullTextIndex:
+    """Tabla FTS5 sincronizada con ``snippets``."""
+
+    def __init__(self, db: "Database"):
+        """
+        Args:
+            db: Base de datos cuyos snippets se indexan
+        """
+        self.db = db
+        self.available = True  # False si SQLite no trae FTS5
+        db.add_change_listener(self._on_snippets_changed)
+
+    def ensure_schema(self, connection) -> bool:
+        """
+        Crear la tabla virtual si no existe.
+
+        Args:
+            connection: Conexión SQLAlchemy
+
+        Returns:
+            True si se acaba de crear (hay que llenarla)
+        """
+        existing = connection.exec_driver_sql(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+            (FTS_TABLE, FTS_IDS_TABLE),
+        ).scalar()
+        if existing == 2:
+            return False
+        # Si falta una de las dos tablas, se recrean ambas
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        try:
+            connection.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"{', '.join(FTS_COLUMNS)}, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except exc.OperationalError:
+            # SQLite compilado sin FTS5: search_snippets(full_text=True) usa ilike
+            self.available = False
+            return False
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_IDS_TABLE}")
+        connection.exec_driver_sql(
+            f"CREATE TABLE {FTS_IDS_TABLE} (id INTEGER PRIMARY KEY, snippet_id TEXT NOT NULL UNIQUE)"
+        )
+        return True
+
+    def _on_snippets_changed(self, snippet_ids: Optional[list[str]]) -> None:
+        """Observador de cambios de Database."""
+        if not self.available:
+            return
+        if snippet_ids is None:
+            self.rebuild()
+        else:
+            self.sync(snippet_ids)
+
+    def sync(self, snippet_ids: Iterable[str]) -> None:
+        """
+        Reindexar snippets concretos (los borrados desaparecen del índice).
+
+        Args:
+            snippet_ids: IDs creados, modificados o eliminados
+        """
+        if not self.available:
+            return
+        snippet_ids = list(snippet_ids)
+        with self.db.get_session() as session:
+            connection = session.connection()
+            for chunk_start in range(0, len(snippet_ids), REBUILD_CHUNK):
+                chunk = tuple(snippet_ids[chunk_start:chunk_start + REBUILD_CHUNK])
+                placeholders = ", ".join("?" * len(chunk))
+                connection.exec_driver_sql(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                    f"(SELECT rowid FROM {FTS_IDS_TABLE} WHERE snippet_id IN ({placeholders}))",
+                    chunk,
+                )
+                connection.exec_driver_sql(
+                    f"DELETE FROM {FTS_IDS_TABLE} WHERE snippet_id IN ({placeholders})", chunk
+                )
+                self._insert_rows(session, session.query(*_SOURCE_COLUMNS).filter(SnippetDB.id.in_(chunk)).all())
+            session.commit()
+
+    def rebuild(self) -> int:
+        """
+        Regenerar la tabla entera desde ``snippets``.
+
+        Returns:
+            Número de snippets indexados
+        """
+        if not self.available:
+            return 0
+        with self.db.get_session() as session:
+            self.ensure_schema(session.connection())
+            count = self.populate(session)
+            session.commit()
+        return count
+
+    def populate(self, session) -> int:
+        """Vaciar y volver a llenar la tabla dentro de la transacción de ``session``."""
+        connection = session.connection()
+        connection.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+        connection.exec_driver_sql(f"DELETE FROM {FTS_IDS_TABLE}")
+        count = self._insert_rows(session, session.query(*_SOURCE_COLUMNS).yield_per(REBUILD_CHUNK))
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        return count
+
+    @staticmethod
+    def _insert_rows(session, rows) -> int:
+        """Insertar filas de ``snippets`` en la tabla FTS por lotes."""
+        connection = session.connection()
+        ids_sql = f"INSERT INTO {FTS_IDS_TABLE} (snippet_id) VALUES (?)"
+        fts_sql = (
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+            f"SELECT rowid, ?, ?, ?, ?, ? FROM {FTS_IDS_TABLE} WHERE snippet_id = ?"
+        )
+        batch = []
+        count = 0
+        for row in rows:
+            batch.append((
+                row.name,
+                row.abbreviation or "",
+                (row.tags or "").replace(",", " "),
+                row.category or "",
+                plain_body(row.content_text, row.content_html),
+                row.id,
+            ))
+            if len(batch) == REBUILD_CHUNK:
+                count += _flush(connection, ids_sql, fts_sql, batch)
+                batch = []
+        if batch:
+            count += _flush(connection, ids_sql, fts_sql, batch)
+        return count
+
+    def search(
+        self,
+        session,
+        query: str,
+        limit: Optional[int] = None,
+        enabled_only: bool = False,
+    ) -> list[FullTextHit]:
+        """
+        Buscar por relevancia bm25.
+
+        Args:
+            session: Sesión abierta
+            query: Texto tecleado por el usuario
+            limit: Máximo de resultados (None = todos)
+            enabled_only: Solo snippets habilitados
+
+        Returns:
+            Resultados de más a menos relevante
+        """
+        match = build_match_query(query)
+        if match is None:
+            return []
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+        sql = (
+            f"SELECT ids.snippet_id, bm25({FTS_TABLE}, {weights}) AS rank, "
+            f"highlight({FTS_TABLE}, 0, :start, :end) AS name_highlight, "
+            f"snippet({FTS_TABLE}, 4, :start, :end, '…', {EXCERPT_TOKENS}) AS excerpt "
+            f"FROM {FTS_TABLE} JOIN {FTS_IDS_TABLE} AS ids ON ids.rowid = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match"
+        )
+        if enabled_only:
+            sql += f" AND ids.snippet_id IN (SELECT id FROM {SnippetDB.__tablename__} WHERE enabled = 1)"
+        sql += " ORDER BY rank"
+        params = {"match": match, "start": HIGHLIGHT_START, "end": HIGHLIGHT_END}
+        if limit is not None:
+            sql += " LIMIT :limit"
+            params["limit"] = limit
+        rows = session.execute(text(sql), params)
+        return [FullTextHit(row.snippet_id, row.rank, row.name_highlight, row.excerpt) for row in rows]
+
+
+def _flush(connection, ids_sql: str, fts_sql: str, batch: list[tuple]) -> int:
+    """Insertar un lote: primero los IDs (asignan el rowid) y luego el texto."""
+    connection.exec_driver_sql(ids_sql, [(item[-1],) for item in batch])
+    connection.exec_driver_sql(fts_sql, batch)
+    return len(batch)
@@ -0,0 +1,508 @@
+"""
+Búsqueda fuzzy por subsecuencia para la paleta (estilo fzf).
+
+Cada carácter de la consulta debe aparecer en orden en alguno de los campos del
+snippet. La puntuación premia los tramos contiguos y los inicios de palabra
+(después de espacio, separador o en un cambio camelCase) y penaliza los huecos.
+Mayúsculas y acentos no cuentan: "cafe" encuentra "Café".
+
+La relevancia textual se combina con ``usage_count`` y se devuelven solo los
+``limit`` mejores resultados con las posiciones coincidentes para resaltarlas.
+"""
+
+import heapq
+import math
+import unicodedata
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable, Iterator, NamedTuple, Optional, Sequence
+
+# Puntuaciones (mismas proporciones que fzf)
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = SCORE_MATCH // 2
+BONUS_BOUNDARY_WHITE = BONUS_BOUNDARY + 2
+BONUS_BOUNDARY_DELIMITER = BONUS_BOUNDARY + 1
+BONUS_NON_WORD = SCORE_MATCH // 2
+BONUS_CAMEL = BONUS_BOUNDARY + SCORE_GAP_EXTENSION
+BONUS_CONSECUTIVE = -(SCORE_GAP_START + SCORE_GAP_EXTENSION)
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+
+# Peso del uso: puntos por cada duplicación de usage_count
+USAGE_WEIGHT = 3.0
+
+# Clases de carácter para calcular las bonificaciones
+_WHITE, _DELIMITER, _NON_WORD, _LOWER, _UPPER, _NUMBER, _LETTER = range(7)
+_DELIMITERS = frozenset("/,:;|-_.")
+
+
+@lru_cache(maxsize=4096)
+def _fold_char(char: str) -> str:
+    """Carácter sin acento y en minúsculas (siempre un único carácter)."""
+    decomposed = unicodedata.normalize("NFKD", char)
+    base = "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    if len(base) == 1:
+        return base
+    lowered = char.lower()
+    return lowered if len(lowered) == 1 else char
+
+
+def fold_text(text: str) -> str:
+    """Plegar mayúsculas y acentos conservando la longitud (y las posiciones)."""
+    if text.isascii():
+        return text.lower()
+    return "".join(map(_fold_char, text))
+
+
+@lru_cache(maxsize=4096)
+def _char_class(char: str) -> int:
+    if char.isspace():
+        return _WHITE
+    if char in _DELIMITERS:
+        return _DELIMITER
+    if char.islower():
+        return _LOWER
+    if char.isupper():
+        return _UPPER
+    if char.isdigit():
+        return _NUMBER
+    if char.isalpha():
+        return _LETTER
+    return _NON_WORD
+
+
+def _bonus(prev_class: int, char_class: int) -> int:
+    """Bonificación por coincidir en un carácter según el anterior."""
+    if char_class >= _LOWER:
+        if prev_class == _WHITE:
+            return BONUS_BOUNDARY_WHITE
+        if prev_class == _DELIMITER:
+            return BONUS_BOUNDARY_DELIMITER
+        if prev_class == _NON_WORD:
+            return BONUS_BOUNDARY
+        if (prev_class == _LOWER and char_class == _UPPER) or (
+            prev_class != _NUMBER and char_class == _NUMBER
+        ):
+            return BONUS_CAMEL
+        return 0
+    if char_class == _WHITE:
+        return BONUS_BOUNDARY_WHITE
+    return BONUS_NON_WORD
+
+
+def max_score(pattern_length: int) -> int:
+    """Cota superior de la puntuación textual para un patrón de esa longitud."""
+    if pattern_length == 0:
+        return 0
+    return pattern_length * SCORE_MATCH + BONUS_BOUNDARY_WHITE * (
+        BONUS_FIRST_CHAR_MULTIPLIER + pattern_length - 1
+    )
+
+
+def usage_bonus(usage_count: int) -> float:
+    """Puntos por frecuencia de uso (logarítmicos)."""
+    return USAGE_WEIGHT * math.log2(1 + max(usage_count, 0))
+
+
+def field_bonuses(text: str) -> bytes:
+    """Bonificación de cada posición de ``text`` (se precalcula al indexar)."""
+    bonuses = bytearray(len(text))
+    prev_class = _WHITE
+    for index, char in enumerate(text):
+        char_class = _char_class(char)
+        bonuses[index] = _bonus(prev_class, char_class)
+        prev_class = char_class
+    return bytes(bonuses)
+
+
+def fuzzy_match(
+    pattern: str,
+    text: str,
+    folded: Optional[str] = None,
+    bonuses: Optional[bytes] = None,
+) -> Optional[tuple[int, list[int]]]:
+    """
+    Puntuar ``text`` contra un patrón ya plegado con :func:`fold_text`.
+
+    Como fzf v1: una pasada hacia delante encuentra el final de la primera
+    subsecuencia completa, otra hacia atrás la ventana más corta que la
+    contiene, y dentro de ella se toman las coincidencias más a la izquierda.
+    Las búsquedas son ``str.find``/``rfind`` y la puntuación recorre solo las
+    posiciones coincidentes, no el texto.
+
+    Args:
+        pattern: Patrón plegado (no vacío)
+        text: Texto original
+        folded: ``fold_text(text)`` si ya se tiene
+        bonuses: ``field_bonuses(text)`` si ya se tiene
+
+    Returns:
+        (puntuación, posiciones coincidentes) o None si no hay subsecuencia
+    """
+    if folded is None:
+        folded = fold_text(text)
+
+    position = -1
+    for char in pattern:
+        position = folded.find(char, position + 1)
+        if position < 0:
+            return None
+
+    start = position + 1
+    for char in reversed(pattern):
+        start = folded.rfind(char, 0, start)
+
+    if bonuses is None:
+        bonuses = field_bonuses(text)
+
+    positions = []
+    position = start - 1
+    for char in pattern:
+        position = folded.find(char, position + 1)
+        positions.append(position)
+
+    score = 0
+    first_bonus = 0
+    previous = -2
+    for position in positions:
+        bonus = bonuses[position]
+        if position == previous + 1:
+            # Un tramo contiguo conserva la bonificación de su primer carácter
+            if bonus >= BONUS_BOUNDARY and bonus > first_bonus:
+                first_bonus = bonus
+            bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+        else:
+            if previous >= 0:
+                score += SCORE_GAP_START + (position - previous - 2) * SCORE_GAP_EXTENSION
+            else:
+                bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+            first_bonus = bonuses[position]
+        score += SCORE_MATCH + bonus
+        previous = position
+    return score, positions
+
+
+class FuzzyMatch(NamedTuple):
+    """Resultado de :meth:`FuzzyIndex.search`."""
+
+    snippet_id: str
+    score: float
+    field: str
+    positions: list[int]
+
+
+class _Entry(NamedTuple):
+    snippet_id: str
+    fields: tuple[Optional[str], ...]
+    folded: tuple[Optional[str], ...]
+    bonuses: list[Optional[bytes]]  # field_bonuses por campo, calculado al puntuarlo
+    usage_count: int
+    enabled: bool
+
+
+# Posiciones de los bits activos de cada byte
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def _set_bit(bits: bytearray, number: int) -> None:
+    byte_index = number >> 3
+    if byte_index >= len(bits):
+        bits.extend(bytes(max(byte_index + 1 - len(bits), len(bits))))
+    bits[byte_index] |= 1 << (number & 7)
+
+
+def _clear_bit(bits: bytearray, number: int) -> None:
+    byte_index = number >> 3
+    if byte_index < len(bits):
+        bits[byte_index] &= ~(1 << (number & 7)) & 0xFF
+
+
+def _bit_numbers(mask: int) -> list[int]:
+    """Números de los bits activos de un entero."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    numbers = []
+    for byte_index, byte in enumerate(data):
+        if byte:
+            base = byte_index << 3
+            numbers.extend(base + bit for bit in _BYTE_BITS[byte])
+    return numbers
+
+
+class FuzzyIndex:
+    """
+    Snippets plegados en memoria con un bitmap de documentos por carácter.
+
+    Cota de trabajo por pulsación:
+
+    - El AND de los bitmaps de los caracteres de la consulta (y el de
+      habilitados) deja solo los snippets que pueden contener la subsecuencia;
+      son operaciones sobre enteros, de coste N/64 palabras.
+    - Los candidatos se recorren de más a menos usado y se para en cuanto
+      ninguno de los restantes puede superar al peor del top-k (cota
+      :func:`max_score` + su bonificación de uso).
+    - Como mucho se puntúan ``max_scored`` candidatos. Con consultas muy
+      poco selectivas (una o dos letras en una biblioteca grande) el top-k
+      es el de los snippets más usados; al seguir tecleando los candidatos
+      bajan de la cota y el resultado vuelve a ser exacto.
+
+    Los documentos se numeran en orden de inserción; al actualizar o borrar
+    queda un hueco que se compacta cuando los huecos superan a los vivos.
+    """
+
+    # Candidatos puntuados como máximo por búsqueda
+    MAX_SCORED = 500
+
+    # Huecos mínimos antes de plantearse compactar
+    COMPACT_MIN_DEAD = 1024
+
+    def __init__(self, field_names: Sequence[str], max_scored: int = MAX_SCORED):
+        """
+        Args:
+            field_names: Nombres de los campos indexados, en el orden de ``add``
+            max_scored: Candidatos puntuados como máximo por búsqueda
+        """
+        self.field_names = tuple(field_names)
+        self.max_scored = max_scored
+        self._docs: list[Optional[_Entry]] = []
+        self._doc_numbers: dict[str, int] = {}
+        self._char_bits: dict[str, bytearray] = {}
+        self._enabled_bits = bytearray()
+        self._dead = 0
+        self._ranked: Optional[list[int]] = None
+        self._rank: list[int] = []
+        self._corpus = ""
+        self._corpus_starts: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def __contains__(self, snippet_id: str) -> bool:
+        return snippet_id in self._doc_numbers
+
+    def add(
+        self,
+        snippet_id: str,
+        fields: Sequence[Optional[str]],
+        usage_count: int = 0,
+        enabled: bool = True,
+    ) -> None:
+        """Indexar (o reindexar) un snippet."""
+        if snippet_id in self._doc_numbers:
+            self.remove(snippet_id)
+
+        fields = tuple(fields)
+        folded = tuple(fold_text(value) if value else None for value in fields)
+        self._add_entry(
+            _Entry(snippet_id, fields, folded, [None] * len(fields), usage_count or 0, bool(enabled))
+        )
+
+    def _add_entry(self, entry: _Entry) -> None:
+        doc_number = len(self._docs)
+        self._docs.append(entry)
+        self._doc_numbers[entry.snippet_id] = doc_number
+        char_bits = self._char_bits
+        for char in _chars(entry.folded):
+            bits = char_bits.get(char)
+            if bits is None:
+                bits = char_bits[char] = bytearray()
+            _set_bit(bits, doc_number)
+        if entry.enabled:
+            _set_bit(self._enabled_bits, doc_number)
+        self._ranked = None
+
+    def set_usage(self, snippet_id: str, usage_count: int) -> None:
+        """Cambiar el contador de uso de un snippet (se reordena en la próxima búsqueda)."""
+        doc_number = self._doc_numbers.get(snippet_id)
+        if doc_number is None:
+            return
+        entry = self._docs[doc_number]
+        if entry.usage_count != usage_count:
+            self._docs[doc_number] = entry._replace(usage_count=usage_count or 0)
+            self._ranked = None
+
+    def remove(self, snippet_id: str) -> None:
+        """Quitar un snippet del índice (no hace nada si no estaba)."""
+        doc_number = self._doc_numbers.pop(snippet_id, None)
+        if doc_number is None:
+            return
+        entry = self._docs[doc_number]
+        self._docs[doc_number] = None
+        for char in _chars(entry.folded):
+            _clear_bit(self._char_bits[char], doc_number)
+        _clear_bit(self._enabled_bits, doc_number)
+        self._dead += 1
+        self._ranked = None
+        if self._dead >= self.COMPACT_MIN_DEAD and self._dead > len(self._doc_numbers):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Renumerar documentos vivos y reconstruir los bitmaps."""
+        live = [entry for entry in self._docs if entry is not None]
+        self._docs = []
+        self._doc_numbers = {}
+        self._char_bits = {}
+        self._enabled_bits = bytearray()
+        self._dead = 0
+        for entry in live:
+            self._add_entry(entry)
+
+    def _ensure_ranked(self) -> None:
+        """
+        Orden de recorrido: más usados primero y, a igual uso, nombres más cortos.
+
+        Junto al orden se construye el corpus: los campos plegados de todos los
+        documentos en ese orden, separados por ``\\0``, donde ``str.find``
+        localiza coincidencias contiguas sin recorrer documentos en Python.
+        """
+        if self._ranked is None:
+            docs = self._docs
+            self._ranked = sorted(
+                (number for number, entry in enumerate(docs) if entry is not None),
+                key=lambda number: (-docs[number].usage_count, len(docs[number].fields[0] or "")),
+            )
+            self._rank = [0] * len(docs)
+            starts = []
+            parts = []
+            offset = 0
+            for rank, number in enumerate(self._ranked):
+                self._rank[number] = rank
+                text = "\0".join(value for value in docs[number].folded if value) + "\0"
+                starts.append(offset)
+                parts.append(text)
+                offset += len(text)
+            self._corpus = "".join(parts)
+            self._corpus_starts = starts
+
+    def _substring_hits(self, pattern: str, data: bytes, seen: set[int]) -> Iterator[int]:
+        """Candidatos con ``pattern`` contiguo, en orden de uso (anotados en ``seen``)."""
+        corpus = self._corpus
+        starts = self._corpus_starts
+        ranked = self._ranked
+        size = len(data)
+        position = corpus.find(pattern)
+        while position >= 0:
+            rank = bisect_right(starts, position) - 1
+            number = ranked[rank]
+            if (number >> 3) < size and data[number >> 3] >> (number & 7) & 1:
+                seen.add(number)
+                yield number
+            if rank + 1 == len(starts):
+                return
+            position = corpus.find(pattern, starts[rank + 1])
+
+    def search(self, query: str, limit: int = 20, enabled_only: bool = True) -> list[FuzzyMatch]:
+        """
+        Top-k de snippets para una consulta.
+
+        Args:
+            query: Texto tecleado
+            limit: Máximo de resultados
+            enabled_only: Ignorar snippets deshabilitados
+
+        Returns:
+            Resultados de mayor a menor puntuación (texto + uso)
+        """
+        pattern = fold_text(query)
+        if not pattern or limit <= 0:
+            return []
+
+        mask = -1
+        if enabled_only:
+            mask = int.from_bytes(self._enabled_bits, "little")
+        for char in set(pattern):
+            bits = self._char_bits.get(char)
+            if bits is None:
+                return []
+            mask &= int.from_bytes(bits, "little")
+        if mask <= 0:
+            return []
+
+        self._ensure_ranked()
+        text_bound = max_score(len(pattern))
+        # Min-heap de (puntuación, -rank, ...): a igual puntuación gana el de mejor rank
+        heap: list[tuple] = []
+        budget = self.max_scored
+
+        if mask.bit_count() <= budget:
+            ordered = sorted(_bit_numbers(mask), key=self._rank.__getitem__)
+            self._score_candidates(pattern, ordered, heap, limit, budget, text_bound)
+        else:
+            # Muchos candidatos: primero los que contienen la consulta seguida
+            # (los mejor puntuados casi siempre) y después el orden de uso
+            data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+            size = len(data)
+            seen: set[int] = set()
+            hits = self._substring_hits(pattern, data, seen)
+            budget -= self._score_candidates(pattern, hits, heap, limit, budget, text_bound)
+            ordered = (
+                number for number in self._ranked
+                if (number >> 3) < size and data[number >> 3] >> (number & 7) & 1 and number not in seen
+            )
+            self._score_candidates(pattern, ordered, heap, limit, budget, text_bound)
+
+        heap.sort(reverse=True)
+        return [
+            FuzzyMatch(snippet_id, score, field, positions)
+            for score, _, snippet_id, field, positions in heap
+        ]
+
+    def _score_candidates(
+        self,
+        pattern: str,
+        numbers: Iterable[int],
+        heap: list[tuple],
+        limit: int,
+        budget: int,
+        text_bound: int,
+    ) -> int:
+        """
+        Puntuar candidatos y mantener en ``heap`` los ``limit`` mejores.
+
+        ``numbers`` va en orden de uso: se para cuando ningún candidato
+        restante puede entrar en el top-k o se agota ``budget``.
+
+        Returns:
+            Candidatos puntuados
+        """
+        docs = self._docs
+        rank = self._rank
+        field_names = self.field_names
+        scored = 0
+        for number in numbers:
+            entry = docs[number]
+            boost = usage_bonus(entry.usage_count) if entry.usage_count else 0.0
+            if len(heap) == limit and heap[0][0] >= text_bound + boost:
+                break  # Ninguno de los siguientes (menos usados) puede entrar
+            if scored == budget:
+                break
+            scored += 1
+
+            best = None
+            for field_index, text in enumerate(entry.fields):
+                if not text:
+                    continue
+                bonuses = entry.bonuses[field_index]
+                if bonuses is None:
+                    bonuses = entry.bonuses[field_index] = field_bonuses(text)
+                match = fuzzy_match(pattern, text, entry.folded[field_index], bonuses)
+                if match is not None and (best is None or match[0] > best[0]):
+                    best = (match[0], field_index, match[1])
+            if best is None:
+                continue
+
+            item = (best[0] + boost, -rank[number], entry.snippet_id, field_names[best[1]], best[2])
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        return scored
+
+
+def _chars(values: Sequence[Optional[str]]) -> set[str]:
+    """Caracteres distintos de unos campos plegados."""
+    chars: set[str] = set()
+    for value in values:
+        if value:
+            chars.update(value)
+    return chars
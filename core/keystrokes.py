@@ -0,0 +1,232 @@
+"""
+Detección de abreviaturas sobre el flujo de pulsaciones.
+
+:class:`AbbreviationAutomaton` es un autómata Aho-Corasick inmutable construido con
+todas las abreviaturas habilitadas. :class:`KeystrokeMatcher` lo recorre carácter
+a carácter (O(1) amortizado por pulsación) y, al llegar la tecla de disparo
+configurada en ``abbreviation_trigger``, emite la abreviatura más larga que
+termina en el cursor.
+
+Una abreviatura solo se dispara en un límite de palabra: o empieza por un signo
+(``;fe``, ``/sig``) o el carácter anterior no es alfanumérico. Así ``sig`` se
+expande en "Firma: sig" pero no en "configsig".
+"""
+
+import threading
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from core.abbreviations import AbbreviationTarget, make_target, pick_target
+
+# Valores de la opción abbreviation_trigger y la tecla que representan
+TRIGGER_KEYS = {"tab": "\t", "space": " ", "enter": "\n"}
+DEFAULT_TRIGGER = "tab"
+
+# Borrar el carácter anterior
+BACKSPACE = "\b"
+
+# Caracteres recordados de la palabra actual (más que la abreviatura más larga
+# admitida, 50, para poder mirar el carácter anterior a ella)
+HISTORY_LIMIT = 64
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class KeystrokeEvent(NamedTuple):
+    """Abreviatura detectada al pulsar la tecla de disparo."""
+
+    snippet_id: str
+    abbreviation: str
+    trigger: str  # Tecla de disparo pulsada
+    erase: int  # Caracteres a borrar antes de insertar (abreviatura + disparo)
+
+
+class AbbreviationAutomaton:
+    """Autómata Aho-Corasick inmutable sobre un conjunto de abreviaturas."""
+
+    def __init__(self, entries: Iterable[tuple[str, str, Optional[str], Sequence[str]]] = ()):
+        """
+        Args:
+            entries: Tuplas (snippet_id, abreviatura, scope_type, scope_values)
+        """
+        # Estado 0 = raíz; cada estado es un prefijo de alguna abreviatura
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._depth: list[int] = [0]
+        self._targets: list[Optional[list[AbbreviationTarget]]] = [None]
+        self._output: list[int] = [0]  # Estado terminal más largo que es sufijo (0 = ninguno)
+        self.size = 0
+
+        for snippet_id, abbreviation, scope_type, scope_values in entries:
+            if abbreviation:
+                self._insert(abbreviation, make_target(snippet_id, scope_type, scope_values))
+                self.size += 1
+        self._link()
+
+    def _insert(self, abbreviation: str, target: AbbreviationTarget) -> None:
+        state = 0
+        for char in abbreviation:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._depth.append(self._depth[state] + 1)
+                self._targets.append(None)
+                self._output.append(0)
+            state = following
+        if self._targets[state] is None:
+            self._targets[state] = []
+        self._targets[state].append(target)
+
+    def _link(self) -> None:
+        """Calcular enlaces de fallo y de salida en anchura."""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._output[state] = state if self._targets[state] else 0
+        for state in queue:
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(char, 0)
+                self._output[following] = (
+                    following if self._targets[following] else self._output[self._fail[following]]
+                )
+
+    def step(self, state: int, char: str) -> int:
+        """Estado tras consumir ``char``."""
+        goto = self._goto
+        while state and char not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(char, 0)
+
+    def matches(self, state: int):
+        """Estados terminales que acaban en ``state``, de más larga a más corta."""
+        terminal = self._output[state]
+        while terminal:
+            yield terminal, self._depth[terminal], self._targets[terminal]
+            terminal = self._output[self._fail[terminal]]
+
+
+class KeystrokeMatcher:
+    """
+    Estado de la palabra que se está tecleando.
+
+    Es seguro entre hilos: el autómata se puede sustituir (tras reconstruirlo en
+    segundo plano) mientras llegan pulsaciones; la palabra en curso se vuelve a
+    pasar por el autómata nuevo.
+    """
+
+    def __init__(self, automaton: Optional[AbbreviationAutomaton] = None, trigger: str = DEFAULT_TRIGGER):
+        """
+        Args:
+            automaton: Autómata inicial (vacío si no se indica)
+            trigger: Valor de ``abbreviation_trigger`` ("tab", "space" o "enter")
+        """
+        self._automaton = automaton or AbbreviationAutomaton()
+        self._trigger_key = TRIGGER_KEYS.get(trigger, TRIGGER_KEYS[DEFAULT_TRIGGER])
+        self._app: Optional[str] = None
+        self._domain: Optional[str] = None
+        self._chars: list[str] = []
+        self._states: list[int] = []
+        self._truncated = False  # Se descartó el principio de la palabra
+        self._lock = threading.Lock()
+
+    @property
+    def automaton(self) -> AbbreviationAutomaton:
+        return self._automaton
+
+    def set_automaton(self, automaton: AbbreviationAutomaton) -> None:
+        """Sustituir el autómata conservando la palabra en curso."""
+        with self._lock:
+            self._automaton = automaton
+            state = 0
+            for index, char in enumerate(self._chars):
+                state = automaton.step(state, char)
+                self._states[index] = state
+
+    def set_trigger(self, trigger: str) -> None:
+        """Cambiar la tecla de disparo (valor de ``abbreviation_trigger``)."""
+        with self._lock:
+            self._trigger_key = TRIGGER_KEYS.get(trigger, TRIGGER_KEYS[DEFAULT_TRIGGER])
+
+    def set_context(self, app: Optional[str] = None, domain: Optional[str] = None) -> None:
+        """Cambiar la app o el dominio activos (el foco cambió: se olvida la palabra)."""
+        with self._lock:
+            if (app, domain) != (self._app, self._domain):
+                self._app, self._domain = app, domain
+                self._clear()
+
+    def reset(self) -> None:
+        """Olvidar la palabra en curso (clic, cambio de campo...)."""
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._chars.clear()
+        self._states.clear()
+        self._truncated = False
+
+    def feed(self, char: str) -> Optional[KeystrokeEvent]:
+        """
+        Consumir una pulsación.
+
+        Args:
+            char: Carácter tecleado, o ``BACKSPACE``
+
+        Returns:
+            KeystrokeEvent si ``char`` es la tecla de disparo y hay abreviatura
+        """
+        with self._lock:
+            return self._feed(char)
+
+    def feed_text(self, keys: str) -> list[KeystrokeEvent]:
+        """Consumir varias pulsaciones seguidas."""
+        with self._lock:
+            return [event for event in map(self._feed, keys) if event is not None]
+
+    def _feed(self, char: str) -> Optional[KeystrokeEvent]:
+        if char == BACKSPACE:
+            if self._chars:
+                self._chars.pop()
+                self._states.pop()
+            return None
+
+        if char.isspace():
+            event = self._match(char) if char == self._trigger_key else None
+            self._clear()
+            return event
+
+        state = self._automaton.step(self._states[-1] if self._states else 0, char)
+        self._chars.append(char)
+        self._states.append(state)
+        if len(self._chars) > HISTORY_LIMIT:
+            # El autómata no necesita más contexto que la abreviatura más larga
+            del self._chars[0], self._states[0]
+            self._truncated = True
+        return None
+
+    def _match(self, trigger: str) -> Optional[KeystrokeEvent]:
+        """Abreviatura más larga en el límite de palabra que acaba en el cursor."""
+        if not self._states:
+            return None
+        chars = self._chars
+        for _, length, targets in self._automaton.matches(self._states[-1]):
+            if length > len(chars):
+                continue  # Parte de la abreviatura se borró con retroceso
+            at_boundary = (
+                not _is_word_char(chars[-length])
+                or (length == len(chars) and not self._truncated)
+                or (length < len(chars) and not _is_word_char(chars[-length - 1]))
+            )
+            if not at_boundary:
+                continue
+            target = pick_target(targets, self._app, self._domain)
+            if target is not None:
+                abbreviation = "".join(chars[-length:])
+                return KeystrokeEvent(target.snippet_id, abbreviation, trigger, length + 1)
+        return None
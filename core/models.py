@@ -4,12 +4,12 @@ Modelos de datos usando Pydantic para validación y SQLAlchemy para persistencia
 
 from datetime import datetime, UTC
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Optional, TypeVar
 from uuid import uuid4
 
 from pydantic import BaseModel, Field, field_validator, ConfigDict
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text, event
+from sqlalchemy.orm import declarative_base, deferred, relationship
 
 # SQLAlchemy Base
 Base = declarative_base()
@@ -67,8 +67,11 @@ class SnippetDB(Base):
     content_text = Column(Text, nullable=True)
     content_html = Column(Text, nullable=True)
     is_rich = Column(Boolean, default=False)
-    image_data = Column(Text, nullable=True)  # Base64 image data para snippets tipo IMAGE
-    thumbnail = Column(Text, nullable=True)  # Miniatura para snippets HTML
+    # Base64 pesado: grupo diferido "media", solo se lee en las vistas de detalle
+    image_data = deferred(Column(Text, nullable=True), group="media")  # Imagen de snippets tipo IMAGE
+    thumbnail = deferred(Column(Text, nullable=True), group="media")  # Miniatura para snippets HTML
+    # Imagen guardada en el almacén de blobs (sustituye a image_data, ver core.blobs)
+    image_blob = deferred(Column(String, ForeignKey("blobs.hash"), nullable=True, index=True), group="media")
     scope_type = Column(String, default=ScopeType.GLOBAL.value, index=True)
     scope_values = Column(Text, nullable=True)  # JSON array
     caret_marker = Column(String, default="{{|}}")
@@ -79,6 +82,35 @@ class SnippetDB(Base):
 
     # Relaciones
     variables = relationship("SnippetVariableDB", back_populates="snippet", cascade="all, delete-orphan")
+    # Filas de snippet_tags: se regeneran solas al asignar ``tags`` (ver _sync_tag_rows)
+    tag_rows = relationship("SnippetTagDB", cascade="all, delete-orphan")
+    image = relationship("BlobDB", viewonly=True)
+
+
+class SnippetTagDB(Base):
+    """Tag de un snippet (tabla normalizada a partir del CSV de ``tags``)."""
+
+    __tablename__ = "snippet_tags"
+
+    tag = Column(String, primary_key=True)  # La PK (tag, snippet_id) sirve de índice por tag
+    snippet_id = Column(String, ForeignKey("snippets.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
+def parse_tag_csv(tags: Optional[str]) -> list[str]:
+    """Tags únicos de un CSV, sin espacios alrededor ni vacíos, en orden."""
+    if not tags:
+        return []
+    return list(dict.fromkeys(tag.strip() for tag in tags.split(",") if tag.strip()))
+
+
+@event.listens_for(SnippetDB.tags, "set")
+def _sync_tag_rows(target: SnippetDB, value: Optional[str], oldvalue: Any, initiator: Any) -> None:
+    """Mantener ``snippet_tags`` al asignar el CSV (en la misma transacción)."""
+    new_tags = parse_tag_csv(value)
+    if isinstance(oldvalue, str) or oldvalue is None:
+        if parse_tag_csv(oldvalue) == new_tags:
+            return
+    target.tag_rows = [SnippetTagDB(tag=tag) for tag in new_tags]
 
 
 class SnippetVariableDB(Base):
@@ -101,6 +133,19 @@ class SnippetVariableDB(Base):
     snippet = relationship("SnippetDB", back_populates="variables")
 
 
+class BlobDB(Base):
+    """Blob del almacén direccionado por contenido (el fichero vive en disco)."""
+
+    __tablename__ = "blobs"
+
+    hash = Column(String, primary_key=True)  # SHA-256 hex del contenido binario
+    mime_type = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    # Filas de snippets y snippet_versions que lo usan; lo mantienen triggers de SQLite
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=utc_now)
+
+
 class SettingsDB(Base):
     """Tabla de configuración key-value."""
 
@@ -139,17 +184,21 @@ class SnippetVersionDB(Base):
     content_text = Column(Text, nullable=True)
     content_html = Column(Text, nullable=True)
     is_rich = Column(Boolean, default=False)
-    image_data = Column(Text, nullable=True)
-    thumbnail = Column(Text, nullable=True)
+    image_data = deferred(Column(Text, nullable=True), group="media")
+    thumbnail = deferred(Column(Text, nullable=True), group="media")
+    image_blob = deferred(Column(String, ForeignKey("blobs.hash"), nullable=True, index=True), group="media")
     scope_type = Column(String, default=ScopeType.GLOBAL.value)
     scope_values = Column(Text, nullable=True)
     caret_marker = Column(String, default="{{|}}")
     enabled = Column(Boolean, default=True)
     created_at = Column(DateTime, default=utc_now)  # Cuando se creó esta versión
     change_reason = Column(String, nullable=True)  # Razón del cambio (opcional)
+    # JSON con el delta inverso frente a la versión siguiente; NULL en las completas (ver core.versions)
+    delta = Column(Text, nullable=True)
 
     # Relaciones
     variables = relationship("SnippetVersionVariableDB", back_populates="version", cascade="all, delete-orphan")
+    image = relationship("BlobDB", viewonly=True)
 
 
 class SnippetVersionVariableDB(Base):
@@ -173,6 +222,26 @@ class SnippetVersionVariableDB(Base):
 
 
 # Modelos Pydantic (Validación y API)
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def construct_trusted(model_cls: type[ModelT], values: dict[str, Any]) -> ModelT:
+    """
+    Crear un modelo sin validar, para filas que ya se validaron al guardarse.
+
+    Más barato que ``model_construct`` porque no recorre los campos buscando
+    alias ni valores por defecto: ``values`` debe traer todos los campos del
+    modelo, en su orden y ya con su tipo (enums, listas...). Los datos que llegan
+    de la API se siguen validando con el constructor normal.
+    """
+    instance = model_cls.__new__(model_cls)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
 class SnippetVariable(BaseModel):
     """Variable dentro de un snippet."""
 
@@ -215,7 +284,7 @@ class SnippetVariable(BaseModel):
                 raise ValueError(f"Invalid regex pattern: {v}")
         return v
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 
 class Snippet(BaseModel):
@@ -296,12 +365,58 @@ class Snippet(BaseModel):
                     raise ValueError(f"Invalid domain format: {domain}")
         return v
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
     def __str__(self):
         return f"Snippet(id={self.id}, name='{self.name}', abbr='{self.abbreviation}')"
 
 
+class SnippetSummary(BaseModel):
+    """Proyección ligera de un snippet para listados (sin contenido ni imágenes)."""
+
+    id: str
+    name: str
+    abbreviation: Optional[str] = None
+    tags: list[str] = Field(default_factory=list)
+    category: Optional[str] = None
+    usage_count: int = 0
+
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
+
+
+class SnippetMatch(BaseModel):
+    """Resultado de la búsqueda fuzzy: snippet, puntuación y posiciones a resaltar."""
+
+    snippet: Snippet
+    score: float
+    field: str  # name, abbreviation, tags
+    positions: list[int] = Field(default_factory=list)  # Índices de carácter en ``field``
+
+    model_config = ConfigDict(defer_build=True)
+
+
+class SnippetTextMatch(BaseModel):
+    """Resultado de la búsqueda de texto completo, con fragmentos resaltados."""
+
+    snippet: Snippet
+    rank: float  # bm25: más negativo = más relevante
+    name_highlight: str  # Nombre con los aciertos entre marcadores
+    excerpt: str  # Fragmento del contenido alrededor de los aciertos
+
+    model_config = ConfigDict(defer_build=True)
+
+
+class BulkOutcome(BaseModel):
+    """Resultado de un elemento en create_snippets / upsert_snippets / delete_snippets."""
+
+    index: int  # Posición en la lista recibida
+    id: Optional[str] = None
+    status: str  # created, updated, deleted, not_found, error
+    error: Optional[str] = None
+
+    model_config = ConfigDict(defer_build=True)
+
+
 class SnippetVersion(BaseModel):
     """Versión histórica de un snippet."""
 
@@ -326,7 +441,7 @@ class SnippetVersion(BaseModel):
     change_reason: Optional[str] = None
     variables: list[SnippetVariable] = Field(default_factory=list)
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
     def __str__(self):
         return f"SnippetVersion(id={self.id}, snippet_id={self.snippet_id}, version={self.version_number})"
@@ -359,7 +474,12 @@ class Settings(BaseModel):
     backup_path: Optional[str] = None
     backup_frequency: int = 7  # días
 
-    model_config = ConfigDict(from_attributes=True)
+    # Historial de versiones (ver core.versions.VersionRetention)
+    version_keep_last: int = 20  # 0 = conservar todas
+    version_daily_after_days: int = 7
+    version_weekly_after_days: int = 30
+
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 
 class SnippetExport(BaseModel):
@@ -369,7 +489,7 @@ class SnippetExport(BaseModel):
     exported_at: datetime = Field(default_factory=utc_now_factory)
     snippets: list[Snippet]
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 
 class UsageLog(BaseModel):
@@ -382,4 +502,4 @@ class UsageLog(BaseModel):
     target_app: Optional[str] = None
     target_domain: Optional[str] = None
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
@@ -0,0 +1,15 @@
+"""
+Rutas de los ficheros de ApareText.
+
+No importa SQLAlchemy: el backend la usa para encontrar la instantánea de
+expansiones antes de cargar el ORM.
+"""
+
+from pathlib import Path
+
+
+def default_db_path() -> str:
+    """Ruta de la base de datos por defecto, ~/.aparetext/aparetext.db (crea el directorio)."""
+    aparetext_dir = Path.home() / ".aparetext"
+    aparetext_dir.mkdir(exist_ok=True)
+    return str(aparetext_dir / "aparetext.db")
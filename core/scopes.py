@@ -0,0 +1,146 @@
+"""
+Índice de scopes: qué snippets aplican a la app o al dominio activos.
+
+``scope_values`` se guarda como JSON en ``snippets``; este índice lo lee una vez
+y responde sin tocar la base de datos. Los dominios se guardan en un trie de
+etiquetas invertidas (``mail.google.com`` -> com, google, mail), así un snippet
+para ``google.com`` aplica también a sus subdominios.
+"""
+
+from typing import Optional, Sequence
+
+GLOBAL_SCOPES = (None, "", "global")
+
+
+def normalize_app(app: str) -> str:
+    """Nombre de app comparable (sin mayúsculas ni espacios alrededor)."""
+    return app.strip().lower()
+
+
+def domain_labels(domain: str) -> list[str]:
+    """Etiquetas de un dominio de la más general a la más concreta."""
+    labels = domain.strip().lower().rstrip(".").split(".")
+    return [label for label in reversed(labels) if label]
+
+
+def scope_matches(scope_type: str, scope_values: Sequence[str], app: Optional[str], domain: Optional[str]) -> bool:
+    """
+    Indicar si un scope aplica al contexto actual.
+
+    Sin contexto (``app`` y ``domain`` None) solo aplican los snippets globales.
+
+    Args:
+        scope_type: "global", "apps" o "domains"
+        scope_values: Apps o dominios del scope
+        app: Ejecutable o bundle de la app activa
+        domain: Dominio de la pestaña activa
+    """
+    if scope_type == "apps":
+        return app is not None and normalize_app(app) in map(normalize_app, scope_values)
+    if scope_type == "domains":
+        if domain is None:
+            return False
+        labels = domain_labels(domain)
+        return any(labels[:len(value)] == value for value in map(domain_labels, scope_values))
+    return True
+
+
+class ScopeIndex:
+    """Snippets por app y por dominio, más el conjunto de globales."""
+
+    def __init__(self):
+        self.global_ids: set[str] = set()
+        self._apps: dict[str, set[str]] = {}
+        self._domains: dict = {}  # Trie de etiquetas; la clave None guarda los IDs
+        self._scopes: dict[str, tuple[str, tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.global_ids) + len(self._scopes)
+
+    def add(self, snippet_id: str, scope_type: Optional[str], scope_values: Sequence[str] = ()) -> None:
+        """
+        Añadir (o reemplazar) el scope de un snippet.
+
+        Args:
+            snippet_id: ID del snippet
+            scope_type: "global", "apps" o "domains"
+            scope_values: Apps o dominios
+        """
+        self.remove(snippet_id)
+        if scope_type in GLOBAL_SCOPES:
+            self.global_ids.add(snippet_id)
+            return
+
+        values = tuple(scope_values)
+        self._scopes[snippet_id] = (scope_type, values)
+        if scope_type == "apps":
+            for app in values:
+                self._apps.setdefault(normalize_app(app), set()).add(snippet_id)
+        elif scope_type == "domains":
+            for domain in values:
+                node = self._domains
+                for label in domain_labels(domain):
+                    node = node.setdefault(label, {})
+                node.setdefault(None, set()).add(snippet_id)
+
+    def remove(self, snippet_id: str) -> None:
+        """Quitar un snippet (no hace nada si no estaba)."""
+        self.global_ids.discard(snippet_id)
+        scope = self._scopes.pop(snippet_id, None)
+        if scope is None:
+            return
+
+        scope_type, values = scope
+        if scope_type == "apps":
+            for app in values:
+                key = normalize_app(app)
+                ids = self._apps.get(key)
+                if ids is not None:
+                    ids.discard(snippet_id)
+                    if not ids:
+                        del self._apps[key]
+        elif scope_type == "domains":
+            for domain in values:
+                self._remove_domain(domain_labels(domain), snippet_id)
+
+    def _remove_domain(self, labels: list[str], snippet_id: str) -> None:
+        path = [self._domains]
+        for label in labels:
+            node = path[-1].get(label)
+            if node is None:
+                return
+            path.append(node)
+        ids = path[-1].get(None)
+        if ids is not None:
+            ids.discard(snippet_id)
+            if not ids:
+                del path[-1][None]
+        # Podar nodos vacíos
+        for depth in range(len(labels), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][labels[depth - 1]]
+
+    def lookup(self, app: Optional[str] = None, domain: Optional[str] = None) -> set[str]:
+        """
+        IDs con scope de app o dominio que aplica al contexto (sin los globales).
+
+        Args:
+            app: App activa
+            domain: Dominio activo; también encuentra los scopes de sus dominios padre
+        """
+        found: set[str] = set()
+        if app:
+            found.update(self._apps.get(normalize_app(app), ()))
+        if domain:
+            node = self._domains
+            for label in domain_labels(domain):
+                node = node.get(label)
+                if node is None:
+                    break
+                found.update(node.get(None, ()))
+        return found
+
+    def matches(self, snippet_id: str, context_ids: set[str]) -> bool:
+        """Indicar si un snippet es global o está en ``context_ids``."""
+        return snippet_id in self.global_ids or snippet_id in context_ids
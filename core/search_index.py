@@ -0,0 +1,136 @@
+"""
+Índice de trigramas en memoria para la búsqueda de snippets.
+
+Reproduce la semántica de ``ilike '%q%'`` de SQLite (subcadena, sin distinguir
+mayúsculas solo en ASCII) sin recorrer la tabla: cada campo indexado se
+descompone en trigramas y la consulta solo verifica los documentos de la lista
+de apariciones (posting list) más corta de sus trigramas.
+"""
+
+import string
+from array import array
+from typing import Iterable, Optional, Sequence
+
+# lower() y LIKE de SQLite solo pliegan mayúsculas ASCII
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Caracteres comodín de LIKE: una consulta que los contenga no es una subcadena literal
+LIKE_WILDCARDS = frozenset("%_")
+
+
+def fold_ascii(text: str) -> str:
+    """Pasar a minúsculas solo las letras ASCII, igual que SQLite."""
+    return text.translate(_ASCII_LOWER)
+
+
+def trigrams(text: str) -> set[str]:
+    """Trigramas distintos de un texto."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Índice invertido de trigramas sobre varios campos de texto por snippet.
+
+    Los documentos se numeran en orden de inserción y las posting lists son
+    ``array('I')`` de números de documento (4 bytes por entrada). Al actualizar o
+    borrar, el documento antiguo queda como hueco y se compacta cuando los huecos
+    superan a los documentos vivos.
+    """
+
+    # Huecos mínimos antes de plantearse compactar
+    COMPACT_MIN_DEAD = 1024
+
+    def __init__(self):
+        self._docs: list[Optional[tuple[str, tuple[str, ...]]]] = []
+        self._doc_numbers: dict[str, int] = {}
+        self._postings: dict[str, array] = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def __contains__(self, snippet_id: str) -> bool:
+        return snippet_id in self._doc_numbers
+
+    def add(self, snippet_id: str, fields: Sequence[Optional[str]]) -> None:
+        """
+        Indexar (o reindexar) un snippet.
+
+        Args:
+            snippet_id: ID del snippet
+            fields: Valores de los campos indexados (None se ignora)
+        """
+        if snippet_id in self._doc_numbers:
+            self.remove(snippet_id)
+
+        folded = tuple(fold_ascii(value) for value in fields if value)
+        doc_number = len(self._docs)
+        self._docs.append((snippet_id, folded))
+        self._doc_numbers[snippet_id] = doc_number
+
+        grams: set[str] = set()
+        for value in folded:
+            grams |= trigrams(value)
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array("I", (doc_number,))
+            else:
+                posting.append(doc_number)
+
+    def remove(self, snippet_id: str) -> None:
+        """Quitar un snippet del índice (no hace nada si no estaba)."""
+        doc_number = self._doc_numbers.pop(snippet_id, None)
+        if doc_number is None:
+            return
+        self._docs[doc_number] = None
+        self._dead += 1
+        if self._dead >= self.COMPACT_MIN_DEAD and self._dead > len(self._doc_numbers):
+            self._compact()
+
+    def search(self, query: str) -> list[str]:
+        """
+        IDs de los snippets con algún campo que contiene ``query``.
+
+        La consulta se trata como texto literal: quien llame debe descartar
+        consultas con comodines de LIKE si necesita su semántica.
+
+        Args:
+            query: Texto a buscar (no vacío)
+
+        Returns:
+            IDs en orden de indexación
+        """
+        folded = fold_ascii(query)
+        docs = self._docs
+
+        if len(folded) < 3:
+            candidates: Iterable[int] = range(len(docs))
+        else:
+            posting_lists = []
+            for gram in trigrams(folded):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return []
+                posting_lists.append(posting)
+            candidates = min(posting_lists, key=len)
+
+        matches = []
+        for doc_number in candidates:
+            doc = docs[doc_number]
+            if doc is not None and any(folded in value for value in doc[1]):
+                matches.append(doc[0])
+        return matches
+
+    def _compact(self) -> None:
+        """Renumerar documentos vivos y reconstruir las posting lists."""
+        live = [doc for doc in self._docs if doc is not None]
+        self._docs = []
+        self._doc_numbers = {}
+        self._postings = {}
+        self._dead = 0
+        for snippet_id, folded in live:
+            # Los valores ya están plegados; fold_ascii es idempotente
+            self.add(snippet_id, folded)
@@ -0,0 +1,119 @@
+"""
+Sesión de búsqueda con refinamiento incremental.
+
+Mientras el usuario sigue escribiendo ("fir" -> "firm"), todo resultado de la
+consulta nueva ya estaba en los resultados de la anterior: basta filtrarlos en
+memoria con la misma semántica que ``ilike '%q%'``. Al borrar o editar la
+consulta, al cambiar los filtros o tras una escritura se vuelve a buscar entero.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+
+from core.models import Snippet
+from core.search_index import LIKE_WILDCARDS, fold_ascii
+
+if TYPE_CHECKING:
+    from core.snippet_manager import SnippetManager
+
+# Por encima de estos resultados previos sale más barato el índice de trigramas
+REFINE_MAX_RESULTS = 2000
+
+
+def matches_query(snippet: Snippet, query_lower: str) -> bool:
+    """Indicar si ``snippet`` cumple ``ilike '%query%'`` en nombre, abreviatura o tags."""
+    for field in (snippet.name, snippet.abbreviation, ",".join(snippet.tags)):
+        if field and query_lower in fold_ascii(field):
+            return True
+    return False
+
+
+class SearchSession:
+    """
+    Búsquedas sucesivas de un mismo cuadro de búsqueda (p. ej. la paleta).
+
+    Solo refina las búsquedas por subcadena: las de texto completo se ordenan por
+    bm25 y el orden cambia con cada palabra, así que siempre se repiten enteras.
+    """
+
+    def __init__(self, manager: "SnippetManager"):
+        """
+        Args:
+            manager: Gestor sobre el que se busca
+        """
+        self.manager = manager
+        self.refined = 0
+        self.full = 0
+        self._last_query: Optional[str] = None
+        self._last_filters: Optional[tuple] = None
+        self._last_generation = -1
+        self._last_results: list[Snippet] = []
+        self._lock = threading.Lock()
+
+    def search(
+        self,
+        query: str,
+        tags: Optional[list[str]] = None,
+        scope_type: Optional[str] = None,
+        enabled_only: bool = True,
+        full_text: bool = False,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+        tag_mode: str = "any",
+    ) -> list[Snippet]:
+        """
+        Buscar como :meth:`SnippetManager.search_snippets`, refinando si se puede.
+
+        Returns:
+            Lista de snippets que coinciden, en el orden de la búsqueda completa
+            de la que se partió
+        """
+        filters = (
+            tuple(sorted(set(tags))) if tags else (),
+            scope_type,
+            enabled_only,
+            full_text,
+            app,
+            domain,
+            tag_mode,
+        )
+        with self._lock:
+            if self._can_refine(query, filters):
+                query_lower = query.lower()
+                results = [s for s in self._last_results if matches_query(s, query_lower)]
+                self.refined += 1
+            else:
+                generation = self.manager.generation
+                results = self.manager.search_snippets(
+                    query, tags, scope_type, enabled_only, full_text, app, domain, tag_mode
+                )
+                self._last_generation = generation
+                self.full += 1
+            self._last_query = query
+            self._last_filters = filters
+            self._last_results = results
+            return list(results)
+
+    def _can_refine(self, query: str, filters: tuple) -> bool:
+        """La consulta amplía la anterior con los mismos filtros y sin escrituras."""
+        previous = self._last_query
+        return (
+            previous is not None
+            and query.startswith(previous)
+            and filters == self._last_filters
+            and not filters[3]  # full_text
+            and not LIKE_WILDCARDS.intersection(query)
+            and len(self._last_results) <= REFINE_MAX_RESULTS
+            and self._last_generation == self.manager.generation
+        )
+
+    def reset(self) -> None:
+        """Olvidar la última búsqueda (la paleta se cerró)."""
+        with self._lock:
+            self._last_query = None
+            self._last_filters = None
+            self._last_results = []
+
+    def stats(self) -> dict[str, Any]:
+        """Búsquedas refinadas en memoria frente a completas."""
+        return {"refined": self.refined, "full": self.full}
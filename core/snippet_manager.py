@@ -2,30 +2,402 @@
 Gestor de snippets - CRUD y búsqueda.
 """
 
+import base64
 import json
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime, timedelta, UTC
-from typing import Optional
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+from uuid import uuid4
 
 from sqlalchemy.orm import Session
 
 from core.database import Database
 from core.models import (
-    Snippet, SnippetDB, SnippetVariable, SnippetVariableDB, UsageLogDB,
-    SnippetVersion, SnippetVersionDB, SnippetVersionVariableDB
+    BlobDB, BulkOutcome, ScopeType, Snippet, SnippetDB, SnippetMatch, SnippetSummary, SnippetTagDB, SnippetTextMatch, SnippetType,
+    SnippetVariable, SnippetVariableDB, UsageLogDB, SnippetVersion, SnippetVersionDB, SnippetVersionVariableDB,
+    VariableType, construct_trusted, parse_tag_csv, utc_now,
 )
+from core.abbreviations import AbbreviationMatch, AbbreviationTrie, pick_target
+from core.cache import LRUCache
+from core.expansions import GENERATION_SQL, make_entry, snapshot_generation, write_snapshot
+from core.fuzzy import FuzzyIndex
+from core.keystrokes import DEFAULT_TRIGGER, AbbreviationAutomaton, KeystrokeMatcher
+from core.scopes import GLOBAL_SCOPES, ScopeIndex
+from core.search_session import SearchSession
+from core.search_index import LIKE_WILDCARDS, TrigramIndex
+from core.template_parser import TemplateParser
+from core.versions import DELTA_COLUMNS, VARIABLE_COLUMNS, VersionRetention, apply_delta, encode_history
+
+# Columnas indexadas por las que se puede ordenar un listado paginado
+LIST_ORDER_COLUMNS = {
+    "usage_count": SnippetDB.usage_count,
+    "created_at": SnippetDB.created_at,
+    "name": SnippetDB.name,
+}
+
+# Columnas de la proyección "summary"
+SUMMARY_COLUMNS = (
+    SnippetDB.id,
+    SnippetDB.name,
+    SnippetDB.abbreviation,
+    SnippetDB.tags,
+    SnippetDB.category,
+    SnippetDB.usage_count,
+)
+
+MAX_PAGE_SIZE = 500
+
+# Campos que search_snippets compara con ilike (y que indexa el índice de trigramas)
+SEARCH_COLUMNS = (SnippetDB.name, SnippetDB.abbreviation, SnippetDB.tags)
+
+# Máximo de parámetros por consulta "id IN (...)" (límite seguro en cualquier SQLite)
+MAX_IN_PARAMS = 900
+
+# Columnas extra de search_snippets(full_text=True) cuando SQLite no trae FTS5
+FULL_TEXT_COLUMNS = (SnippetDB.category, SnippetDB.content_text, SnippetDB.content_html)
+
+# Campos de la búsqueda fuzzy, en el orden de SEARCH_COLUMNS
+FUZZY_FIELDS = ("name", "abbreviation", "tags")
+
+# Consultas distintas que guarda la caché de search_snippets
+SEARCH_CACHE_SIZE = 256
+
+# Caché de snippets hidratados: acotada por bytes (las imágenes ocupan megas en base64)
+SNIPPET_CACHE_SIZE = 4096
+SNIPPET_CACHE_BYTES = 32 * 1024 * 1024
+
+# Modos de search_snippets(tags=...)
+TAG_MODES = ("any", "all")
+
+# Columnas del índice de scopes
+SCOPE_COLUMNS = (SnippetDB.scope_type, SnippetDB.scope_values)
+
+# Columnas del trie de abreviaturas
+ABBREVIATION_COLUMNS = (SnippetDB.abbreviation, SnippetDB.scope_type, SnippetDB.scope_values, SnippetDB.enabled)
+
+# Columnas de la instantánea de expansiones (ver core.expansions)
+EXPANSION_COLUMNS = (
+    SnippetDB.abbreviation, SnippetDB.name, SnippetDB.snippet_type, SnippetDB.content_text,
+    SnippetDB.content_html, SnippetDB.scope_type, SnippetDB.scope_values, SnippetDB.usage_count,
+)
+
+# Snippets por transacción al compactar versiones (cada una bloquea las escrituras)
+COMPACTION_CHUNK = 100
+
+# Cada cuánto la compactación en segundo plano recorre todos los historiales
+FULL_COMPACTION_INTERVAL = timedelta(days=1)
+
+# Columnas de snippets que se copian en cada versión
+VERSIONED_COLUMNS = (
+    "name", "abbreviation", "snippet_type", "tags", "category", "content_text", "content_html", "is_rich",
+    "image_data", "image_blob", "thumbnail", "scope_type", "scope_values", "caret_marker", "enabled",
+)
+
+# Columnas leídas al hidratar filas (ver _row_values)
+SNIPPET_ROW_COLUMNS = frozenset((
+    "id", "name", "abbreviation", "snippet_type", "tags", "category", "content_text", "content_html",
+    "is_rich", "scope_type", "scope_values", "caret_marker", "usage_count", "enabled", "created_at",
+    "updated_at",
+))
+VARIABLE_ROW_COLUMNS = frozenset((
+    "id", "key", "label", "type", "placeholder", "default_value", "required", "regex", "options",
+))
+
+# Campos de una variable que update_snippet compara por key
+VARIABLE_FIELDS = ("label", "type", "placeholder", "default_value", "required", "regex", "options")
+
+
+def _row_values(row: Any, columns: frozenset) -> dict[str, Any]:
+    """
+    Valores de columna de una fila ORM.
+
+    Si están todos cargados se leen del ``__dict__`` de la fila, sin pasar por
+    los descriptores de SQLAlchemy; si la fila está expirada o tiene columnas
+    diferidas se leen con getattr (que las carga).
+    """
+    values = row.__dict__
+    if columns.issubset(values):
+        return values
+    return {column: getattr(row, column) for column in columns}
+
+
+def _chunks(items: list) -> Iterator[list]:
+    """Trozos de ``items`` que caben en una consulta "IN (...)"."""
+    for chunk_start in range(0, len(items), MAX_IN_PARAMS):
+        yield items[chunk_start:chunk_start + MAX_IN_PARAMS]
+
+
+def _snippet_size(snippet: Snippet) -> int:
+    """Bytes aproximados que ocupa un snippet hidratado."""
+    size = 1024  # Objeto, fechas y campos cortos
+    for text in (snippet.content_text, snippet.content_html, snippet.image_data, snippet.thumbnail):
+        if text:
+            size += len(text)
+    size += sum(len(tag) for tag in snippet.tags) + 256 * len(snippet.variables)
+    return size
+
+
+class _LazyIndex:
+    """
+    Índice en memoria sobre filas de ``snippets``.
+
+    Se construye en el primer uso; después solo se vuelven a leer los IDs que
+    Database notifica como modificados. El lock serializa construcción,
+    actualización y consultas entre los hilos del backend.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        factory: Callable[[], Any],
+        columns: tuple,
+        load_row: Callable[[Any, Any], None],
+    ):
+        """
+        Args:
+            db: Base de datos de la que se leen las filas
+            factory: Crea un índice vacío (con ``remove(snippet_id)``)
+            columns: Columnas a leer además de ``SnippetDB.id``
+            load_row: Añade una fila leída al índice
+        """
+        self.db = db
+        self.factory = factory
+        self.columns = columns
+        self.load_row = load_row
+        self._index = None
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def invalidate(self, snippet_ids: Optional[list[str]]) -> None:
+        """Marcar IDs pendientes (None descarta el índice entero)."""
+        with self._lock:
+            if snippet_ids is None:
+                self._index = None
+                self._pending.clear()
+            elif self._index is not None:
+                self._pending.update(snippet_ids)
+
+    def apply(self, update: Callable[[Any], None]) -> None:
+        """Aplicar ``update`` al índice si ya está construido (sin leer la base de datos)."""
+        with self._lock:
+            if self._index is not None:
+                update(self._index)
+
+    @contextmanager
+    def use(self, session: Optional[Session] = None) -> Iterator[Any]:
+        """
+        Índice al día, bloqueado mientras dure el bloque ``with``.
+
+        Args:
+            session: Sesión para leer filas; sin ella solo se abre una si hay
+                que construir o actualizar el índice
+        """
+        with self._lock:
+            if self._index is None or self._pending:
+                if session is None:
+                    with self.db.get_session() as own_session:
+                        self._refresh(own_session)
+                else:
+                    self._refresh(session)
+            yield self._index
+
+    def _refresh(self, session: Session) -> None:
+        """Construir el índice o releer los IDs pendientes (con el lock tomado)."""
+        if self._index is None:
+            index = self.factory()
+            for row in session.query(SnippetDB.id, *self.columns).yield_per(1000):
+                self.load_row(index, row)
+            self._index = index
+            self._pending.clear()
+            return
+
+        pending = list(self._pending)
+        self._pending.clear()
+        for snippet_id in pending:
+            self._index.remove(snippet_id)
+        for chunk_start in range(0, len(pending), MAX_IN_PARAMS):
+            chunk = pending[chunk_start:chunk_start + MAX_IN_PARAMS]
+            rows = session.query(SnippetDB.id, *self.columns).filter(SnippetDB.id.in_(chunk))
+            for row in rows:
+                self.load_row(self._index, row)
+
+
+class _BackgroundTask:
+    """
+    Tarea que se ejecuta en un hilo de fondo al pedirla.
+
+    Las peticiones que llegan mientras corre se agrupan en una sola ejecución
+    más, que verá todos los cambios.
+    """
+
+    def __init__(self, target: Callable[[], None], name: str):
+        """
+        Args:
+            target: Función a ejecutar
+            name: Nombre del hilo
+        """
+        self.target = target
+        self.name = name
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self) -> None:
+        """Pedir una ejecución (arranca el hilo si no está en marcha)."""
+        with self._lock:
+            self._dirty = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Esperar a que termine el hilo en curso (si hay)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        """Hilo de fondo: ejecutar mientras haya peticiones pendientes."""
+        while True:
+            with self._lock:
+                if not self._dirty:
+                    self._thread = None
+                    return
+                self._dirty = False
+            try:
+                self.target()
+            except Exception:
+                with self._lock:
+                    self._thread = None
+                raise
 
 
 class SnippetManager:
     """Gestor de operaciones CRUD para snippets."""
 
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, use_search_index: bool = True, compact_versions: bool = True):
         """
         Inicializar gestor de snippets.
 
         Args:
             db: Instancia de Database
+            use_search_index: Resolver las búsquedas con el índice de trigramas en
+                memoria en lugar de ``ilike`` sobre la tabla
+            compact_versions: Compactar el historial de versiones en segundo plano
+                (ver :meth:`compact_versions`). En memoria no se hace: cada hilo
+                vería su propia base de datos
         """
         self.db = db
+        self.use_search_index = use_search_index
+        self.background_compaction = compact_versions and db.db_path != ":memory:"
+
+        # Índices en memoria: se construyen en el primer uso y se mantienen
+        # aplicando de forma perezosa los IDs modificados desde entonces
+        self._search_index = _LazyIndex(
+            db,
+            TrigramIndex,
+            SEARCH_COLUMNS,
+            lambda index, row: index.add(row.id, (row.name, row.abbreviation, row.tags)),
+        )
+        self._fuzzy_index = _LazyIndex(
+            db,
+            lambda: FuzzyIndex(FUZZY_FIELDS),
+            SEARCH_COLUMNS + (SnippetDB.usage_count, SnippetDB.enabled),
+            lambda index, row: index.add(
+                row.id, (row.name, row.abbreviation, row.tags), row.usage_count, row.enabled
+            ),
+        )
+        self._abbreviation_index = _LazyIndex(
+            db,
+            AbbreviationTrie,
+            ABBREVIATION_COLUMNS,
+            self._load_abbreviation,
+        )
+        self._scope_index = _LazyIndex(
+            db,
+            ScopeIndex,
+            SCOPE_COLUMNS,
+            lambda index, row: index.add(
+                row.id, row.scope_type, json.loads(row.scope_values) if row.scope_values else []
+            ),
+        )
+        # Resultados recientes de search_snippets; cualquier escritura los invalida.
+        # Los usos no: sus contadores se aplican a los resultados al leerlos
+        self._search_cache = LRUCache(SEARCH_CACHE_SIZE)
+        self._usage_counts: dict[str, int] = {}
+        # Snippets hidratados por ID (get_snippet, get_snippet_by_abbreviation)
+        self._snippet_cache = LRUCache(SNIPPET_CACHE_SIZE, SNIPPET_CACHE_BYTES, _snippet_size)
+
+        # Matcher de pulsaciones: se crea en el primer uso y después se reconstruye
+        # en un hilo de fondo cuando cambian abreviaturas
+        self._keystroke_matcher: Optional[KeystrokeMatcher] = None
+        self._matcher_lock = threading.Lock()
+        # Todos los matchers vivos (el compartido y los de create_keystroke_matcher)
+        self._matchers: weakref.WeakSet[KeystrokeMatcher] = weakref.WeakSet()
+        self._matcher_trigger = DEFAULT_TRIGGER
+        # Abreviaturas del autómata actual por ID y los IDs modificados desde entonces
+        self._matcher_entries: dict[str, tuple] = {}
+        self._matcher_pending: Optional[set[str]] = set()
+        self._matcher_rebuild = _BackgroundTask(self._rebuild_matcher, "keystroke-matcher")
+
+        # Instantánea de expansiones en disco: se reescribe en segundo plano tras
+        # cada escritura que cambia su generación
+        self._expansion_lock = threading.Lock()
+        self._expansion_writer = _BackgroundTask(self.refresh_expansion_snapshot, "expansion-snapshot")
+
+        # Compactación del historial: los snippets con versiones nuevas se compactan
+        # en segundo plano, y todos una vez por FULL_COMPACTION_INTERVAL
+        self._compaction_lock = threading.Lock()
+        self._compaction_pending: set[str] = set()
+        self._last_full_compaction: Optional[datetime] = None
+        self._version_compactor = _BackgroundTask(self._compact_pending_versions, "version-compaction")
+        db.add_change_listener(self._on_snippets_changed)
+        db.add_usage_listener(self._on_usage_changed)
+
+    @property
+    def generation(self) -> int:
+        """Contador que avanza con cada escritura de snippets."""
+        return self._search_cache.generation
+
+    def _on_snippets_changed(self, snippet_ids: Optional[list[str]]) -> None:
+        """Observador de cambios de Database: invalida lo afectado de índices y cachés."""
+        self._search_cache.invalidate()
+        self._usage_counts = {}
+        self._snippet_cache.invalidate(snippet_ids)
+        self._search_index.invalidate(snippet_ids)
+        self._fuzzy_index.invalidate(snippet_ids)
+        self._abbreviation_index.invalidate(snippet_ids)
+        self._scope_index.invalidate(snippet_ids)
+        if self._keystroke_matcher is not None:
+            with self._matcher_lock:
+                if snippet_ids is None or self._matcher_pending is None:
+                    self._matcher_pending = None
+                else:
+                    self._matcher_pending.update(snippet_ids)
+            self._matcher_rebuild.schedule()
+        if self.db.expansions_path is not None:
+            self._expansion_writer.schedule()
+        if self._compaction_pending:
+            self._version_compactor.schedule()
+
+    def _on_usage_changed(self, usage_counts: dict[str, int]) -> None:
+        """Observador de uso de Database: solo cambia el orden de la búsqueda fuzzy."""
+        self._usage_counts.update(usage_counts)
+
+        def update(index: FuzzyIndex) -> None:
+            for snippet_id, usage_count in usage_counts.items():
+                index.set_usage(snippet_id, usage_count)
+
+        self._fuzzy_index.apply(update)
+
+    @staticmethod
+    def _load_abbreviation(index: AbbreviationTrie, row: Any) -> None:
+        """Añadir al trie la abreviatura de un snippet habilitado."""
+        if row.enabled and row.abbreviation:
+            scope_values = json.loads(row.scope_values) if row.scope_values else []
+            index.add(row.id, row.abbreviation, row.scope_type, scope_values)
 
     @staticmethod
     def _tags_to_string(tags: list[str]) -> Optional[str]:
@@ -48,46 +420,17 @@ class SnippetManager:
             Snippet creado con ID
         """
         with self.db.get_session() as session:
-            snippet_db = SnippetDB(
-                id=snippet.id,
-                name=snippet.name,
-                abbreviation=snippet.abbreviation,
-                snippet_type=snippet.snippet_type.value,
-                tags=self._tags_to_string(snippet.tags),
-                category=snippet.category,
-                content_text=snippet.content_text,
-                content_html=snippet.content_html,
-                is_rich=snippet.is_rich,
-                image_data=snippet.image_data,
-                thumbnail=snippet.thumbnail,
-                scope_type=snippet.scope_type.value,
-                scope_values=json.dumps(snippet.scope_values),
-                caret_marker=snippet.caret_marker,
-                usage_count=snippet.usage_count,
-                enabled=snippet.enabled,
-            )
-
+            snippet_db = SnippetDB(**self._snippet_row(session, snippet))
             session.add(snippet_db)
             session.flush()
 
             # Crear variables
-            for var in snippet.variables:
-                var_db = SnippetVariableDB(
-                    id=var.id,
-                    snippet_id=snippet_db.id,
-                    key=var.key,
-                    label=var.label,
-                    type=var.type.value,
-                    placeholder=var.placeholder,
-                    default_value=var.default_value,
-                    required=var.required,
-                    regex=var.regex,
-                    options=json.dumps(var.options) if var.options else None,
-                )
-                session.add(var_db)
+            for row in self._variable_rows(snippet):
+                session.add(SnippetVariableDB(**row))
 
             session.commit()
             session.refresh(snippet_db)
+            self.db.notify_snippets_changed([snippet_db.id])
 
             return self._db_to_pydantic(snippet_db)
 
@@ -95,25 +438,71 @@ class SnippetManager:
         """
         Obtener snippet por ID.
 
+        Los snippets leídos se guardan en una caché en memoria hasta que se
+        modifican; las lecturas repetidas no tocan SQLite.
+
         Args:
             snippet_id: ID del snippet
 
         Returns:
             Snippet o None si no existe
         """
-        from sqlalchemy.orm import selectinload
+        from sqlalchemy.orm import selectinload, undefer_group
 
+        # Dentro de un snapshot la lectura puede ser anterior a la última escritura
+        use_cache = not self.db.in_snapshot
+        if use_cache:
+            cached = self._snippet_cache.get(snippet_id)
+            if cached is not None:
+                return cached.model_copy()
+
+        generation = self._snippet_cache.generation
         with self.db.get_session() as session:
             snippet_db = (
                 session.query(SnippetDB)
-                .options(selectinload(SnippetDB.variables))
+                .options(selectinload(SnippetDB.variables), undefer_group("media"), selectinload(SnippetDB.image))
                 .filter_by(id=snippet_id)
                 .first()
             )
             if snippet_db:
-                return self._db_to_pydantic(snippet_db)
+                snippet = self._db_to_pydantic(snippet_db)
+                if use_cache:
+                    self._snippet_cache.put(snippet_id, snippet, generation)
+                return snippet.model_copy()
             return None
 
+    def get_snippet_media(self, snippet_id: str) -> Optional[dict[str, Optional[str]]]:
+        """
+        Leer solo la imagen y la miniatura de un snippet.
+
+        Los listados y búsquedas devuelven ``image_data`` y ``thumbnail`` a None
+        para no arrastrar el base64 de toda la biblioteca; esto las trae cuando
+        hacen falta (p. ej. al pintar la miniatura de un resultado visible).
+
+        Args:
+            snippet_id: ID del snippet
+
+        Returns:
+            {"image_data", "thumbnail"} o None si no existe
+        """
+        cached = None if self.db.in_snapshot else self._snippet_cache.peek(snippet_id)
+        if cached is not None:
+            return {"image_data": cached.image_data, "thumbnail": cached.thumbnail}
+
+        with self.db.get_session() as session:
+            row = (
+                session.query(SnippetDB.image_data, SnippetDB.thumbnail, BlobDB.hash, BlobDB.mime_type)
+                .outerjoin(BlobDB, BlobDB.hash == SnippetDB.image_blob)
+                .filter(SnippetDB.id == snippet_id)
+                .first()
+            )
+            if row is None:
+                return None
+            image_data = row.image_data
+            if row.hash is not None and self.db.blobs is not None:
+                image_data = self.db.blobs.data_url(row.hash, row.mime_type)
+            return {"image_data": image_data, "thumbnail": row.thumbnail}
+
     def get_all_snippets(self, enabled_only: bool = False) -> list[Snippet]:
         """
         Obtener todos los snippets.
@@ -124,18 +513,153 @@ class SnippetManager:
         Returns:
             Lista de snippets
         """
+        from sqlalchemy.orm import selectinload, undefer_group
+
+        # El gestor edita a partir de esta lista: incluye imágenes y miniaturas
         with self.db.get_session() as session:
-            query = session.query(SnippetDB)
+            query = session.query(SnippetDB).options(
+                selectinload(SnippetDB.variables), undefer_group("media"), selectinload(SnippetDB.image)
+            )
             if enabled_only:
                 query = query.filter_by(enabled=True)
 
             snippets_db = query.all()
             return [self._db_to_pydantic(s) for s in snippets_db]
 
+    def list_snippets(
+        self,
+        fields: str = "summary",
+        order_by: str = "created_at",
+        descending: bool = False,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        enabled_only: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Listar snippets por páginas con paginación keyset.
+
+        Args:
+            fields: "summary" (id, nombre, abreviatura, tags, categoría, usos) o "full"
+            order_by: Columna indexada: "usage_count", "created_at" o "name"
+            descending: Orden descendente
+            limit: Tamaño de página (máximo MAX_PAGE_SIZE)
+            cursor: Cursor opaco devuelto por la página anterior
+            enabled_only: Solo snippets habilitados
+
+        Returns:
+            Dict con 'items' (SnippetSummary o Snippet), 'next_cursor' (None en la
+            última página) y 'total' (número de snippets que cumplen el filtro)
+        """
+        if fields not in ("summary", "full"):
+            raise ValueError(f"Invalid fields projection: {fields}")
+        if order_by not in LIST_ORDER_COLUMNS:
+            raise ValueError(f"Invalid order_by: {order_by}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        column = LIST_ORDER_COLUMNS[order_by]
+
+        from sqlalchemy import func
+        from sqlalchemy.orm import selectinload
+
+        with self.db.get_session() as session:
+            base_query = session.query(SnippetDB)
+            if enabled_only:
+                base_query = base_query.filter_by(enabled=True)
+            # count() sobre la entidad envolvería todas las columnas, media incluida
+            total = base_query.with_entities(func.count(SnippetDB.id)).scalar()
+
+            if fields == "summary":
+                page_query = base_query.with_entities(*SUMMARY_COLUMNS)
+                if order_by not in ("name", "usage_count"):
+                    page_query = page_query.add_columns(column)
+            else:
+                page_query = base_query.options(selectinload(SnippetDB.variables))
+
+            if cursor:
+                page_query = page_query.filter(
+                    self._keyset_filter(column, descending, *self._decode_cursor(cursor, order_by))
+                )
+
+            if descending:
+                page_query = page_query.order_by(column.desc(), SnippetDB.id.desc())
+            else:
+                page_query = page_query.order_by(column.asc(), SnippetDB.id.asc())
+
+            rows = page_query.limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            if fields == "summary":
+                items: list[Union[SnippetSummary, Snippet]] = [
+                    SnippetSummary(
+                        id=row.id,
+                        name=row.name,
+                        abbreviation=row.abbreviation,
+                        tags=self._string_to_tags(row.tags),
+                        category=row.category,
+                        usage_count=row.usage_count or 0,
+                    )
+                    for row in rows
+                ]
+            else:
+                items = [self._db_to_pydantic(row, media=False) for row in rows]
+
+            next_cursor = None
+            if has_more and rows:
+                last = rows[-1]
+                next_cursor = self._encode_cursor(getattr(last, order_by), last.id)
+
+            return {"items": items, "next_cursor": next_cursor, "total": total}
+
+    @staticmethod
+    def _encode_cursor(value: Any, snippet_id: str) -> str:
+        """Codificar la posición (valor de orden, id) como cursor opaco."""
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = json.dumps([value, snippet_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, order_by: str) -> tuple[Any, str]:
+        """Decodificar un cursor generado por _encode_cursor."""
+        try:
+            value, snippet_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            if order_by == "created_at" and value is not None:
+                value = datetime.fromisoformat(value)
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+        return value, snippet_id
+
+    @staticmethod
+    def _keyset_filter(column, descending: bool, value: Any, snippet_id: str):
+        """
+        Condición "posterior a (value, snippet_id)" en el orden (column, id).
+
+        SQLite ordena NULL primero en ASC y último en DESC.
+        """
+        from sqlalchemy import and_, or_
+
+        if descending:
+            if value is None:
+                return and_(column.is_(None), SnippetDB.id < snippet_id)
+            return or_(
+                column < value,
+                and_(column == value, SnippetDB.id < snippet_id),
+                column.is_(None),
+            )
+        if value is None:
+            return or_(
+                and_(column.is_(None), SnippetDB.id > snippet_id),
+                column.isnot(None),
+            )
+        return or_(column > value, and_(column == value, SnippetDB.id > snippet_id))
+
     def update_snippet(self, snippet_id: str, snippet: Snippet) -> Optional[Snippet]:
         """
         Actualizar snippet existente.
 
+        Solo se escriben las columnas que cambian y las variables se actualizan
+        en su sitio por key. Guardar sin cambios no escribe nada ni crea versión.
+
         Args:
             snippet_id: ID del snippet a actualizar
             snippet: Nuevos datos del snippet
@@ -143,55 +667,95 @@ class SnippetManager:
         Returns:
             Snippet actualizado o None si no existe
         """
+        from sqlalchemy.orm import selectinload, undefer_group
+
         with self.db.get_session() as session:
-            snippet_db = session.query(SnippetDB).filter_by(id=snippet_id).first()
+            snippet_db = (
+                session.query(SnippetDB)
+                .options(selectinload(SnippetDB.variables), undefer_group("media"))
+                .filter_by(id=snippet_id)
+                .first()
+            )
             if not snippet_db:
                 return None
 
+            changes = {
+                column: value
+                for column, value in self._editable_columns(snippet).items()
+                if getattr(snippet_db, column) != value
+            }
+            image_changed = self._image_changed(snippet_db, snippet.image_data)
+            variable_rows = self._variable_rows(snippet)
+            variables_changed = self._variables_changed(snippet_db, variable_rows)
+            if not changes and not image_changed and not variables_changed:
+                return self._db_to_pydantic(snippet_db)
+
             # Guardar versión anterior antes de actualizar
             self._save_snippet_version(session, snippet_db, change_reason="Actualización manual")
 
-            # Actualizar campos
-            snippet_db.name = snippet.name
-            snippet_db.abbreviation = snippet.abbreviation
-            snippet_db.snippet_type = snippet.snippet_type.value
-            snippet_db.tags = self._tags_to_string(snippet.tags)
-            snippet_db.category = snippet.category
-            snippet_db.content_text = snippet.content_text
-            snippet_db.content_html = snippet.content_html
-            snippet_db.is_rich = snippet.is_rich
-            snippet_db.image_data = snippet.image_data
-            snippet_db.thumbnail = snippet.thumbnail
-            snippet_db.scope_type = snippet.scope_type.value
-            snippet_db.scope_values = json.dumps(snippet.scope_values)
-            snippet_db.caret_marker = snippet.caret_marker
-            snippet_db.enabled = snippet.enabled
+            if image_changed:
+                changes["image_data"], changes["image_blob"] = self._image_columns(session, snippet.image_data)
+            for column, value in changes.items():
+                setattr(snippet_db, column, value)
             snippet_db.updated_at = datetime.now(UTC)
-
-            # Eliminar variables antiguas
-            session.query(SnippetVariableDB).filter_by(snippet_id=snippet_id).delete()
-
-            # Crear nuevas variables
-            for var in snippet.variables:
-                var_db = SnippetVariableDB(
-                    id=var.id,
-                    snippet_id=snippet_db.id,
-                    key=var.key,
-                    label=var.label,
-                    type=var.type.value,
-                    placeholder=var.placeholder,
-                    default_value=var.default_value,
-                    required=var.required,
-                    regex=var.regex,
-                    options=json.dumps(var.options) if var.options else None,
-                )
-                session.add(var_db)
+            if variables_changed:
+                self._apply_variable_rows(session, snippet_db, variable_rows)
 
             session.commit()
             session.refresh(snippet_db)
+            self.db.notify_snippets_changed([snippet_id])
 
             return self._db_to_pydantic(snippet_db)
 
+    def _image_changed(self, snippet_db: SnippetDB, image_data: Optional[str]) -> bool:
+        """Indicar si ``image_data`` difiere de la imagen guardada (sin leer el blob)."""
+        if snippet_db.image_blob is not None:
+            return self.db.blobs is None or self.db.blobs.digest(image_data) != snippet_db.image_blob
+        return snippet_db.image_data != image_data
+
+    @staticmethod
+    def _variables_in_place(snippet_db: SnippetDB, rows: list[dict[str, Any]]) -> bool:
+        """
+        Indicar si las variables se pueden actualizar en su sitio por key.
+
+        Las filas se leen en orden de inserción: solo se puede si las keys son
+        únicas y las que se mantienen siguen en el mismo orden, con las nuevas al final.
+        """
+        old_keys = [var_db.key for var_db in snippet_db.variables]
+        new_keys = [row["key"] for row in rows]
+        if len(set(old_keys)) != len(old_keys) or len(set(new_keys)) != len(new_keys):
+            return False
+        kept = [key for key in old_keys if key in set(new_keys)]
+        return new_keys[:len(kept)] == kept
+
+    def _variables_changed(self, snippet_db: SnippetDB, rows: list[dict[str, Any]]) -> bool:
+        """Indicar si ``rows`` difiere de las variables guardadas (sin contar sus IDs)."""
+        if len(rows) != len(snippet_db.variables) or not self._variables_in_place(snippet_db, rows):
+            return True
+        return any(
+            var_db.key != row["key"] or any(getattr(var_db, field) != row[field] for field in VARIABLE_FIELDS)
+            for var_db, row in zip(snippet_db.variables, rows)
+        )
+
+    def _apply_variable_rows(self, session: Session, snippet_db: SnippetDB, rows: list[dict[str, Any]]) -> None:
+        """Dejar las variables de ``snippet_db`` como ``rows``, tocando solo las que cambian."""
+        if not self._variables_in_place(snippet_db, rows):
+            # Orden nuevo o keys repetidas: se reescriben todas
+            session.query(SnippetVariableDB).filter_by(snippet_id=snippet_db.id).delete()
+            session.add_all(SnippetVariableDB(**row) for row in rows)
+            return
+
+        by_key = {row["key"]: row for row in rows}
+        for var_db in list(snippet_db.variables):
+            row = by_key.pop(var_db.key, None)
+            if row is None:
+                snippet_db.variables.remove(var_db)  # delete-orphan la borra
+                continue
+            for field in VARIABLE_FIELDS:
+                if getattr(var_db, field) != row[field]:
+                    setattr(var_db, field, row[field])
+        snippet_db.variables.extend(SnippetVariableDB(**row) for row in by_key.values())
+
     def delete_snippet(self, snippet_id: str) -> bool:
         """
         Eliminar snippet.
@@ -209,32 +773,458 @@ class SnippetManager:
 
             session.delete(snippet_db)
             session.commit()
+            self.db.notify_snippets_changed([snippet_id])
             return True
 
+    def create_snippets(self, snippets: Iterable[Union[Snippet, dict]]) -> list[BulkOutcome]:
+        """
+        Crear muchos snippets en una sola transacción.
+
+        Cada elemento se valida por separado: los inválidos, los que repiten un
+        ID del lote y los que ya existen se devuelven como error sin impedir que
+        se creen los demás. Snippets, variables y tags se insertan con
+        executemany.
+
+        Args:
+            snippets: Snippets o dicts con sus campos
+
+        Returns:
+            Un BulkOutcome por elemento, en el mismo orden ("created" o "error")
+        """
+        return self._write_snippets(snippets, upsert=False)
+
+    def upsert_snippets(self, snippets: Iterable[Union[Snippet, dict]]) -> list[BulkOutcome]:
+        """
+        Crear o actualizar muchos snippets en una sola transacción.
+
+        Los que ya existen (por ID) se actualizan como con :meth:`update_snippet`,
+        guardando antes una versión; el resto se crea como en :meth:`create_snippets`.
+
+        Args:
+            snippets: Snippets o dicts con sus campos
+
+        Returns:
+            Un BulkOutcome por elemento ("created", "updated" o "error")
+        """
+        return self._write_snippets(snippets, upsert=True)
+
+    def delete_snippets(self, snippet_ids: Iterable[str]) -> list[BulkOutcome]:
+        """
+        Eliminar muchos snippets en una sola transacción.
+
+        Se borran también sus variables, tags y versiones.
+
+        Args:
+            snippet_ids: IDs a eliminar
+
+        Returns:
+            Un BulkOutcome por ID ("deleted" o "not_found")
+        """
+        from sqlalchemy import delete, select
+
+        snippet_ids = list(snippet_ids)
+        with self.db.get_session() as session:
+            existing = self._existing_ids(session, snippet_ids)
+            deleted = [snippet_id for snippet_id in dict.fromkeys(snippet_ids) if snippet_id in existing]
+            for chunk in _chunks(deleted):
+                versions = select(SnippetVersionDB.id).where(SnippetVersionDB.snippet_id.in_(chunk))
+                session.execute(delete(SnippetVersionVariableDB).where(SnippetVersionVariableDB.version_id.in_(versions)))
+                for model in (SnippetVersionDB, SnippetVariableDB, SnippetTagDB):
+                    session.execute(delete(model).where(model.snippet_id.in_(chunk)))
+                session.execute(delete(SnippetDB).where(SnippetDB.id.in_(chunk)))
+            session.commit()
+        if deleted:
+            self.db.notify_snippets_changed(deleted)
+
+        outcomes = []
+        for index, snippet_id in enumerate(snippet_ids):
+            found = snippet_id in existing
+            existing.discard(snippet_id)  # Un ID repetido solo se borra una vez
+            outcomes.append(BulkOutcome(index=index, id=snippet_id, status="deleted" if found else "not_found"))
+        return outcomes
+
+    def bulk_set_enabled(
+        self,
+        enabled: bool,
+        snippet_ids: Optional[Iterable[str]] = None,
+        where: Optional[dict[str, Any]] = None,
+        versioned: bool = False,
+    ) -> dict[str, int]:
+        """
+        Habilitar o deshabilitar muchos snippets con unas pocas sentencias UPDATE.
+
+        Args:
+            enabled: Nuevo estado
+            snippet_ids: IDs a cambiar (o bien ``where``)
+            where: Argumentos de :meth:`search_snippets` que eligen los snippets
+                (``enabled_only`` es False si no se indica)
+            versioned: Guardar antes una versión de cada snippet que cambia
+
+        Returns:
+            Dict con 'matched' (snippets elegidos) y 'changed' (los que tenían otro valor)
+        """
+        reason = "Habilitado en bloque" if enabled else "Deshabilitado en bloque"
+        return self._bulk_set_column(SnippetDB.enabled, bool(enabled), snippet_ids, where, versioned, reason)
+
+    def bulk_set_category(
+        self,
+        category: Optional[str],
+        snippet_ids: Optional[Iterable[str]] = None,
+        where: Optional[dict[str, Any]] = None,
+        versioned: bool = False,
+    ) -> dict[str, int]:
+        """
+        Cambiar la categoría de muchos snippets (None la quita).
+
+        Los argumentos y el resultado son los de :meth:`bulk_set_enabled`.
+        """
+        reason = f"Categoría en bloque: {category}" if category else "Categoría quitada en bloque"
+        return self._bulk_set_column(SnippetDB.category, category, snippet_ids, where, versioned, reason)
+
+    def bulk_add_tags(
+        self,
+        tags: list[str],
+        snippet_ids: Optional[Iterable[str]] = None,
+        where: Optional[dict[str, Any]] = None,
+        versioned: bool = False,
+    ) -> dict[str, int]:
+        """
+        Añadir tags a muchos snippets (los que ya los tienen no cambian).
+
+        Los argumentos y el resultado son los de :meth:`bulk_set_enabled`.
+        """
+        return self._bulk_edit_tags(tags, True, snippet_ids, where, versioned)
+
+    def bulk_remove_tags(
+        self,
+        tags: list[str],
+        snippet_ids: Optional[Iterable[str]] = None,
+        where: Optional[dict[str, Any]] = None,
+        versioned: bool = False,
+    ) -> dict[str, int]:
+        """
+        Quitar tags de muchos snippets.
+
+        Los argumentos y el resultado son los de :meth:`bulk_set_enabled`.
+        """
+        return self._bulk_edit_tags(tags, False, snippet_ids, where, versioned)
+
+    def _bulk_targets(
+        self, session: Session, snippet_ids: Optional[Iterable[str]], where: Optional[dict[str, Any]]
+    ) -> list[str]:
+        """IDs existentes elegidos por lista o por filtro de búsqueda (sin hidratar filas)."""
+        if (snippet_ids is None) == (where is None):
+            raise ValueError("Pass either snippet_ids or where")
+        if snippet_ids is not None:
+            snippet_ids = list(dict.fromkeys(snippet_ids))
+            existing = self._existing_ids(session, snippet_ids)
+            return [snippet_id for snippet_id in snippet_ids if snippet_id in existing]
+
+        options = {
+            "query": "", "tags": None, "scope_type": None, "enabled_only": False,
+            "full_text": False, "app": None, "domain": None, "tag_mode": "any", **where,
+        }
+        if options["tag_mode"] not in TAG_MODES:
+            raise ValueError(f"Invalid tag_mode: {options['tag_mode']}")
+        return self._search_snippets(**options, ids_only=True)
+
+    def _bulk_set_column(
+        self,
+        column: Any,
+        value: Any,
+        snippet_ids: Optional[Iterable[str]],
+        where: Optional[dict[str, Any]],
+        versioned: bool,
+        change_reason: str,
+    ) -> dict[str, int]:
+        """Poner ``column = value`` en los snippets elegidos que tienen otro valor."""
+        from sqlalchemy import update
+
+        table = SnippetDB.__table__
+        now = datetime.now(UTC)
+        changed: list[str] = []
+        with self.db.get_session() as session:
+            targets = self._bulk_targets(session, snippet_ids, where)
+            for chunk in _chunks(targets):
+                ids = [
+                    row.id for row in
+                    session.query(SnippetDB.id).filter(SnippetDB.id.in_(chunk), column.is_distinct_from(value))
+                ]
+                if not ids:
+                    continue
+                if versioned:
+                    self._save_snippet_versions(session, ids, change_reason)
+                session.execute(
+                    update(table).where(table.c.id.in_(ids)).values({column.key: value, "updated_at": now})
+                )
+                changed.extend(ids)
+            session.commit()
+
+        if changed:
+            self.db.notify_snippets_changed(changed)
+        return {"matched": len(targets), "changed": len(changed)}
+
+    def _bulk_edit_tags(
+        self,
+        tags: list[str],
+        add: bool,
+        snippet_ids: Optional[Iterable[str]],
+        where: Optional[dict[str, Any]],
+        versioned: bool,
+    ) -> dict[str, int]:
+        """Añadir (``add``) o quitar ``tags``: CSV con executemany y filas de snippet_tags por chunk."""
+        from sqlalchemy import bindparam, delete
+        from sqlalchemy.dialects.sqlite import insert
+
+        wanted = parse_tag_csv(self._tags_to_string(tags))
+        change_reason = f"Tags {'añadidos' if add else 'quitados'} en bloque: {', '.join(wanted)}"
+        table = SnippetDB.__table__
+        now = datetime.now(UTC)
+        changed: list[str] = []
+        with self.db.get_session() as session:
+            targets = self._bulk_targets(session, snippet_ids, where)
+            for chunk in _chunks(targets if wanted else []):
+                rows = []
+                for row in session.query(SnippetDB.id, SnippetDB.tags).filter(SnippetDB.id.in_(chunk)):
+                    current = parse_tag_csv(row.tags)
+                    if add:
+                        new_tags = current + [tag for tag in wanted if tag not in current]
+                    else:
+                        new_tags = [tag for tag in current if tag not in wanted]
+                    if new_tags != current:
+                        rows.append({"row_id": row.id, "tags": self._tags_to_string(new_tags), "updated_at": now})
+                if not rows:
+                    continue
+                ids = [row["row_id"] for row in rows]
+                if versioned:
+                    self._save_snippet_versions(session, ids, change_reason)
+                session.execute(table.update().where(table.c.id == bindparam("row_id")), rows)
+                # Core no pasa por _sync_tag_rows: las filas de snippet_tags se escriben aquí
+                if add:
+                    session.execute(
+                        insert(SnippetTagDB).on_conflict_do_nothing(),
+                        [{"tag": tag, "snippet_id": snippet_id} for snippet_id in ids for tag in wanted],
+                    )
+                else:
+                    session.execute(
+                        delete(SnippetTagDB).where(SnippetTagDB.snippet_id.in_(ids), SnippetTagDB.tag.in_(wanted))
+                    )
+                changed.extend(ids)
+            session.commit()
+
+        if changed:
+            self.db.notify_snippets_changed(changed)
+        return {"matched": len(targets), "changed": len(changed)}
+
+    def _write_snippets(self, items: Iterable[Union[Snippet, dict]], upsert: bool) -> list[BulkOutcome]:
+        """Validar, clasificar y guardar un lote (create_snippets / upsert_snippets)."""
+        outcomes, valid = self._validate_bulk(items)
+        created: list[Snippet] = []
+        updated: list[Snippet] = []
+        with self.db.get_session() as session:
+            existing = self._existing_ids(session, [snippet.id for _, snippet in valid])
+            for index, snippet in valid:
+                if snippet.id not in existing:
+                    created.append(snippet)
+                    outcomes[index] = BulkOutcome(index=index, id=snippet.id, status="created")
+                elif upsert:
+                    updated.append(snippet)
+                    outcomes[index] = BulkOutcome(index=index, id=snippet.id, status="updated")
+                else:
+                    outcomes[index] = BulkOutcome(
+                        index=index, id=snippet.id, status="error", error="Snippet already exists"
+                    )
+
+            if created:
+                now = utc_now()
+                rows = [
+                    {**self._snippet_row(session, snippet), "created_at": now, "updated_at": now}
+                    for snippet in created
+                ]
+                session.execute(SnippetDB.__table__.insert(), rows)
+            if updated:
+                self._update_rows(session, updated)
+            self._insert_children(session, created + updated)
+            session.commit()
+
+        if created or updated:
+            self.db.notify_snippets_changed([snippet.id for snippet in created + updated])
+        return outcomes
+
+    @staticmethod
+    def _validate_bulk(
+        items: Iterable[Union[Snippet, dict]],
+    ) -> tuple[list[Optional[BulkOutcome]], list[tuple[int, Snippet]]]:
+        """
+        Validar cada elemento de un lote.
+
+        Returns:
+            (resultados con los errores ya puestos y None en los válidos,
+            pares (posición, snippet) válidos)
+        """
+        from pydantic import ValidationError
+
+        outcomes: list[Optional[BulkOutcome]] = []
+        valid = []
+        seen = set()
+        for index, item in enumerate(items):
+            item_id = item.get("id") if isinstance(item, dict) else getattr(item, "id", None)
+            try:
+                snippet = item if isinstance(item, Snippet) else Snippet.model_validate(item)
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(str(part) for part in err['loc']) or 'snippet'}: {err['msg']}" for err in e.errors()
+                )
+                outcomes.append(BulkOutcome(index=index, id=item_id, status="error", error=error))
+                continue
+            if snippet.id in seen:
+                outcomes.append(BulkOutcome(index=index, id=snippet.id, status="error", error="Duplicate id in batch"))
+                continue
+            seen.add(snippet.id)
+            outcomes.append(None)
+            valid.append((index, snippet))
+        return outcomes, valid
+
+    @staticmethod
+    def _existing_ids(session: Session, snippet_ids: list[str]) -> set[str]:
+        """IDs de ``snippet_ids`` que existen en la tabla."""
+        existing = set()
+        for chunk in _chunks(list(set(snippet_ids))):
+            existing.update(row.id for row in session.query(SnippetDB.id).filter(SnippetDB.id.in_(chunk)))
+        return existing
+
+    def _update_rows(self, session: Session, snippets: list[Snippet]) -> None:
+        """Sobrescribir snippets existentes con executemany (versión antes, variables y tags aparte)."""
+        from sqlalchemy import bindparam, delete
+
+        snippet_ids = [snippet.id for snippet in snippets]
+        self._save_snippet_versions(session, snippet_ids, change_reason="Actualización masiva")
+
+        table = SnippetDB.__table__
+        now = datetime.now(UTC)
+        rows = []
+        for snippet in snippets:
+            row = self._snippet_row(session, snippet)
+            del row["usage_count"]  # Como update_snippet: el contador no se toca
+            row["row_id"] = row.pop("id")
+            row["updated_at"] = now
+            rows.append(row)
+        session.execute(table.update().where(table.c.id == bindparam("row_id")), rows)
+
+        for chunk in _chunks(snippet_ids):
+            for model in (SnippetVariableDB, SnippetTagDB):
+                session.execute(delete(model).where(model.snippet_id.in_(chunk)))
+
+    def _insert_children(self, session: Session, snippets: list[Snippet]) -> None:
+        """Insertar con executemany las variables y las filas de snippet_tags de un lote."""
+        variables = [row for snippet in snippets for row in self._variable_rows(snippet)]
+        if variables:
+            session.execute(SnippetVariableDB.__table__.insert(), variables)
+        # Core no pasa por _sync_tag_rows: las filas de snippet_tags se escriben aquí
+        tags = [
+            {"tag": tag, "snippet_id": snippet.id}
+            for snippet in snippets
+            for tag in parse_tag_csv(self._tags_to_string(snippet.tags))
+        ]
+        if tags:
+            session.execute(SnippetTagDB.__table__.insert(), tags)
+
     def search_snippets(
         self,
         query: str,
         tags: Optional[list[str]] = None,
         scope_type: Optional[str] = None,
         enabled_only: bool = True,
+        full_text: bool = False,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+        tag_mode: str = "any",
     ) -> list[Snippet]:
         """
         Buscar snippets.
 
         Args:
             query: Texto de búsqueda (nombre o abreviatura)
-            tags: Filtrar por tags
+            tags: Filtrar por tags exactos
             scope_type: Filtrar por tipo de scope
             enabled_only: Solo snippets habilitados
+            full_text: Buscar palabras también en categoría y contenido (FTS5),
+                con resultados ordenados por relevancia bm25
+            app: Solo snippets globales o con scope para esta app
+            domain: Solo snippets globales o con scope para este dominio (o uno padre)
+            tag_mode: "any" (algún tag de ``tags``) o "all" (todos)
 
         Returns:
-            Lista de snippets que coinciden
+            Lista de snippets que coinciden (servida desde la caché de búsquedas
+            si la misma consulta se repite sin escrituras entre medias)
+        """
+        if tag_mode not in TAG_MODES:
+            raise ValueError(f"Invalid tag_mode: {tag_mode}")
+
+        # Dentro de un snapshot la lectura puede ser anterior a la última escritura
+        use_cache = not self.db.in_snapshot
+        key = (
+            query,
+            tuple(sorted(set(tags))) if tags else (),
+            scope_type,
+            enabled_only,
+            full_text,
+            app,
+            domain,
+            tag_mode,
+        )
+        if use_cache:
+            cached = self._search_cache.get(key)
+            if cached is not None:
+                return self._with_usage(cached)
+
+        generation = self._search_cache.generation
+        results = self._search_snippets(query, tags, scope_type, enabled_only, full_text, app, domain, tag_mode)
+        if use_cache:
+            self._search_cache.put(key, results, generation)
+            return self._with_usage(results)
+        return results
+
+    def _with_usage(self, snippets: list[Snippet]) -> list[Snippet]:
+        """
+        Copias de unos resultados en caché con los contadores de uso al día.
+
+        Las copias son profundas (tags y variables incluidas): quien modifique
+        un resultado no altera la caché.
+        """
+        usage_counts = self._usage_counts
+        return [
+            snippet.model_copy(
+                update={"usage_count": usage_counts.get(snippet.id, snippet.usage_count)}, deep=True
+            )
+            for snippet in snippets
+        ]
+
+    def _search_snippets(
+        self,
+        query: str,
+        tags: Optional[list[str]],
+        scope_type: Optional[str],
+        enabled_only: bool,
+        full_text: bool,
+        app: Optional[str],
+        domain: Optional[str],
+        tag_mode: str,
+        ids_only: bool = False,
+    ) -> Union[list[Snippet], list[str]]:
+        """
+        Búsqueda sin caché (ver :meth:`search_snippets`).
+
+        Con ``ids_only`` devuelve solo los IDs, sin cargar ni hidratar filas.
         """
         with self.db.get_session() as session:
             from sqlalchemy import or_
             from sqlalchemy.orm import selectinload
 
-            db_query = session.query(SnippetDB).options(selectinload(SnippetDB.variables))
+            if ids_only:
+                db_query = session.query(SnippetDB.id, SnippetDB.scope_type)
+            else:
+                db_query = session.query(SnippetDB).options(selectinload(SnippetDB.variables))
 
             if enabled_only:
                 db_query = db_query.filter_by(enabled=True)
@@ -242,50 +1232,446 @@ class SnippetManager:
             if scope_type:
                 db_query = db_query.filter_by(scope_type=scope_type)
 
-            # Filtrar por query en la base de datos
-            if query:
+            # Filtrar por query: con el índice de trigramas si la consulta es literal
+            candidate_ids = None
+            if query and full_text and self.db.fulltext.available:
+                hits = self.db.fulltext.search(session, query, enabled_only=enabled_only)
+                candidate_ids = [hit.snippet_id for hit in hits]
+                if not candidate_ids:
+                    return []
+            elif query and full_text:
+                # SQLite sin FTS5: subcadena en las mismas columnas, sin ranking
                 query_lower = f"%{query.lower()}%"
                 db_query = db_query.filter(
-                    or_(
-                        SnippetDB.name.ilike(query_lower),
-                        SnippetDB.abbreviation.ilike(query_lower),
-                        SnippetDB.tags.ilike(query_lower),
-                    )
+                    or_(*(column.ilike(query_lower) for column in SEARCH_COLUMNS + FULL_TEXT_COLUMNS))
+                )
+            elif (
+                query
+                and self.use_search_index
+                and not self.db.snapshot_changed  # El índice aún no ve lo escrito en este snapshot
+                and not LIKE_WILDCARDS.intersection(query)
+            ):
+                # Mismo patrón que ilike: query.lower() contra los campos en minúsculas ASCII
+                with self._search_index.use(session) as index:
+                    candidate_ids = index.search(query.lower())
+                if not candidate_ids:
+                    return []
+                if len(candidate_ids) > MAX_IN_PARAMS:
+                    # Consulta poco selectiva: un solo recorrido sale más barato que muchos IN
+                    candidate_ids = None
+            if query and candidate_ids is None and not full_text:
+                query_lower = f"%{query.lower()}%"
+                db_query = db_query.filter(
+                    or_(*(column.ilike(query_lower) for column in SEARCH_COLUMNS))
                 )
 
-            # Filtrar por tags adicionales
+            # Filtrar por contexto con el índice de scopes
+            context_ids = None
+            if app is not None or domain is not None:
+                with self._scope_index.use(session) as scopes:
+                    context_ids = scopes.lookup(app, domain)
+                    if candidate_ids is not None:
+                        candidate_ids = [i for i in candidate_ids if scopes.matches(i, context_ids)]
+                        if not candidate_ids:
+                            return []
+                        context_ids = None
+                if context_ids is not None:
+                    clause = self._context_clause(context_ids)
+                    if clause is not None:
+                        db_query = db_query.filter(clause)
+                        context_ids = None
+
+            # Filtrar por tags exactos con la tabla snippet_tags
             if tags:
-                tag_filters = []
-                for tag in tags:
-                    tag_filters.append(SnippetDB.tags.like(f"%{tag}%"))
-                if tag_filters:
-                    db_query = db_query.filter(or_(*tag_filters))
+                db_query = db_query.filter(SnippetDB.id.in_(self._tag_filter(tags, tag_mode)))
+
+            if candidate_ids is None:
+                snippets_db = db_query.all()
+            else:
+                snippets_db = []
+                for chunk_start in range(0, len(candidate_ids), MAX_IN_PARAMS):
+                    chunk = candidate_ids[chunk_start:chunk_start + MAX_IN_PARAMS]
+                    snippets_db.extend(db_query.filter(SnippetDB.id.in_(chunk)).all())
+                if full_text:
+                    # Mantener el orden de relevancia de FTS
+                    position = {snippet_id: index for index, snippet_id in enumerate(candidate_ids)}
+                    snippets_db.sort(key=lambda snippet_db: position[snippet_db.id])
+            if context_ids is not None:
+                snippets_db = [s for s in snippets_db if self._in_context(s, context_ids)]
+            if ids_only:
+                return [row.id for row in snippets_db]
+            return [self._db_to_pydantic(snippet_db, media=False) for snippet_db in snippets_db]
 
-            snippets_db = db_query.all()
-            return [self._db_to_pydantic(snippet_db) for snippet_db in snippets_db]
+    @staticmethod
+    def _tag_filter(tags: list[str], tag_mode: str):
+        """Subconsulta de IDs con alguno (``any``) o todos (``all``) los tags."""
+        from sqlalchemy import func, select
 
-    def get_snippet_by_abbreviation(self, abbreviation: str) -> Optional[Snippet]:
+        wanted = list(dict.fromkeys(tags))
+        subquery = select(SnippetTagDB.snippet_id).where(SnippetTagDB.tag.in_(wanted))
+        if tag_mode == "all" and len(wanted) > 1:
+            subquery = subquery.group_by(SnippetTagDB.snippet_id).having(func.count() == len(wanted))
+        return subquery
+
+    def get_tag_facets(self, enabled_only: bool = False) -> list[dict[str, Any]]:
         """
-        Obtener snippet por abreviatura.
+        Número de snippets por tag (barra lateral del gestor), en un solo GROUP BY.
 
         Args:
-            abbreviation: Abreviatura a buscar
+            enabled_only: Contar solo snippets habilitados
 
         Returns:
-            Snippet o None si no existe
+            Lista de {"tag", "count"} de más a menos snippets
+        """
+        from sqlalchemy import func
+
+        with self.db.get_session() as session:
+            count = func.count().label("count")
+            facets = (
+                session.query(SnippetTagDB.tag, count)
+                .join(SnippetDB, SnippetDB.id == SnippetTagDB.snippet_id)
+                .group_by(SnippetTagDB.tag)
+                .order_by(count.desc(), SnippetTagDB.tag)
+            )
+            if enabled_only:
+                facets = facets.filter(SnippetDB.enabled.is_(True))
+            return [{"tag": tag, "count": total} for tag, total in facets]
+
+    @staticmethod
+    def _context_clause(context_ids: set[str]):
+        """
+        Condición SQL "global o en ``context_ids``".
+
+        Returns:
+            Condición, o None si hay demasiados IDs para un IN (filtrar con
+            :meth:`_in_context` sobre las filas)
+        """
+        from sqlalchemy import or_
+
+        if len(context_ids) > MAX_IN_PARAMS:
+            return None
+        is_global = or_(SnippetDB.scope_type.is_(None), SnippetDB.scope_type.in_(GLOBAL_SCOPES[1:]))
+        return or_(is_global, SnippetDB.id.in_(context_ids)) if context_ids else is_global
+
+    @staticmethod
+    def _in_context(snippet_db: SnippetDB, context_ids: set[str]) -> bool:
+        """Indicar si una fila es global o está en ``context_ids``."""
+        return snippet_db.scope_type in GLOBAL_SCOPES or snippet_db.id in context_ids
+
+    def get_snippets_for_context(
+        self,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+        enabled_only: bool = True,
+    ) -> list[Snippet]:
+        """
+        Snippets que aplican en la app o el dominio activos.
+
+        Incluye siempre los globales. Los dominios aplican también a sus
+        subdominios: un snippet para ``google.com`` sale en ``mail.google.com``.
+
+        Args:
+            app: Ejecutable o bundle de la app activa
+            domain: Dominio de la pestaña activa
+            enabled_only: Solo snippets habilitados
+
+        Returns:
+            Snippets ordenados por uso y nombre
         """
         from sqlalchemy.orm import selectinload
 
         with self.db.get_session() as session:
-            snippet_db = (
+            with self._scope_index.use(session) as scopes:
+                context_ids = scopes.lookup(app, domain)
+            db_query = (
                 session.query(SnippetDB)
                 .options(selectinload(SnippetDB.variables))
-                .filter_by(abbreviation=abbreviation, enabled=True)
-                .first()
+                .order_by(SnippetDB.usage_count.desc(), SnippetDB.name)
             )
-            if snippet_db:
-                return self._db_to_pydantic(snippet_db)
+            if enabled_only:
+                db_query = db_query.filter_by(enabled=True)
+            clause = self._context_clause(context_ids)
+            if clause is not None:
+                snippets_db = db_query.filter(clause).all()
+            else:
+                snippets_db = [s for s in db_query if self._in_context(s, context_ids)]
+            return [self._db_to_pydantic(snippet_db, media=False) for snippet_db in snippets_db]
+
+    def search_session(self) -> SearchSession:
+        """
+        Nueva sesión de búsqueda que refina en memoria al ampliar la consulta.
+
+        Pensada para un cuadro de búsqueda que se actualiza con cada pulsación.
+        """
+        return SearchSession(self)
+
+    def full_text_search(self, query: str, limit: int = 50, enabled_only: bool = True) -> list[SnippetTextMatch]:
+        """
+        Búsqueda de texto completo con fragmentos resaltados.
+
+        Los aciertos van entre ``core.fulltext.HIGHLIGHT_START`` y ``HIGHLIGHT_END``.
+
+        Args:
+            query: Palabras a buscar (la última como prefijo)
+            limit: Máximo de resultados
+            enabled_only: Solo snippets habilitados
+
+        Returns:
+            Resultados de más a menos relevante (vacío si SQLite no trae FTS5)
+        """
+        from sqlalchemy.orm import selectinload
+
+        if not self.db.fulltext.available:
+            return []
+
+        with self.db.get_session() as session:
+            hits = self.db.fulltext.search(session, query, limit=limit, enabled_only=enabled_only)
+            if not hits:
+                return []
+            snippets_db = (
+                session.query(SnippetDB)
+                .options(selectinload(SnippetDB.variables))
+                .filter(SnippetDB.id.in_([hit.snippet_id for hit in hits]))
+                .all()
+            )
+            by_id = {snippet_db.id: snippet_db for snippet_db in snippets_db}
+            return [
+                SnippetTextMatch(
+                    snippet=self._db_to_pydantic(by_id[hit.snippet_id], media=False),
+                    rank=hit.rank,
+                    name_highlight=hit.name_highlight,
+                    excerpt=hit.excerpt,
+                )
+                for hit in hits
+                if hit.snippet_id in by_id
+            ]
+
+    def fuzzy_search(self, query: str, limit: int = 20, enabled_only: bool = True) -> list[SnippetMatch]:
+        """
+        Búsqueda fuzzy ordenada por relevancia y uso (paleta).
+
+        Args:
+            query: Texto tecleado (subsecuencia de nombre, abreviatura o tags)
+            limit: Máximo de resultados
+            enabled_only: Solo snippets habilitados
+
+        Returns:
+            Coincidencias de mayor a menor puntuación, con las posiciones a resaltar
+        """
+        from sqlalchemy.orm import selectinload
+
+        with self.db.get_session() as session:
+            with self._fuzzy_index.use(session) as index:
+                matches = index.search(query, limit=limit, enabled_only=enabled_only)
+            if not matches:
+                return []
+
+            snippets_db = (
+                session.query(SnippetDB)
+                .options(selectinload(SnippetDB.variables))
+                .filter(SnippetDB.id.in_([match.snippet_id for match in matches]))
+                .all()
+            )
+            by_id = {snippet_db.id: snippet_db for snippet_db in snippets_db}
+            return [
+                SnippetMatch(
+                    snippet=self._db_to_pydantic(by_id[match.snippet_id], media=False),
+                    score=match.score,
+                    field=match.field,
+                    positions=match.positions,
+                )
+                for match in matches
+                if match.snippet_id in by_id
+            ]
+
+    def match_suffix(
+        self,
+        typed_buffer: str,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+    ) -> Optional[AbbreviationMatch]:
+        """
+        Abreviatura más larga en la que termina el texto tecleado.
+
+        Se resuelve con el trie en memoria: solo toca la base de datos para
+        construirlo o para releer los snippets modificados desde la última vez.
+
+        Args:
+            typed_buffer: Texto tecleado hasta el cursor
+            app: App activa (activa los snippets con scope "apps")
+            domain: Dominio activo (activa los snippets con scope "domains")
+
+        Returns:
+            AbbreviationMatch (ID del snippet y abreviatura) o None
+        """
+        with self._abbreviation_index.use() as index:
+            return index.match_suffix(typed_buffer, app=app, domain=domain)
+
+    def keystroke_matcher(self) -> KeystrokeMatcher:
+        """
+        Matcher de pulsaciones sobre todas las abreviaturas habilitadas.
+
+        La primera llamada construye el autómata; después se mantiene al día en
+        segundo plano y el matcher sigue usando el anterior mientras tanto.
+        """
+        with self._matcher_lock:
+            if self._keystroke_matcher is None:
+                automaton, self._matcher_trigger = self._load_automaton()
+                self._keystroke_matcher = KeystrokeMatcher(automaton, self._matcher_trigger)
+                self._matchers.add(self._keystroke_matcher)
+            return self._keystroke_matcher
+
+    def create_keystroke_matcher(self) -> KeystrokeMatcher:
+        """
+        Matcher de pulsaciones independiente (p. ej. uno por cliente del backend).
+
+        Tiene su propia palabra en curso y su propio contexto, comparte el autómata
+        con :meth:`keystroke_matcher` y se mantiene al día igual mientras alguien
+        guarde una referencia.
+        """
+        shared = self.keystroke_matcher()
+        with self._matcher_lock:
+            matcher = KeystrokeMatcher(shared.automaton, self._matcher_trigger)
+            self._matchers.add(matcher)
+        return matcher
+
+    def wait_for_keystroke_matcher(self, timeout: Optional[float] = None) -> None:
+        """Esperar a que termine la reconstrucción en curso del matcher (si hay)."""
+        self._matcher_rebuild.wait(timeout)
+
+    def _load_automaton(self) -> tuple[AbbreviationAutomaton, str]:
+        """Construir el autómata y leer la tecla de disparo."""
+        with self.db.get_session() as session:
+            rows = (
+                session.query(SnippetDB.id, *ABBREVIATION_COLUMNS)
+                .filter(SnippetDB.enabled.is_(True), SnippetDB.abbreviation.isnot(None))
+                .yield_per(1000)
+            )
+            entries = {
+                row.id: (row.abbreviation, row.scope_type, row.scope_values) for row in rows if row.abbreviation
+            }
+        self._matcher_entries = entries
+        automaton = AbbreviationAutomaton(
+            (snippet_id, abbreviation, scope_type, json.loads(scope_values) if scope_values else [])
+            for snippet_id, (abbreviation, scope_type, scope_values) in entries.items()
+        )
+        return automaton, self.db.get_setting("abbreviation_trigger", DEFAULT_TRIGGER)
+
+    def _rebuild_matcher(self) -> None:
+        """
+        Poner al día el matcher (en el hilo de fondo).
+
+        El autómata solo se reconstruye si cambió la abreviatura, el scope o el
+        estado de algún snippet modificado; editar el contenido no lo toca.
+        """
+        with self._matcher_lock:
+            pending, self._matcher_pending = self._matcher_pending, set()
+        automaton = None
+        if pending is None or self._matcher_entries_changed(pending):
+            automaton, trigger = self._load_automaton()
+        else:
+            trigger = self.db.get_setting("abbreviation_trigger", DEFAULT_TRIGGER)
+        with self._matcher_lock:
+            self._matcher_trigger = trigger
+            for matcher in list(self._matchers):
+                if automaton is not None:
+                    matcher.set_automaton(automaton)
+                matcher.set_trigger(trigger)
+
+    def _matcher_entries_changed(self, snippet_ids: set[str]) -> bool:
+        """Indicar si alguno de los snippets cambió respecto al autómata actual."""
+        current = {}
+        with self.db.get_session() as session:
+            for chunk in _chunks(list(snippet_ids)):
+                rows = session.query(SnippetDB.id, *ABBREVIATION_COLUMNS).filter(SnippetDB.id.in_(chunk))
+                for row in rows:
+                    if row.enabled and row.abbreviation:
+                        current[row.id] = (row.abbreviation, row.scope_type, row.scope_values)
+        return any(current.get(snippet_id) != self._matcher_entries.get(snippet_id) for snippet_id in snippet_ids)
+
+    def refresh_expansion_snapshot(self, force: bool = False) -> bool:
+        """
+        Reescribir la instantánea de expansiones si no está al día.
+
+        Compara la generación de la base de datos con la del fichero, así los
+        cambios de uso (que no la mueven) no reescriben nada.
+
+        Args:
+            force: Reescribirla aunque esté al día
+
+        Returns:
+            True si se escribió (False también con bases de datos en memoria)
+        """
+        path = self.db.expansions_path
+        if path is None:
+            return False
+        with self._expansion_lock, self.db.get_session() as session:
+            generation = session.connection().exec_driver_sql(GENERATION_SQL).scalar()
+            if not force and snapshot_generation(path) == generation:
+                return False
+            rows = (
+                session.query(SnippetDB.id, *EXPANSION_COLUMNS)
+                .filter(SnippetDB.enabled.is_(True), SnippetDB.abbreviation.isnot(None))
+                .all()
+            )
+            by_usage = sorted(rows, key=lambda row: -(row.usage_count or 0))
+            ranks = {row.id: rank for rank, row in enumerate(by_usage, 1)}
+            parser = TemplateParser()
+            entries = [
+                make_entry(
+                    parser,
+                    row.id,
+                    row.abbreviation,
+                    row.name,
+                    row.snippet_type,
+                    row.content_text or row.content_html or "",
+                    row.scope_type,
+                    json.loads(row.scope_values) if row.scope_values else [],
+                    ranks[row.id],
+                )
+                for row in rows
+                if row.abbreviation
+            ]
+            write_snapshot(path, generation, entries)
+        return True
+
+    def wait_for_expansion_snapshot(self, timeout: Optional[float] = None) -> None:
+        """Esperar a que termine la reescritura en curso de la instantánea (si hay)."""
+        self._expansion_writer.wait(timeout)
+
+    def get_snippet_by_abbreviation(
+        self,
+        abbreviation: str,
+        app: Optional[str] = None,
+        domain: Optional[str] = None,
+    ) -> Optional[Snippet]:
+        """
+        Obtener snippet habilitado por abreviatura.
+
+        La abreviatura se resuelve con el trie en memoria y el snippet sale de la
+        caché de :meth:`get_snippet`.
+
+        Args:
+            abbreviation: Abreviatura a buscar
+            app: Con contexto, solo snippets que aplican en esta app
+            domain: Con contexto, solo snippets que aplican en este dominio
+
+        Returns:
+            Snippet o None si no existe. Un snippet con scope específico que aplica
+            al contexto gana a uno global con la misma abreviatura; sin contexto
+            se prefiere el global.
+        """
+        with self._abbreviation_index.use() as index:
+            targets = index.lookup(abbreviation)
+        if not targets:
             return None
+        if app is None and domain is None:
+            target = pick_target(targets, None, None) or targets[0]
+        else:
+            target = pick_target(targets, app, domain)
+            if target is None:
+                return None
+        return self.get_snippet(target.snippet_id)
 
     def increment_usage(self, snippet_id: str) -> None:
         """
@@ -294,11 +1680,24 @@ class SnippetManager:
         Args:
             snippet_id: ID del snippet
         """
+        cached = self._snippet_cache.peek(snippet_id)
         with self.db.get_session() as session:
             snippet_db = session.query(SnippetDB).filter_by(id=snippet_id).first()
             if snippet_db:
+                previous_update = snippet_db.updated_at
                 snippet_db.usage_count += 1
                 session.commit()
+                # Aviso aparte: el uso no toca texto indexado, abreviaturas ni FTS
+                self.db.notify_usage_changed({snippet_id: snippet_db.usage_count})
+                if cached is not None and cached.updated_at == previous_update:
+                    # Solo cambió el contador: la copia en caché sigue sirviendo
+                    self._snippet_cache.put(
+                        snippet_id,
+                        cached.model_copy(
+                            update={"usage_count": snippet_db.usage_count, "updated_at": snippet_db.updated_at}
+                        ),
+                        self._snippet_cache.generation,
+                    )
 
     def log_usage(
         self,
@@ -329,6 +1728,15 @@ class SnippetManager:
         # Incrementar contador
         self.increment_usage(snippet_id)
 
+    def get_cache_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Contadores de las cachés en memoria (aciertos, fallos, tamaño).
+
+        Returns:
+            Diccionario con una entrada por caché
+        """
+        return {"search": self._search_cache.stats(), "snippets": self._snippet_cache.stats()}
+
     def get_usage_stats(self, snippet_id: Optional[str] = None) -> dict:
         """
         Obtener estadísticas de uso avanzadas.
@@ -339,10 +1747,12 @@ class SnippetManager:
         Returns:
             Diccionario con estadísticas avanzadas
         """
+        from sqlalchemy import func
+
         with self.db.get_session() as session:
-            # Estadísticas básicas usando count() en lugar de cargar todos los registros
-            total_snippets = session.query(SnippetDB).count()
-            enabled_snippets = session.query(SnippetDB).filter_by(enabled=True).count()
+            # Estadísticas básicas con count(id): sin cargar registros ni tocar las columnas de media
+            total_snippets = session.query(func.count(SnippetDB.id)).scalar()
+            enabled_snippets = session.query(func.count(SnippetDB.id)).filter(SnippetDB.enabled.is_(True)).scalar()
             
             # Query base para logs de uso
             usage_query = session.query(UsageLogDB)
@@ -463,28 +1873,30 @@ class SnippetManager:
                 for month, count in sorted(monthly_counts.items())
             ]
 
-            # Top snippets por uso
+            # Top snippets por uso: recuento y datos del snippet en una sola consulta
             if not snippet_id:
-                snippet_usage = {}
-                for log in session.query(UsageLogDB).all():
-                    snippet_usage[log.snippet_id] = snippet_usage.get(log.snippet_id, 0) + 1
-
-                # Obtener detalles de los snippets más usados
-                top_snippet_ids = sorted(snippet_usage.items(), key=lambda x: x[1], reverse=True)[:10]
-                for top_snippet_id, usage_count in top_snippet_ids:
-                    snippet = session.query(SnippetDB).filter_by(id=top_snippet_id).first()
-                    if snippet:
-                        stats["top_snippets"].append({
-                            "id": snippet.id,
-                            "name": snippet.name,
-                            "abbreviation": snippet.abbreviation,
-                            "usage_count": usage_count,
-                            "category": snippet.category
-                        })
+                uses = func.count(UsageLogDB.id).label("uses")
+                top_rows = (
+                    session.query(SnippetDB.id, SnippetDB.name, SnippetDB.abbreviation, SnippetDB.category, uses)
+                    .join(UsageLogDB, UsageLogDB.snippet_id == SnippetDB.id)
+                    .group_by(SnippetDB.id)
+                    .order_by(uses.desc())
+                    .limit(10)
+                    .all()
+                )
+                stats["top_snippets"] = [
+                    {
+                        "id": row.id,
+                        "name": row.name,
+                        "abbreviation": row.abbreviation,
+                        "usage_count": row.uses,
+                        "category": row.category,
+                    }
+                    for row in top_rows
+                ]
 
             # Estadísticas por categoría (usando consulta SQL eficiente)
             if not snippet_id:
-                from sqlalchemy import func
                 category_counts = {}
                 category_results = session.query(
                     SnippetDB.category,
@@ -499,7 +1911,7 @@ class SnippetManager:
             # Estadísticas de versiones
             if not snippet_id:
                 # Total de versiones guardadas
-                total_versions = session.query(SnippetVersionDB).count()
+                total_versions = session.query(func.count(SnippetVersionDB.id)).scalar()
                 stats["version_stats"] = {
                     "total_versions": total_versions,
                     "avg_versions_per_snippet": total_versions / max(total_snippets, 1)
@@ -507,8 +1919,7 @@ class SnippetManager:
 
             # Actividad reciente (últimos 7 días)
             week_ago = datetime.now(UTC) - timedelta(days=7)
-            recent_logs = session.query(UsageLogDB).filter(UsageLogDB.timestamp >= week_ago).all()
-            stats["recent_activity"] = len(recent_logs)
+            stats["recent_activity"] = session.query(UsageLogDB).filter(UsageLogDB.timestamp >= week_ago).count()
 
             # Métricas de productividad
             if logs:
@@ -524,45 +1935,143 @@ class SnippetManager:
 
             return stats
 
-    def _db_to_pydantic(self, snippet_db: SnippetDB) -> Snippet:
-        """Convertir modelo SQLAlchemy a Pydantic."""
-        variables = [
-            SnippetVariable(
-                id=var.id,
-                snippet_id=var.snippet_id,
-                key=var.key,
-                label=var.label,
-                type=var.type,
-                placeholder=var.placeholder,
-                default_value=var.default_value,
-                required=var.required,
-                regex=var.regex,
-                options=json.loads(var.options) if var.options else None,
-            )
-            for var in snippet_db.variables
+    def _media_values(self, row: Any, load: bool) -> tuple[Optional[str], Optional[str]]:
+        """
+        ``image_data`` y ``thumbnail`` de una fila (columnas diferidas, grupo "media").
+
+        Con ``load`` False no se lanza ninguna consulta: si la consulta no las pidió
+        con ``undefer_group("media")`` se devuelven como None. Las imágenes del
+        almacén de blobs se sirven como data URL leyendo el fichero con mmap.
+        """
+        if not load:
+            loaded = row.__dict__
+            return loaded.get("image_data"), loaded.get("thumbnail")
+        image_data = row.image_data
+        if row.image_blob is not None:
+            blob = row.image
+            if blob is not None and self.db.blobs is not None:
+                image_data = self.db.blobs.data_url(blob.hash, blob.mime_type)
+        return image_data, row.thumbnail
+
+    def _snippet_row(self, session: Session, snippet: Snippet) -> dict[str, Any]:
+        """Valores de columna de ``snippets`` para guardar un snippet recibido."""
+        image_data, image_blob = self._image_columns(session, snippet.image_data)
+        return {
+            "id": snippet.id,
+            **self._editable_columns(snippet),
+            "image_data": image_data,
+            "image_blob": image_blob,
+            "usage_count": snippet.usage_count,
+        }
+
+    def _editable_columns(self, snippet: Snippet) -> dict[str, Any]:
+        """Columnas de ``snippets`` que se editan (sin ID, imagen ni contador de usos)."""
+        return {
+            "name": snippet.name,
+            "abbreviation": snippet.abbreviation,
+            "snippet_type": snippet.snippet_type.value,
+            "tags": self._tags_to_string(snippet.tags),
+            "category": snippet.category,
+            "content_text": snippet.content_text,
+            "content_html": snippet.content_html,
+            "is_rich": snippet.is_rich,
+            "thumbnail": snippet.thumbnail,
+            "scope_type": snippet.scope_type.value,
+            "scope_values": json.dumps(snippet.scope_values),
+            "caret_marker": snippet.caret_marker,
+            "enabled": snippet.enabled,
+        }
+
+    @staticmethod
+    def _variable_rows(snippet: Snippet) -> list[dict[str, Any]]:
+        """Filas de ``snippet_variables`` de un snippet recibido."""
+        return [
+            {
+                "id": var.id,
+                "snippet_id": snippet.id,
+                "key": var.key,
+                "label": var.label,
+                "type": var.type.value,
+                "placeholder": var.placeholder,
+                "default_value": var.default_value,
+                "required": var.required,
+                "regex": var.regex,
+                "options": json.dumps(var.options) if var.options else None,
+            }
+            for var in snippet.variables
         ]
 
-        return Snippet(
-            id=snippet_db.id,
-            name=snippet_db.name,
-            abbreviation=snippet_db.abbreviation,
-            snippet_type=snippet_db.snippet_type,
-            tags=self._string_to_tags(snippet_db.tags),
-            category=snippet_db.category,
-            content_text=snippet_db.content_text,
-            content_html=snippet_db.content_html,
-            is_rich=snippet_db.is_rich,
-            image_data=snippet_db.image_data,
-            thumbnail=snippet_db.thumbnail,
-            scope_type=snippet_db.scope_type,
-            scope_values=json.loads(snippet_db.scope_values) if snippet_db.scope_values else [],
-            caret_marker=snippet_db.caret_marker,
-            variables=variables,
-            usage_count=snippet_db.usage_count,
-            enabled=snippet_db.enabled,
-            created_at=snippet_db.created_at,
-            updated_at=snippet_db.updated_at,
-        )
+    def _image_columns(self, session: Session, image_data: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+        """
+        Valores de (image_data, image_blob) para guardar una imagen recibida.
+
+        Los data URL en base64 van al almacén de blobs; el resto (o todo, si la
+        base de datos está en memoria) se guarda en línea como antes.
+        """
+        if self.db.blobs is not None:
+            digest = self.db.blobs.store(session, image_data)
+            if digest is not None:
+                return None, digest
+        return image_data, None
+
+    @classmethod
+    def _variable_from_db(cls, var_db: Any, snippet_id: Optional[str]) -> SnippetVariable:
+        """Hidratar una variable de snippet sin revalidarla."""
+        return cls._variable_from_values(_row_values(var_db, VARIABLE_ROW_COLUMNS), snippet_id)
+
+    @staticmethod
+    def _variable_from_values(row: dict[str, Any], snippet_id: Optional[str]) -> SnippetVariable:
+        """Hidratar una variable desde sus valores de columna (las de versiones delta no traen ID)."""
+        return construct_trusted(SnippetVariable, {
+            "id": row.get("id") or str(uuid4()),
+            "snippet_id": snippet_id,
+            "key": row["key"],
+            "label": row["label"],
+            "type": VariableType(row["type"]) if row["type"] else VariableType.TEXT,
+            "placeholder": row["placeholder"],
+            "default_value": row["default_value"],
+            "required": bool(row["required"]),
+            "regex": row["regex"],
+            "options": json.loads(row["options"]) if row["options"] else None,
+        })
+
+    def _db_to_pydantic(self, snippet_db: SnippetDB, media: bool = True) -> Snippet:
+        """
+        Convertir modelo SQLAlchemy a Pydantic.
+
+        Las filas se validaron al escribirse, así que no se vuelven a validar
+        (ver construct_trusted); lo que llega de la API sigue pasando por
+        ``Snippet(...)``.
+
+        Args:
+            snippet_db: Fila a convertir
+            media: Cargar ``image_data`` y ``thumbnail`` si la consulta no lo hizo.
+                Los listados pasan False: quedan a None y se piden aparte con
+                :meth:`get_snippet_media` o :meth:`get_snippet`
+        """
+        row = _row_values(snippet_db, SNIPPET_ROW_COLUMNS)
+        image_data, thumbnail = self._media_values(snippet_db, media)
+        return construct_trusted(Snippet, {
+            "id": row["id"],
+            "name": row["name"],
+            "abbreviation": row["abbreviation"],
+            "snippet_type": SnippetType(row["snippet_type"]) if row["snippet_type"] else SnippetType.TEXT,
+            "tags": self._string_to_tags(row["tags"]),
+            "category": row["category"],
+            "content_text": row["content_text"],
+            "content_html": row["content_html"],
+            "is_rich": bool(row["is_rich"]),
+            "image_data": image_data,
+            "thumbnail": thumbnail,
+            "scope_type": ScopeType(row["scope_type"]) if row["scope_type"] else ScopeType.GLOBAL,
+            "scope_values": json.loads(row["scope_values"]) if row["scope_values"] else [],
+            "caret_marker": row["caret_marker"],
+            "variables": [self._variable_from_db(var, snippet_db.id) for var in snippet_db.variables],
+            "usage_count": row["usage_count"] or 0,
+            "enabled": bool(row["enabled"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        })
 
     def _save_snippet_version(self, session: Session, snippet_db: SnippetDB, change_reason: Optional[str] = None):
         """
@@ -570,56 +2079,63 @@ class SnippetManager:
 
         Args:
             session: Sesión de base de datos
-            snippet_db: Snippet a versionar
+            snippet_db: Snippet a versionar (sin cambios pendientes: se copia la fila guardada)
             change_reason: Razón del cambio (opcional)
         """
-        # Obtener el número de versión más alto para este snippet
-        max_version = session.query(SnippetVersionDB.version_number)\
-            .filter_by(snippet_id=snippet_db.id)\
-            .order_by(SnippetVersionDB.version_number.desc())\
-            .first()
-
-        next_version = (max_version[0] + 1) if max_version else 1
-
-        # Crear nueva versión
-        version_db = SnippetVersionDB(
-            snippet_id=snippet_db.id,
-            version_number=next_version,
-            name=snippet_db.name,
-            abbreviation=snippet_db.abbreviation,
-            snippet_type=snippet_db.snippet_type,
-            tags=snippet_db.tags,
-            category=snippet_db.category,
-            content_text=snippet_db.content_text,
-            content_html=snippet_db.content_html,
-            is_rich=snippet_db.is_rich,
-            image_data=snippet_db.image_data,
-            thumbnail=snippet_db.thumbnail,
-            scope_type=snippet_db.scope_type,
-            scope_values=snippet_db.scope_values,
-            caret_marker=snippet_db.caret_marker,
-            enabled=snippet_db.enabled,
-            created_at=datetime.now(UTC),
-            change_reason=change_reason
-        )
+        self._save_snippet_versions(session, [snippet_db.id], change_reason)
+
+    def _save_snippet_versions(
+        self,
+        session: Session,
+        snippet_ids: list[str],
+        change_reason: Optional[str] = None,
+    ) -> None:
+        """
+        Guardar una versión de muchos snippets antes de actualizarlos.
 
-        session.add(version_db)
-        session.flush()  # Para obtener el ID
-
-        # Guardar variables de la versión
-        for var_db in snippet_db.variables:
-            version_var_db = SnippetVersionVariableDB(
-                version_id=version_db.id,
-                key=var_db.key,
-                label=var_db.label,
-                type=var_db.type,
-                placeholder=var_db.placeholder,
-                default_value=var_db.default_value,
-                required=var_db.required,
-                regex=var_db.regex,
-                options=var_db.options,
+        Con consultas por lotes e inserciones executemany. Las versiones se
+        guardan completas; la compactación en segundo plano las codifica como
+        deltas (ver :meth:`compact_versions`).
+        """
+        from sqlalchemy import func, select
+
+        snippets_table = SnippetDB.__table__
+        variables_table = SnippetVariableDB.__table__
+        now = datetime.now(UTC)
+        versions = []
+        version_variables = []
+        for chunk in _chunks(snippet_ids):
+            latest = dict(
+                session.query(SnippetVersionDB.snippet_id, func.max(SnippetVersionDB.version_number))
+                .filter(SnippetVersionDB.snippet_id.in_(chunk))
+                .group_by(SnippetVersionDB.snippet_id)
             )
-            session.add(version_var_db)
+            version_ids = {}
+            for row in session.execute(select(snippets_table).where(snippets_table.c.id.in_(chunk))).mappings():
+                version_ids[row["id"]] = version_id = str(uuid4())
+                versions.append({
+                    "id": version_id,
+                    "snippet_id": row["id"],
+                    "version_number": latest.get(row["id"], 0) + 1,
+                    **{column: row[column] for column in VERSIONED_COLUMNS},
+                    "created_at": now,
+                    "change_reason": change_reason,
+                })
+            variables = select(variables_table).where(variables_table.c.snippet_id.in_(chunk))
+            for row in session.execute(variables).mappings():
+                version_variables.append({
+                    "id": str(uuid4()),
+                    "version_id": version_ids[row["snippet_id"]],
+                    **{column: row[column] for column in VARIABLE_ROW_COLUMNS - {"id"}},
+                })
+        if versions:
+            session.execute(SnippetVersionDB.__table__.insert(), versions)
+        if version_variables:
+            session.execute(SnippetVersionVariableDB.__table__.insert(), version_variables)
+        # Se guardan completas; la compactación las pasa a deltas tras el commit
+        if self.background_compaction:
+            with self._compaction_lock:
+                self._compaction_pending.update(snippet_ids)
 
     def get_snippet_versions(self, snippet_id: str) -> list[SnippetVersion]:
         """
@@ -629,57 +2145,12 @@ class SnippetManager:
             snippet_id: ID del snippet
 
         Returns:
-            Lista de versiones ordenadas por número de versión descendente
+            Lista de versiones ordenadas por número de versión descendente, sin
+            ``image_data`` ni ``thumbnail`` (columnas diferidas)
         """
         with self.db.get_session() as session:
-            version_dbs = session.query(SnippetVersionDB)\
-                .filter_by(snippet_id=snippet_id)\
-                .order_by(SnippetVersionDB.version_number.desc())\
-                .all()
-
-            versions = []
-            for version_db in version_dbs:
-                # Obtener variables de la versión
-                variables = [
-                    SnippetVariable(
-                        id=var.id,
-                        key=var.key,
-                        label=var.label,
-                        type=var.type,
-                        placeholder=var.placeholder,
-                        default_value=var.default_value,
-                        required=var.required,
-                        regex=var.regex,
-                        options=json.loads(var.options) if var.options else None,
-                    )
-                    for var in version_db.variables
-                ]
-
-                version = SnippetVersion(
-                    id=version_db.id,
-                    snippet_id=version_db.snippet_id,
-                    version_number=version_db.version_number,
-                    name=version_db.name,
-                    abbreviation=version_db.abbreviation,
-                    snippet_type=version_db.snippet_type,
-                    tags=self._string_to_tags(version_db.tags),
-                    category=version_db.category,
-                    content_text=version_db.content_text,
-                    content_html=version_db.content_html,
-                    is_rich=version_db.is_rich,
-                    image_data=version_db.image_data,
-                    thumbnail=version_db.thumbnail,
-                    scope_type=version_db.scope_type,
-                    scope_values=json.loads(version_db.scope_values) if version_db.scope_values else [],
-                    caret_marker=version_db.caret_marker,
-                    enabled=version_db.enabled,
-                    created_at=version_db.created_at,
-                    change_reason=version_db.change_reason,
-                    variables=variables
-                )
-                versions.append(version)
-
-            return versions
+            history = self._version_histories(session, [snippet_id]).get(snippet_id, [])
+        return [self._version_to_pydantic(row, state) for row, state in history]
 
     def restore_snippet_version(self, snippet_id: str, version_id: str) -> Optional[Snippet]:
         """
@@ -693,13 +2164,12 @@ class SnippetManager:
             Snippet restaurado o None si no existe
         """
         with self.db.get_session() as session:
-            # Obtener la versión
-            version_db = session.query(SnippetVersionDB)\
-                .filter_by(id=version_id, snippet_id=snippet_id)\
-                .first()
-
-            if not version_db:
+            # Reconstruir la versión (puede estar guardada como delta)
+            history = self._version_histories(session, [snippet_id], media=True).get(snippet_id, [])
+            found = next(((row, state) for row, state in history if row["id"] == version_id), None)
+            if found is None:
                 return None
+            version_row, state = found
 
             # Obtener el snippet actual
             snippet_db = session.query(SnippetDB).filter_by(id=snippet_id).first()
@@ -707,43 +2177,197 @@ class SnippetManager:
                 return None
 
             # Guardar versión actual antes de restaurar
-            self._save_snippet_version(session, snippet_db, change_reason=f"Restauración a versión {version_db.version_number}")
+            self._save_snippet_version(
+                session, snippet_db, change_reason=f"Restauración a versión {version_row['version_number']}"
+            )
 
             # Restaurar datos desde la versión
-            snippet_db.name = version_db.name
-            snippet_db.abbreviation = version_db.abbreviation
-            snippet_db.snippet_type = version_db.snippet_type
-            snippet_db.tags = version_db.tags
-            snippet_db.category = version_db.category
-            snippet_db.content_text = version_db.content_text
-            snippet_db.content_html = version_db.content_html
-            snippet_db.is_rich = version_db.is_rich
-            snippet_db.image_data = version_db.image_data
-            snippet_db.thumbnail = version_db.thumbnail
-            snippet_db.scope_type = version_db.scope_type
-            snippet_db.scope_values = version_db.scope_values
-            snippet_db.caret_marker = version_db.caret_marker
-            snippet_db.enabled = version_db.enabled
+            snippet_db.name = version_row["name"]
+            snippet_db.image_blob = version_row["image_blob"]
+            for column in DELTA_COLUMNS:
+                setattr(snippet_db, column, state[column])
             snippet_db.updated_at = datetime.now(UTC)
 
             # Restaurar variables
             session.query(SnippetVariableDB).filter_by(snippet_id=snippet_id).delete()
-
-            for version_var_db in version_db.variables:
-                var_db = SnippetVariableDB(
-                    snippet_id=snippet_db.id,
-                    key=version_var_db.key,
-                    label=version_var_db.label,
-                    type=version_var_db.type,
-                    placeholder=version_var_db.placeholder,
-                    default_value=version_var_db.default_value,
-                    required=version_var_db.required,
-                    regex=version_var_db.regex,
-                    options=version_var_db.options,
-                )
-                session.add(var_db)
+            for var in state["variables"]:
+                session.add(SnippetVariableDB(snippet_id=snippet_id, **{key: var[key] for key in VARIABLE_COLUMNS}))
 
             session.commit()
             session.refresh(snippet_db)
+            self.db.notify_snippets_changed([snippet_id])
 
             return self._db_to_pydantic(snippet_db)
+
+    def compact_versions(
+        self,
+        snippet_ids: Optional[Iterable[str]] = None,
+        retention: Optional[VersionRetention] = None,
+        now: Optional[datetime] = None,
+    ) -> dict[str, int]:
+        """
+        Aplicar la retención y codificar como deltas el historial de versiones.
+
+        Borra las versiones que la política no conserva y reescribe las demás
+        como deltas inversos con keyframes (ver core.versions); solo se tocan las
+        filas cuya codificación cambia. Cada trozo de COMPACTION_CHUNK snippets
+        va en su propia transacción.
+
+        Args:
+            snippet_ids: Snippets a compactar (por defecto, todos los que tienen versiones)
+            retention: Política (por defecto, la de la configuración)
+            now: Fecha de referencia para la retención (por defecto, ahora)
+
+        Returns:
+            Dict con 'snippets' (historiales revisados), 'deleted' (versiones
+            borradas) y 'rewritten' (versiones recodificadas)
+        """
+        from sqlalchemy import bindparam, delete
+
+        retention = retention or VersionRetention.from_settings(self.db.get_setting)
+        if snippet_ids is None:
+            with self.db.get_session() as session:
+                snippet_ids = [row.snippet_id for row in session.query(SnippetVersionDB.snippet_id).distinct()]
+        snippet_ids = list(dict.fromkeys(snippet_ids))
+
+        versions_table = SnippetVersionDB.__table__
+        stats = {"snippets": 0, "deleted": 0, "rewritten": 0}
+        for chunk_start in range(0, len(snippet_ids), COMPACTION_CHUNK):
+            chunk = snippet_ids[chunk_start:chunk_start + COMPACTION_CHUNK]
+            # BEGIN IMMEDIATE: ninguna escritura se cuela entre la lectura y la reescritura
+            with self.db.snapshot(immediate=True), self.db.get_session() as session:
+                dropped: list[str] = []
+                updates: list[dict[str, Any]] = []
+                variables: list[dict[str, Any]] = []
+                for history in self._version_histories(session, chunk, media=True).values():
+                    stats["snippets"] += 1
+                    keep = retention.keep([(row["version_number"], row["created_at"]) for row, _ in history], now)
+                    kept = [(row, state) for row, state in history if row["version_number"] in keep]
+                    dropped.extend(row["id"] for row, _ in history if row["version_number"] not in keep)
+                    for (row, state), delta in zip(kept, encode_history([state for _, state in kept])):
+                        if delta == row["delta"]:
+                            continue
+                        full = delta is None
+                        updates.append({
+                            "version_id": row["id"],
+                            "delta": delta,
+                            **{column: state[column] if full else None for column in DELTA_COLUMNS},
+                        })
+                        if full:
+                            variables.extend(
+                                {"id": str(uuid4()), "version_id": row["id"], **{key: var[key] for key in VARIABLE_COLUMNS}}
+                                for var in state["variables"]
+                            )
+
+                for ids in _chunks(dropped + [update["version_id"] for update in updates]):
+                    session.execute(delete(SnippetVersionVariableDB).where(SnippetVersionVariableDB.version_id.in_(ids)))
+                for ids in _chunks(dropped):
+                    session.execute(delete(SnippetVersionDB).where(SnippetVersionDB.id.in_(ids)))
+                if updates:
+                    session.execute(
+                        versions_table.update().where(versions_table.c.id == bindparam("version_id")), updates
+                    )
+                if variables:
+                    session.execute(SnippetVersionVariableDB.__table__.insert(), variables)
+                session.commit()
+            stats["deleted"] += len(dropped)
+            stats["rewritten"] += len(updates)
+        return stats
+
+    def wait_for_version_compaction(self, timeout: Optional[float] = None) -> None:
+        """Esperar a que termine la compactación de versiones en curso (si hay)."""
+        self._version_compactor.wait(timeout)
+
+    def _compact_pending_versions(self) -> None:
+        """Tarea de fondo: compactar los snippets con versiones nuevas (y todos, cada cierto tiempo)."""
+        with self._compaction_lock:
+            snippet_ids: Optional[list[str]] = list(self._compaction_pending)
+            self._compaction_pending.clear()
+        now = datetime.now(UTC)
+        if self._last_full_compaction is None or now - self._last_full_compaction >= FULL_COMPACTION_INTERVAL:
+            self._last_full_compaction = now
+            snippet_ids = None  # Así la retención por antigüedad llega también a los que no se editan
+        self.compact_versions(snippet_ids, now=now)
+
+    @staticmethod
+    def _version_histories(
+        session: Session, snippet_ids: list[str], media: bool = False
+    ) -> dict[str, list[tuple[Any, dict[str, Any]]]]:
+        """
+        Historial reconstruido de cada snippet, de la versión más reciente a la más antigua.
+
+        Versiones y variables se leen en una sola consulta: la compactación en
+        segundo plano no puede colarse entre dos lecturas.
+
+        Args:
+            session: Sesión de base de datos
+            snippet_ids: Snippets cuyos historiales se leen
+            media: Leer también ``image_data`` y ``thumbnail`` (si no, quedan a
+                None salvo que los traiga un delta)
+
+        Returns:
+            Por snippet, pares (fila de snippet_versions, estado). El estado lleva
+            DELTA_COLUMNS y "variables" con los deltas ya aplicados
+        """
+        from sqlalchemy import literal_column, select
+
+        versions = SnippetVersionDB.__table__
+        variables = SnippetVersionVariableDB.__table__
+        variable_columns = ("id",) + VARIABLE_COLUMNS
+        query = (
+            select(
+                *(column for column in versions.c if media or column.name not in ("image_data", "thumbnail")),
+                *(variables.c[name].label(f"var_{name}") for name in variable_columns),
+            )
+            .outerjoin(variables, variables.c.version_id == versions.c.id)
+            .where(versions.c.snippet_id.in_(snippet_ids))
+            .order_by(
+                versions.c.snippet_id,
+                versions.c.version_number.desc(),
+                literal_column("snippet_version_variables.rowid"),
+            )
+        )
+        rows: dict[str, tuple[Any, list[dict[str, Any]]]] = {}
+        for record in session.execute(query).mappings():
+            row, row_variables = rows.setdefault(record["id"], (record, []))
+            if record["var_id"] is not None:
+                row_variables.append({name: record[f"var_{name}"] for name in variable_columns})
+
+        histories: dict[str, list[tuple[Any, dict[str, Any]]]] = {}
+        for row, row_variables in rows.values():
+            history = histories.setdefault(row["snippet_id"], [])
+            if row["delta"] is None:
+                state = {column: row.get(column) for column in DELTA_COLUMNS}
+                state["variables"] = row_variables
+            elif history:
+                state = apply_delta(history[-1][1], json.loads(row["delta"]))
+            else:
+                raise ValueError(f"Version {row['id']} is a delta without a newer version")
+            history.append((row, state))
+        return histories
+
+    def _version_to_pydantic(self, row: Any, state: dict[str, Any]) -> SnippetVersion:
+        """Versión reconstruida, sin ``image_data`` ni ``thumbnail``."""
+        # Filas propias ya validadas: sin revalidar (ver _db_to_pydantic)
+        return construct_trusted(SnippetVersion, {
+            "id": row["id"],
+            "snippet_id": row["snippet_id"],
+            "version_number": row["version_number"],
+            "name": row["name"],
+            "abbreviation": state["abbreviation"],
+            "snippet_type": SnippetType(state["snippet_type"]) if state["snippet_type"] else SnippetType.TEXT,
+            "tags": self._string_to_tags(state["tags"]),
+            "category": state["category"],
+            "content_text": state["content_text"],
+            "content_html": state["content_html"],
+            "is_rich": bool(state["is_rich"]),
+            "image_data": None,
+            "thumbnail": None,
+            "scope_type": ScopeType(state["scope_type"]) if state["scope_type"] else ScopeType.GLOBAL,
+            "scope_values": json.loads(state["scope_values"]) if state["scope_values"] else [],
+            "caret_marker": state["caret_marker"],
+            "enabled": bool(state["enabled"]),
+            "created_at": row["created_at"],
+            "change_reason": row["change_reason"],
+            "variables": [self._variable_from_values(var, None) for var in state["variables"]],
+        })
@@ -132,6 +132,41 @@ class TemplateParser:
 
         return result, cursor_pos
 
+    def tokenize(self, template: str) -> Optional[list[str]]:
+        """
+        Partir el template para render(): [literal, variable, literal, ...].
+
+        Args:
+            template: Template string
+
+        Returns:
+            Partes (las variables en las posiciones impares), o None si usa
+            funciones: su valor depende del momento y se resuelven con parse()
+        """
+        if self.FUNCTION_PATTERN.search(template):
+            return None
+        return self.VARIABLE_PATTERN.split(template)
+
+    def render(self, parts: list[str], variables: Optional[dict[str, Any]] = None) -> str:
+        """
+        Mismo resultado que ``parse(template, variables)`` a partir de ``tokenize(template)``.
+
+        Args:
+            parts: Partes devueltas por tokenize()
+            variables: Diccionario con valores de variables
+        """
+        if variables is None:
+            variables = {}
+        pieces = list(parts)
+        for index in range(1, len(pieces), 2):
+            var_name = pieces[index]
+            if var_name in variables:
+                value = variables[var_name]
+                pieces[index] = str(value) if value is not None else ""
+            else:
+                pieces[index] = f"{{{{{var_name}}}}}"
+        return self._unescape("".join(pieces))
+
     def _process_functions(self, template: str) -> str:
         """Procesar funciones del template."""
 
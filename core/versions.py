@@ -0,0 +1,227 @@
+"""
+Historial de versiones codificado con deltas inversos.
+
+Cada edición guarda en ``snippet_versions`` una copia completa del snippet tal
+como estaba. La compactación (ver ``SnippetManager.compact_versions``) reescribe
+en segundo plano las versiones antiguas como delta inverso frente a la versión
+siguiente: la fila deja a NULL las columnas de DELTA_COLUMNS, pierde sus filas de
+variables y ``delta`` guarda en JSON solo lo que cambia para volver atrás:
+
+- ``set``: columnas con su valor completo.
+- ``patch``: textos largos (TEXT_COLUMNS) como diferencia por palabras frente
+  al texto de la versión siguiente (ver :func:`diff_text`).
+- ``variables``: la lista completa de variables, si cambia.
+
+El nombre y la imagen no entran en el delta: cada fila conserva ``name`` y el
+hash de ``image_blob``, y con él su referencia al blob. La versión más reciente
+queda siempre completa, igual que una de cada KEYFRAME_INTERVAL (keyframes):
+reconstruir una versión aplica como mucho KEYFRAME_INTERVAL - 1 deltas desde la
+versión completa más cercana por encima.
+
+La compactación aplica además la política de retención (VersionRetention):
+quedan las últimas versiones y, de las antiguas, una por día o por semana.
+"""
+
+import json
+import re
+from datetime import datetime, timedelta, UTC
+from typing import Any, Callable, NamedTuple, Optional
+
+# Cada cuántas versiones queda una completa
+KEYFRAME_INTERVAL = 8
+
+# Columnas que una versión delta deja a NULL (name e image_blob se guardan siempre)
+DELTA_COLUMNS = (
+    "abbreviation", "snippet_type", "tags", "category", "content_text", "content_html", "is_rich",
+    "image_data", "thumbnail", "scope_type", "scope_values", "caret_marker", "enabled",
+)
+
+# Columnas que se guardan como diferencia de texto
+TEXT_COLUMNS = ("content_text", "content_html")
+
+# Campos de una variable que guarda una versión (sin su ID)
+VARIABLE_COLUMNS = ("key", "label", "type", "placeholder", "default_value", "required", "regex", "options")
+
+# Palabras con el espacio que las sigue, o espacio inicial: unidas dan el texto original
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+def ensure_schema(connection) -> None:
+    """
+    Añadir la columna ``delta`` a las bases de datos anteriores.
+
+    Args:
+        connection: Conexión SQLAlchemy (la tabla snippet_versions ya existe)
+    """
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(snippet_versions)")}
+    if "delta" not in columns:
+        connection.exec_driver_sql("ALTER TABLE snippet_versions ADD COLUMN delta TEXT")
+
+
+def diff_text(base: str, target: str) -> list:
+    """
+    Operaciones que reconstruyen ``target`` a partir de ``base``.
+
+    Returns:
+        Lista de ``[inicio, fin]`` (copiar esas palabras de ``base``) y de
+        cadenas (texto literal)
+    """
+    from difflib import SequenceMatcher
+
+    base_tokens = _TOKEN_RE.findall(base)
+    target_tokens = _TOKEN_RE.findall(target)
+    ops: list = []
+    matcher = SequenceMatcher(None, base_tokens, target_tokens)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif tag != "delete":
+            ops.append("".join(target_tokens[j1:j2]))
+    return ops
+
+
+def patch_text(base: str, ops: list) -> str:
+    """Aplicar a ``base`` las operaciones de :func:`diff_text`."""
+    base_tokens = _TOKEN_RE.findall(base)
+    return "".join(op if isinstance(op, str) else "".join(base_tokens[op[0]:op[1]]) for op in ops)
+
+
+def _variables_key(variables: list[dict[str, Any]]) -> list[tuple]:
+    """Variables comparables entre versiones (sin IDs)."""
+    return [tuple(var.get(column) for column in VARIABLE_COLUMNS) for var in variables]
+
+
+def make_delta(state: dict[str, Any], base: dict[str, Any]) -> dict[str, Any]:
+    """
+    Delta inverso que reconstruye ``state`` a partir de ``base`` (la versión siguiente).
+
+    Los estados son dicts con DELTA_COLUMNS y "variables" (lista de dicts).
+    """
+    delta: dict[str, Any] = {}
+    set_values = {}
+    patches = {}
+    for column in DELTA_COLUMNS:
+        value = state[column]
+        if value == base[column]:
+            continue
+        if column in TEXT_COLUMNS and value and base[column]:
+            ops = diff_text(base[column], value)
+            if len(json.dumps(ops, ensure_ascii=False)) < len(value):
+                patches[column] = ops
+                continue
+        set_values[column] = value
+    if set_values:
+        delta["set"] = set_values
+    if patches:
+        delta["patch"] = patches
+    if _variables_key(state["variables"]) != _variables_key(base["variables"]):
+        delta["variables"] = [
+            {column: var.get(column) for column in VARIABLE_COLUMNS} for var in state["variables"]
+        ]
+    return delta
+
+
+def apply_delta(base: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    """Estado de la versión con ``delta`` a partir del de la versión siguiente."""
+    state = {column: base[column] for column in DELTA_COLUMNS}
+    state.update(delta.get("set", {}))
+    for column, ops in delta.get("patch", {}).items():
+        state[column] = patch_text(base[column], ops)
+    if "variables" in delta:
+        state["variables"] = delta["variables"]
+    else:
+        # Las de la versión siguiente, sin sus IDs
+        state["variables"] = [
+            {column: var.get(column) for column in VARIABLE_COLUMNS} for var in base["variables"]
+        ]
+    return state
+
+
+def encode_delta(delta: dict[str, Any]) -> str:
+    """JSON compacto y estable de un delta (igual para el mismo contenido)."""
+    return json.dumps(delta, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def encode_history(states: list[dict[str, Any]]) -> list[Optional[str]]:
+    """
+    Codificación de una historia, de la versión más reciente a la más antigua.
+
+    Returns:
+        Por versión, su delta en JSON o None si queda completa (la primera y una
+        de cada KEYFRAME_INTERVAL)
+    """
+    encoded: list[Optional[str]] = []
+    since_full = 0
+    for position, state in enumerate(states):
+        if position == 0 or since_full == KEYFRAME_INTERVAL - 1:
+            encoded.append(None)
+            since_full = 0
+        else:
+            encoded.append(encode_delta(make_delta(state, states[position - 1])))
+            since_full += 1
+    return encoded
+
+
+class VersionRetention(NamedTuple):
+    """
+    Política de retención de versiones.
+
+    Se guardan siempre las ``keep_last`` más recientes y las que tienen menos de
+    ``daily_after_days`` días. De las más antiguas queda la última de cada día y,
+    pasados ``weekly_after_days`` días, la última de cada semana. ``keep_last``
+    a 0 desactiva la retención.
+    """
+
+    keep_last: int = 20
+    daily_after_days: int = 7
+    weekly_after_days: int = 30
+
+    @classmethod
+    def from_settings(cls, get_setting: Callable[[str, Optional[str]], Optional[str]]) -> "VersionRetention":
+        """
+        Leer la política de la tabla de configuración.
+
+        Args:
+            get_setting: Función como ``Database.get_setting``; los valores que
+                falten o no sean enteros toman el valor por defecto
+        """
+        values = {}
+        for field in cls._fields:
+            try:
+                values[field] = int(get_setting(f"version_{field}", None))
+            except (TypeError, ValueError):
+                continue
+        return cls(**values)
+
+    def keep(self, versions: list[tuple[int, datetime]], now: Optional[datetime] = None) -> set[int]:
+        """
+        Versiones que se conservan.
+
+        Args:
+            versions: (número de versión, fecha de creación), de la más reciente a la más antigua
+            now: Fecha de referencia (por defecto, ahora)
+
+        Returns:
+            Números de versión a conservar
+        """
+        if self.keep_last <= 0:
+            return {number for number, _ in versions}
+        now = now or datetime.now(UTC)
+        daily_after = now - timedelta(days=self.daily_after_days)
+        weekly_after = now - timedelta(days=self.weekly_after_days)
+        kept = set()
+        buckets = set()
+        for position, (number, created_at) in enumerate(versions):
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=UTC)  # SQLite devuelve las fechas sin zona
+            if position < self.keep_last or created_at > daily_after:
+                kept.add(number)
+                continue
+            if created_at > weekly_after:
+                bucket = ("day", created_at.date())
+            else:
+                bucket = ("week", tuple(created_at.isocalendar())[:2])
+            if bucket not in buckets:  # De la más reciente a la más antigua: queda la última
+                buckets.add(bucket)
+                kept.add(number)
+        return kept
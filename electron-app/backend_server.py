@@ -0,0 +1,208 @@
+"""
+Local socket RPC server for the ApareText backend.
+
+Serves the python_backend.py function table to several local clients (Electron,
+browser extension bridge, scripts) from a single warm process. The wire protocol is
+the same JSON lines used by ``python_backend.py --serve``.
+
+- Pipelining: clients may send many requests without waiting for responses.
+- Per-connection ordering: requests of one connection run one after another and
+  their responses come back in the same order.
+- Bounded workers: blocking DB calls run in a fixed thread pool. Slow functions
+  (stats, full listings, exports) get their own small pool, so they can never
+  occupy every worker and stall other clients' searches.
+- Latest-wins: requests tagged with a ``stream`` id cancel older ones of the same
+  connection and stream, whether queued or running.
+- Per-connection state: each connection has its own keystroke matcher and search
+  sessions, released when it closes.
+
+Addresses: ``127.0.0.1:46322`` (loopback TCP, default) or ``unix:/path/to/socket``.
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import python_backend
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 46322
+MAX_LINE_BYTES = 64 * 1024 * 1024  # Requests may carry base64 images
+MAX_PIPELINE = 256  # Queued requests per connection before we stop reading
+
+# Functions that can take long on big libraries
+SLOW_FUNCTIONS = frozenset({
+    "get_stats", "get_snippets", "export_snippets", "rebuild_fulltext", "collect_blob_garbage",
+    "compact_versions",
+    "create_snippets", "upsert_snippets", "delete_snippets",
+    "bulk_set_enabled", "bulk_set_category", "bulk_add_tags", "bulk_remove_tags",
+})
+
+
+class BackendServer:
+    """asyncio server multiplexing many clients over one backend."""
+
+    def __init__(self, workers: int = 4, slow_workers: int = 1, max_pipeline: int = MAX_PIPELINE):
+        """
+        Args:
+            workers: Threads for regular calls
+            slow_workers: Threads reserved for SLOW_FUNCTIONS
+            max_pipeline: Max pending requests per connection
+        """
+        self.max_pipeline = max_pipeline
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backend-worker")
+        self._slow_executor = ThreadPoolExecutor(max_workers=slow_workers, thread_name_prefix="backend-slow")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connection_ids = itertools.count(1)
+        self.address: Optional[str] = None
+
+    async def start(self, address: Optional[str] = None) -> str:
+        """
+        Start listening.
+
+        Args:
+            address: ``host:port`` or ``unix:/path``; loopback TCP by default
+
+        Returns:
+            The bound address (useful with port 0)
+        """
+        if address and address.startswith("unix:"):
+            path = address[len("unix:"):]
+            if os.path.exists(path):
+                os.unlink(path)
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path=path, limit=MAX_LINE_BYTES
+            )
+            self.address = address
+        else:
+            host, port = DEFAULT_HOST, DEFAULT_PORT
+            if address:
+                host, _, port_str = address.rpartition(":")
+                host = host or DEFAULT_HOST
+                port = int(port_str)
+            self._server = await asyncio.start_server(
+                self._handle_connection, host=host, port=port, limit=MAX_LINE_BYTES
+            )
+            bound_host, bound_port = self._server.sockets[0].getsockname()[:2]
+            self.address = f"{bound_host}:{bound_port}"
+        return self.address
+
+    async def serve_forever(self) -> None:
+        """Serve until cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting clients and release the worker pools."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._slow_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Read pipelined requests and answer them in order."""
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_pipeline)
+        scope = f"conn{next(self._connection_ids)}:"
+        worker = asyncio.create_task(self._process_connection(pending, writer, scope))
+        try:
+            while not worker.done():
+                try:
+                    raw_line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    # Oversized line: answered as invalid JSON
+                    await _put_while_running(pending, python_backend.accept_request(b""), worker)
+                    break
+                if not raw_line:
+                    break
+                if raw_line.strip():
+                    accepted = python_backend.accept_request(raw_line, scope)
+                    if not await _put_while_running(pending, accepted, worker):
+                        break
+        except ConnectionError:
+            pass
+        finally:
+            await _put_while_running(pending, None, worker)
+            await worker
+            python_backend.streams.release(scope)
+            python_backend.release_client(scope)
+
+    async def _process_connection(self, pending: asyncio.Queue, writer: asyncio.StreamWriter, scope: str) -> None:
+        """Run one connection's requests sequentially and write the responses."""
+        try:
+            while True:
+                accepted = await pending.get()
+                if accepted is None:
+                    break
+                response = await self._execute(*accepted, scope)
+                writer.write(python_backend.encode_response(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _execute(self, request, ticket, scope: str) -> dict:
+        """Run an accepted request on the matching worker pool."""
+        if ticket is not None and python_backend.streams.is_superseded(*ticket):
+            # Superseded while queued: answer without taking a worker
+            return python_backend.run_request(request, ticket, scope)
+
+        executor = self._slow_executor if _is_slow(request) else self._executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, python_backend.run_request, request, ticket, scope)
+
+
+async def _put_while_running(pending: asyncio.Queue, item, worker: asyncio.Task) -> bool:
+    """
+    Queue an item for the connection's worker.
+
+    If the worker stops first (the client went away while responses were being
+    written), nobody will drain the queue: give up instead of waiting forever.
+
+    Returns:
+        True if the item was queued
+    """
+    if worker.done():
+        return False
+    put = asyncio.ensure_future(pending.put(item))
+    await asyncio.wait({put, worker}, return_when=asyncio.FIRST_COMPLETED)
+    if put.done():
+        return True
+    put.cancel()
+    return False
+
+
+def _is_slow(request) -> bool:
+    """True if the request (or any call of a batch) is a slow function."""
+    if not isinstance(request, dict):
+        return False
+    calls = request.get("batch")
+    if isinstance(calls, list):
+        return any(isinstance(call, dict) and call.get("func") in SLOW_FUNCTIONS for call in calls)
+    return request.get("func") in SLOW_FUNCTIONS
+
+
+def run_server(address: Optional[str] = None) -> None:
+    """Run the socket server until interrupted."""
+
+    async def main() -> None:
+        server = BackendServer()
+        bound = await server.start(address)
+        print(f"ApareText backend listening on {bound}", file=sys.stderr, flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
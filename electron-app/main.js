@@ -8,6 +8,7 @@ const path = require('path');
 const axios = require('axios');
 const fs = require('fs').promises;
 const { spawn } = require('child_process');
+const readline = require('readline');
 const { PythonShell } = require('python-shell');
 
 // Configuración
@@ -15,14 +16,42 @@ const API_HOST = '127.0.0.1';
 const API_PORT = 46321;
 const API_URL = `http://${API_HOST}:${API_PORT}`;
 
-// Helper function to call Python backend
-function callPythonBackend(func, args = []) {
+// Funciones de solo lectura que se pueden repetir en un proceso one-shot si el
+// daemon falla. Las escrituras (pueden haberse aplicado ya), las que cuentan usos
+// (expand_snippet) y las que dependen del estado del daemon (feed_keys, métricas)
+// no se repiten.
+const ONE_SHOT_FALLBACK = new Set([
+    'health', 'root', 'get_snippets', 'list_snippets', 'search_snippets', 'get_snippets_for_context',
+    'fuzzy_search', 'full_text_search', 'match_suffix', 'get_snippet', 'get_snippet_media',
+    'get_tag_facets', 'get_stats'
+]);
+
+/**
+ * Argumentos para la línea de comandos: sin los null/undefined finales (el backend
+ * usa sus valores por defecto) y con los intermedios como '' (el backend los trata
+ * como ausentes; "null" sería un valor verdadero).
+ */
+function oneShotArgs(args) {
+    let end = args.length;
+    while (end > 0 && (args[end - 1] === null || args[end - 1] === undefined)) {
+        end--;
+    }
+    return args.slice(0, end).map(arg => {
+        if (arg === null || arg === undefined) {
+            return '';
+        }
+        return typeof arg === 'object' ? JSON.stringify(arg) : String(arg);
+    });
+}
+
+// Helper function to call Python backend (one-shot process, used as fallback)
+function callPythonBackendOnce(func, args = []) {
     return new Promise((resolve, reject) => {
         const options = {
             mode: 'text',
             pythonPath: 'python', // or 'python3' depending on system
             scriptPath: __dirname,
-            args: [func, ...args.map(arg => typeof arg === 'object' ? JSON.stringify(arg) : arg)]
+            args: [func, ...oneShotArgs(args)]
         };
 
         PythonShell.run('python_backend.py', options, (err, results) => {
@@ -40,6 +69,112 @@ function callPythonBackend(func, args = []) {
     });
 }
 
+// Backend Python persistente: `python_backend.py --serve` con protocolo JSON lines
+let pythonDaemon = null;
+let nextRequestId = 1;
+const pendingRequests = new Map();
+
+function startPythonDaemon() {
+    const proc = spawn('python', [path.join(__dirname, 'python_backend.py'), '--serve'], {
+        cwd: __dirname,
+        stdio: ['pipe', 'pipe', 'pipe'],
+        windowsHide: true
+    });
+
+    const lines = readline.createInterface({ input: proc.stdout });
+    lines.on('line', (line) => {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (e) {
+            console.error('[Backend] Invalid response line:', line.slice(0, 200));
+            return;
+        }
+        if (message.event === 'ready') {
+            console.log('[Backend] Python daemon ready');
+            return;
+        }
+        const pending = pendingRequests.get(message.id);
+        if (!pending) {
+            return;
+        }
+        pendingRequests.delete(message.id);
+        if (message.cancelled) {
+            // Sustituida por una petición más reciente del mismo stream
+            pending.resolve({ cancelled: true });
+            return;
+        }
+        // Igual que el modo one-shot: los errores llegan como { error }
+        pending.resolve('error' in message ? { error: message.error } : message.result);
+    });
+
+    proc.stderr.on('data', (data) => {
+        console.error('[Backend]', data.toString().trimEnd());
+    });
+
+    const failPending = (error) => {
+        if (pythonDaemon === proc) {
+            pythonDaemon = null;
+        }
+        for (const [id, pending] of pendingRequests) {
+            if (pending.proc === proc) {
+                pendingRequests.delete(id);
+                pending.reject(error);
+            }
+        }
+    };
+    proc.on('error', failPending);
+    proc.stdin.on('error', failPending);
+    proc.on('exit', (code) => failPending(new Error(`Python daemon exited with code ${code}`)));
+
+    return proc;
+}
+
+function stopPythonDaemon() {
+    if (pythonDaemon) {
+        pythonDaemon.stdin.end();
+        pythonDaemon = null;
+    }
+}
+
+/**
+ * Llamar al backend persistente.
+ * options.stream: las peticiones del mismo stream se cancelan entre sí (gana la última)
+ */
+function callPythonBackend(func, args = [], options = {}) {
+    if (!pythonDaemon) {
+        pythonDaemon = startPythonDaemon();
+    }
+    const proc = pythonDaemon;
+    const id = nextRequestId++;
+    const request = { id, func, args };
+    if (options.stream) {
+        request.stream = options.stream;
+    }
+
+    return new Promise((resolve, reject) => {
+        pendingRequests.set(id, { resolve, reject, proc });
+        proc.stdin.write(JSON.stringify(request) + '\n', 'utf8');
+    }).catch((error) => {
+        if (!ONE_SHOT_FALLBACK.has(func)) {
+            console.error(`[Backend] Daemon call ${func} failed:`, error.message);
+            throw error;
+        }
+        console.error(`[Backend] Daemon call ${func} failed, falling back to one-shot:`, error.message);
+        // La sesión de búsqueda nombrada solo existe en el daemon
+        const fallbackArgs = func === 'search_snippets' ? args.slice(0, 4) : args;
+        return callPythonBackendOnce(func, fallbackArgs);
+    });
+}
+
+/**
+ * Ejecutar varias llamadas al backend en un único viaje (mismo snapshot de lectura).
+ * calls: [{ func, args }]; devuelve [{ result } | { error }] en el mismo orden
+ */
+function callPythonBackendBatch(calls) {
+    return callPythonBackend('batch', [calls]);
+}
+
 // Constantes de UI
 const WINDOW_SIZES = {
     MAIN: { width: 1200, height: 800 },
@@ -63,7 +198,7 @@ function startBackendServer() {
  * Detener el backend server
  */
 function stopBackendServer() {
-    // No backend process to stop
+    stopPythonDaemon();
 }
 
 /**
@@ -510,16 +645,109 @@ ipcMain.handle('get-snippets', async () => {
     }
 });
 
+ipcMain.handle('list-snippets', async (event, options = {}) => {
+    try {
+        return await callPythonBackend('list_snippets', [options]);
+    } catch (error) {
+        console.error('Error listing snippets:', error);
+        return { items: [], next_cursor: null, total: 0 };
+    }
+});
+
+ipcMain.handle('backend-batch', async (event, calls) => {
+    try {
+        return await callPythonBackendBatch(calls);
+    } catch (error) {
+        console.error('Error running backend batch:', error);
+        return calls.map(() => ({ error: error.message }));
+    }
+});
+
 ipcMain.handle('search-snippets', async (event, query) => {
     try {
-        const result = await callPythonBackend('search_snippets', [query]);
-        return result;
+        // Sesión "palette": al ampliar la consulta se filtran los resultados anteriores
+        const result = await callPythonBackend('search_snippets', [query, false, null, null, 'palette'], { stream: 'palette-search' });
+        // Una búsqueda cancelada ya fue reemplazada por otra más reciente
+        return result && result.cancelled ? null : result;
     } catch (error) {
         console.error('Error searching snippets:', error);
         return [];
     }
 });
 
+ipcMain.handle('full-text-search', async (event, query, limit = 50) => {
+    try {
+        // Aciertos marcados con \x02 ... \x03: escapar el HTML antes de sustituirlos por <mark>
+        const result = await callPythonBackend('full_text_search', [query, limit], { stream: 'full-text-search' });
+        return result && result.cancelled ? null : result;
+    } catch (error) {
+        console.error('Error in full-text search:', error);
+        return [];
+    }
+});
+
+ipcMain.handle('match-suffix', async (event, typedBuffer, app = null, domain = null) => {
+    try {
+        // Abreviatura más larga al final del buffer; se resuelve en memoria en el backend
+        const result = await callPythonBackend('match_suffix', [typedBuffer, app, domain], { stream: 'keystroke-match' });
+        return result && result.cancelled ? null : result;
+    } catch (error) {
+        console.error('Error matching abbreviation suffix:', error);
+        return null;
+    }
+});
+
+ipcMain.handle('feed-keys', async (event, keys, app = null, domain = null) => {
+    try {
+        // Sin stream: ninguna pulsación puede cancelar a otra
+        return await callPythonBackend('feed_keys', [keys, app, domain]);
+    } catch (error) {
+        console.error('Error feeding keystrokes:', error);
+        return [];
+    }
+});
+
+ipcMain.handle('get-snippets-for-context', async (event, app = null, domain = null) => {
+    try {
+        // Globales + los que tienen scope para la app o el dominio (y sus dominios padre)
+        return await callPythonBackend('get_snippets_for_context', [app, domain]);
+    } catch (error) {
+        console.error('Error getting snippets for context:', error);
+        return [];
+    }
+});
+
+ipcMain.handle('get-snippet-media', async (event, snippetId) => {
+    try {
+        // { image_data, thumbnail }: las búsquedas y listados los devuelven a null
+        return await callPythonBackend('get_snippet_media', [snippetId]);
+    } catch (error) {
+        console.error('Error getting snippet media:', error);
+        return null;
+    }
+});
+
+ipcMain.handle('get-tag-facets', async (event, enabledOnly = false) => {
+    try {
+        // [{ tag, count }] para la barra lateral del gestor
+        return await callPythonBackend('get_tag_facets', [enabledOnly]);
+    } catch (error) {
+        console.error('Error getting tag facets:', error);
+        return [];
+    }
+});
+
+ipcMain.handle('fuzzy-search-snippets', async (event, query, limit = 20) => {
+    try {
+        // Resultados ordenados por relevancia + uso, con posiciones para resaltar
+        const result = await callPythonBackend('fuzzy_search', [query, limit], { stream: 'palette-search' });
+        return result && result.cancelled ? null : result;
+    } catch (error) {
+        console.error('Error fuzzy searching snippets:', error);
+        return [];
+    }
+});
+
 ipcMain.handle('expand-snippet', async (event, snippetId, variables = {}) => {
     try {
         console.log('[EXPAND] 🔍 Fetching snippet:', snippetId);
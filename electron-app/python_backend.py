@@ -1,135 +1,793 @@
 """
 Python backend for ApareText Electron app.
 Provides functions that can be called from Node.js via python-shell.
+
+Modes:
+- One-shot: ``python python_backend.py <func> [args...]`` prints a single JSON result.
+- Daemon: ``python python_backend.py --serve`` keeps the database, manager and parser
+  warm and speaks JSON lines over stdin/stdout. Each request is one line
+  ``{"id": 1, "func": "search_snippets", "args": ["fir"]}`` and each response is one
+  line ``{"id": 1, "result": ...}`` or ``{"id": 1, "error": "..."}``. Requests may
+  carry a ``stream`` id: a newer request on the same stream cancels older ones,
+  which are answered with ``{"id": 1, "cancelled": true}``.
+- Batch: ``{"id": 1, "batch": [{"func": ..., "args": [...]}, ...]}`` runs several
+  calls over one DB read snapshot and answers ``{"id": 1, "result": [...]}`` with one
+  ``{"result": ...}`` or ``{"error": ...}`` item per call, in order.
+- Socket server: ``python python_backend.py --listen [address]`` serves the same
+  protocol to many local clients (see backend_server.py).
 """
 
 import sys
 import json
+import inspect
 import os
-from typing import Optional
+import queue
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Optional
 
 # Add the parent directory to sys.path so we can import core
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from core.database import get_db
-from core.snippet_manager import SnippetManager
-from core.template_parser import TemplateParser
-from core.models import Snippet
+if TYPE_CHECKING:
+    from core.models import Snippet
+
+# Database, manager and parser are created on first use, so cheap calls such as
+# health/root never import SQLAlchemy or Pydantic. The daemon warms them up front.
+db = None
+manager = None
+parser = None
+
+# Per-client state, keyed by the client scope of run_request (one per socket
+# connection; the stdin daemon and the CLI are the single client "")
+keystroke_matchers: dict[str, tuple[Any, Any]] = {}
+_client_state = threading.local()
+
+# Named search sessions by (client, name), least recently used first
+MAX_SEARCH_SESSIONS = 16
+search_sessions: OrderedDict[tuple[str, str], Any] = OrderedDict()
+_sessions_lock = threading.Lock()
+
+# Until the manager exists, match_suffix/expand_snippet are served from the
+# memory-mapped expansion snapshot (core.expansions). Usage of those expansions
+# is recorded once the manager is created.
+expansion_snapshot = None
+pending_usage: list[str] = []
+_init_lock = threading.RLock()
+_usage_lock = threading.Lock()
+
+
+def _get_db():
+    """Database singleton, created on first use."""
+    global db
+    with _init_lock:
+        if db is None:
+            from core.database import get_db
+            db = get_db()
+    return db
+
+
+def _get_manager():
+    """SnippetManager, created on first use."""
+    global manager, expansion_snapshot
+    if manager is not None:
+        return manager
+    with _init_lock:
+        if manager is None:
+            from core.snippet_manager import SnippetManager
+            manager = SnippetManager(_get_db())
+            # Dropped rather than closed: a request may still be reading it.
+            # The manager rewrites the file from now on.
+            expansion_snapshot = False
+            _record_pending_usage()
+    return manager
+
+
+def _get_expansion_snapshot():
+    """Fresh expansion snapshot while the manager is not loaded yet, else None."""
+    global expansion_snapshot
+    if manager is not None:
+        return None
+    with _init_lock:
+        if expansion_snapshot is None:
+            from core.expansions import ExpansionSnapshot
+            from core.paths import default_db_path
+            db_path = db.db_path if db is not None else default_db_path()
+            expansion_snapshot = ExpansionSnapshot.open_fresh(db_path) or False
+    return expansion_snapshot or None
+
+
+def _record_pending_usage() -> None:
+    """Count the expansions served from the snapshot (needs the manager)."""
+    with _usage_lock:
+        snippet_ids = pending_usage[:]
+        pending_usage.clear()
+    for snippet_id in snippet_ids:
+        manager.increment_usage(snippet_id)
+
+
+def _warm_up() -> None:
+    """Load parser, ORM and engine, and bring the expansion snapshot up to date."""
+    _get_parser()
+    _get_manager().db.get_session().close()
+    _get_manager().refresh_expansion_snapshot()
+
+
+def _current_client() -> str:
+    """Scope of the client whose request runs in this thread."""
+    return getattr(_client_state, "scope", "")
+
+
+def release_client(scope: str) -> None:
+    """Drop the per-client state of a closed connection."""
+    keystroke_matchers.pop(scope, None)
+    with _sessions_lock:
+        for key in [key for key in search_sessions if key[0] == scope]:
+            del search_sessions[key]
+
+
+def _get_keystroke_matcher():
+    """Keystroke matcher of the current client: typed word and app/domain are per client."""
+    client = _current_client()
+    owner, matcher = keystroke_matchers.get(client, (None, None))
+    if owner is not _get_manager():
+        matcher = _get_manager().create_keystroke_matcher()
+        keystroke_matchers[client] = (_get_manager(), matcher)
+    return matcher
+
+
+def _get_search_session(name: str):
+    """Named SearchSession of the current client and manager (one per search box)."""
+    key = (_current_client(), name)
+    with _sessions_lock:
+        session = search_sessions.get(key)
+        if session is None or session.manager is not _get_manager():
+            session = search_sessions[key] = _get_manager().search_session()
+            if len(search_sessions) > MAX_SEARCH_SESSIONS:
+                search_sessions.popitem(last=False)
+        search_sessions.move_to_end(key)
+    return session
+
+
+def _get_parser():
+    """TemplateParser, created on first use (does not need SQLAlchemy)."""
+    global parser
+    if parser is None:
+        from core.template_parser import TemplateParser
+        parser = TemplateParser()
+    return parser
+
+
+def _load_snippet(data: dict) -> "Snippet":
+    """Validate inbound snippet data."""
+    from core.models import Snippet
+    return Snippet(**data)
+
+
+def _dump(snippet: Optional["Snippet"]) -> Optional[dict]:
+    """Serialize a snippet to JSON-compatible data."""
+    return snippet.model_dump(mode="json") if snippet else None
 
-# Initialize database and manager
-db = get_db()
-manager = SnippetManager(db)
-parser = TemplateParser()
 
 def health():
     """Health check."""
-    print(json.dumps({"status": "healthy"}))
+    return {"status": "healthy"}
 
 def root():
     """Root endpoint."""
-    print(json.dumps({"message": "ApareText API", "version": "0.1.0"}))
+    return {"message": "ApareText API", "version": "0.1.0"}
 
 def get_snippets():
     """Get all snippets."""
-    snippets = manager.get_all_snippets()
-    result = [snippet.dict() for snippet in snippets]
-    print(json.dumps(result))
+    snippets = _get_manager().get_all_snippets()
+    return [_dump(snippet) for snippet in snippets]
+
+def list_snippets(options: Optional[dict] = None):
+    """
+    List snippets page by page.
+
+    Options: fields ("summary" | "full"), order_by ("usage_count" | "created_at" |
+    "name"), descending, limit, cursor, enabled_only.
+    """
+    page = _get_manager().list_snippets(**(options or {}))
+    page["items"] = [item.model_dump(mode="json") for item in page["items"]]
+    return page
+
+def search_snippets(
+    query: str,
+    full_text=False,
+    app: Optional[str] = None,
+    domain: Optional[str] = None,
+    session: Optional[str] = None,
+):
+    """
+    Search snippets; full_text also matches category and content, ranked by bm25.
+
+    With app or domain, only global snippets and those scoped to that context are returned.
+    With a session name (e.g. "palette"), a query that extends the previous one in that
+    session only filters the previous results in memory.
+    """
+    full_text = full_text is True or str(full_text).lower() in ("true", "1")
+    search = _get_search_session(session).search if session else _get_manager().search_snippets
+    snippets = search(query, full_text=full_text, app=app or None, domain=domain or None)
+    return [_dump(snippet) for snippet in snippets]
+
+def get_snippets_for_context(app: Optional[str] = None, domain: Optional[str] = None):
+    """Snippets that apply to the active app/domain (subdomains included), plus global ones."""
+    snippets = _get_manager().get_snippets_for_context(app=app or None, domain=domain or None)
+    return [_dump(snippet) for snippet in snippets]
+
+def full_text_search(query: str, limit=50):
+    """Full-text search with highlighted name and content excerpt (markers \x02 ... \x03)."""
+    matches = _get_manager().full_text_search(query, limit=int(limit))
+    return [match.model_dump(mode="json") for match in matches]
+
+def rebuild_fulltext():
+    """Rebuild the FTS5 table from the snippets table."""
+    fulltext = _get_db().fulltext
+    return {"available": fulltext.available, "indexed": fulltext.rebuild()}
+
+def fuzzy_search(query: str, limit=20):
+    """Fuzzy palette search ranked by relevance and usage, with highlight positions."""
+    matches = _get_manager().fuzzy_search(query, limit=int(limit))
+    return [match.model_dump(mode="json") for match in matches]
 
-def search_snippets(query: str):
-    """Search snippets."""
-    snippets = manager.search_snippets(query)
-    result = [snippet.dict() for snippet in snippets]
-    print(json.dumps(result))
+def match_suffix(typed_buffer: str, app: Optional[str] = None, domain: Optional[str] = None):
+    """Longest enabled abbreviation the typed buffer ends with (in-memory trie, no DB query)."""
+    snapshot = _get_expansion_snapshot()
+    source = snapshot if snapshot is not None else _get_manager()
+    match = source.match_suffix(typed_buffer, app=app or None, domain=domain or None)
+    return match._asdict() if match else None
+
+def feed_keys(keys: str, app: Optional[str] = None, domain: Optional[str] = None):
+    """Feed keystrokes ("\b" = backspace) to the abbreviation matcher; returns the triggered expansions."""
+    matcher = _get_keystroke_matcher()
+    matcher.set_context(app or None, domain or None)
+    return [event._asdict() for event in matcher.feed_text(keys)]
 
 def get_snippet(snippet_id: str):
     """Get a specific snippet."""
-    snippet = manager.get_snippet(snippet_id)
-    if snippet:
-        print(json.dumps(snippet.dict()))
-    else:
-        print(json.dumps(None))
+    return _dump(_get_manager().get_snippet(snippet_id))
+
+def get_snippet_media(snippet_id: str):
+    """Get only image_data/thumbnail of a snippet (lists and searches leave them null)."""
+    return _get_manager().get_snippet_media(snippet_id)
 
 def create_snippet(data: dict):
     """Create a new snippet."""
-    snippet = Snippet(**data)
-    created = manager.create_snippet(snippet)
-    print(json.dumps(created.dict()))
+    snippet = _load_snippet(data)
+    created = _get_manager().create_snippet(snippet)
+    return _dump(created)
 
 def update_snippet(snippet_id: str, data: dict):
     """Update a snippet."""
-    snippet = Snippet(**data)
-    updated = manager.update_snippet(snippet_id, snippet)
-    if updated:
-        print(json.dumps(updated.dict()))
-    else:
-        print(json.dumps(None))
+    snippet = _load_snippet(data)
+    updated = _get_manager().update_snippet(snippet_id, snippet)
+    return _dump(updated)
 
 def delete_snippet(snippet_id: str):
     """Delete a snippet."""
-    success = manager.delete_snippet(snippet_id)
-    print(json.dumps({"success": success}))
+    success = _get_manager().delete_snippet(snippet_id)
+    return {"success": success}
+
+def create_snippets(items: list):
+    """Create many snippets in one transaction; one outcome per item, in order."""
+    return [outcome.model_dump() for outcome in _get_manager().create_snippets(items)]
+
+def upsert_snippets(items: list):
+    """Create or update (by id) many snippets in one transaction."""
+    return [outcome.model_dump() for outcome in _get_manager().upsert_snippets(items)]
+
+def delete_snippets(snippet_ids: list):
+    """Delete many snippets in one transaction."""
+    return [outcome.model_dump() for outcome in _get_manager().delete_snippets(snippet_ids)]
+
+def bulk_set_enabled(enabled: bool, selection: dict):
+    """Enable/disable the snippets chosen by selection ({"snippet_ids"} or {"where"}, plus "versioned")."""
+    return _get_manager().bulk_set_enabled(enabled, **selection)
+
+def bulk_set_category(category: Optional[str], selection: dict):
+    """Set (or clear, with null) the category of the snippets chosen by selection."""
+    return _get_manager().bulk_set_category(category, **selection)
+
+def bulk_add_tags(tags: list, selection: dict):
+    """Add tags to the snippets chosen by selection."""
+    return _get_manager().bulk_add_tags(tags, **selection)
+
+def bulk_remove_tags(tags: list, selection: dict):
+    """Remove tags from the snippets chosen by selection."""
+    return _get_manager().bulk_remove_tags(tags, **selection)
 
 def expand_snippet(data: dict):
     """Expand a snippet."""
     abbreviation = data.get("abbreviation")
     variables = data.get("variables", {})
-    snippet = manager.get_snippet_by_abbreviation(abbreviation)
+    snapshot = _get_expansion_snapshot()
+    if snapshot is not None:
+        return _expand_from_snapshot(snapshot, data)
+    manager = _get_manager()
+    snippet = manager.get_snippet_by_abbreviation(
+        abbreviation, app=data.get("app") or None, domain=data.get("domain") or None
+    )
     if snippet:
-        expanded = parser.parse(snippet.content, variables)
+        content = snippet.content_text or snippet.content_html or ""
+        expanded = _get_parser().parse(content, variables)
         manager.increment_usage(snippet.id)
-        print(json.dumps({"expanded": expanded}))
-    else:
-        print(json.dumps({"error": "Snippet not found"}))
+        return {"expanded": expanded}
+    return {"error": "Snippet not found"}
+
+def _expand_from_snapshot(snapshot, data: dict) -> dict:
+    """expand_snippet served from the expansion snapshot, without the ORM."""
+    abbreviation = data.get("abbreviation")
+    entry = snapshot.lookup(abbreviation, app=data.get("app") or None, domain=data.get("domain") or None) if abbreviation else None
+    if entry is None:
+        return {"error": "Snippet not found"}
+    expanded = entry.expand(_get_parser(), data.get("variables", {}))
+    with _usage_lock:
+        if manager is None:
+            pending_usage.append(entry.snippet_id)
+            return {"expanded": expanded}
+    _get_manager().increment_usage(entry.snippet_id)
+    return {"expanded": expanded}
+
+def get_tag_facets(enabled_only=False):
+    """Snippet count per tag for the manager sidebar."""
+    enabled_only = enabled_only is True or str(enabled_only).lower() in ("true", "1")
+    return _get_manager().get_tag_facets(enabled_only=enabled_only)
 
 def get_stats():
     """Get usage stats."""
-    stats = manager.get_usage_stats()
-    print(json.dumps(stats))
+    return _get_manager().get_usage_stats()
+
+def batch(calls: list):
+    """Run several calls in one round trip sharing a DB read snapshot."""
+    if not isinstance(calls, list):
+        raise ValueError("batch expects a list of calls")
+    with _get_db().snapshot():
+        return [
+            _call_safely(call.get("func"), _request_args(call))
+            if isinstance(call, dict) else {"error": "Invalid request"}
+            for call in calls
+        ]
+
+def collect_blob_garbage():
+    """Delete image blobs no snippet or version uses, plus orphan blob files."""
+    blobs = _get_db().blobs
+    if blobs is None:
+        return {"blobs": 0, "files": 0, "bytes": 0}
+    return blobs.collect_garbage()
+
+def compact_versions():
+    """Apply the version retention policy and store older versions as deltas."""
+    return _get_manager().compact_versions()
+
+def get_cache_stats():
+    """Get hit/miss counters of the in-memory caches."""
+    return _get_manager().get_cache_stats()
+
+def get_backend_metrics():
+    """Get request counters (served, cancelled, errors...)."""
+    return metrics.snapshot()
+
+def startup_profile():
+    """Report import time per module and cold start times against the startup budget."""
+    import subprocess
+    import time
+
+    backend_path = os.path.abspath(__file__)
+    root = os.path.dirname(os.path.dirname(backend_path))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(STARTUP_MODULES)],
+        cwd=root, capture_output=True, text=True,
+    )
+    entries = _parse_importtime(proc.stderr)
+
+    started = time.perf_counter()
+    subprocess.run([sys.executable, backend_path, "health"], capture_output=True)
+    cold_health_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    daemon = subprocess.Popen(
+        [sys.executable, backend_path, "--serve"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    daemon.stdout.readline()  # "ready" event: imports done and database initialized
+    daemon_ready_ms = (time.perf_counter() - started) * 1000
+    daemon.stdin.close()
+    daemon.wait()
+
+    return {
+        "budget_ms": STARTUP_BUDGET_MS,
+        "cold_health_ms": round(cold_health_ms, 1),
+        "daemon_ready_ms": round(daemon_ready_ms, 1),
+        "within_budget": daemon_ready_ms <= STARTUP_BUDGET_MS,
+        "core_import_ms": round(sum(e["cumulative_ms"] for e in entries if e["depth"] == 0), 1),
+        "startup_modules": {
+            e["module"]: e["cumulative_ms"] for e in entries if e["module"] in STARTUP_MODULES
+        },
+        "modules": sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:25],
+    }
 
 def export_snippets():
     """Export snippets to JSON."""
     # For simplicity, export to a temp file and return the path
     import tempfile
     with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-        db.export_to_json(f.name)
-        print(json.dumps({"path": f.name}))
+        _get_db().export_to_json(f.name)
+        return {"path": f.name}
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print(json.dumps({"error": "No function specified"}))
-        sys.exit(1)
 
-    func = sys.argv[1]
-    args = sys.argv[2:]
+# Modules a warm backend needs, measured by startup_profile (in import order)
+STARTUP_MODULES = ("core.template_parser", "core.models", "core.database", "core.snippet_manager")
+STARTUP_BUDGET_MS = 400  # SPEC: arranque de la app < 400 ms
+
+
+def _parse_importtime(output: str) -> list[dict]:
+    """Parse ``python -X importtime`` output into per-module entries (times in ms)."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.strip()
+        entries.append({
+            "module": module,
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": round(int(self_us) / 1000, 2),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 2),
+        })
+    return entries
+
+
+# Function table shared by the one-shot CLI and the daemon
+FUNCTIONS = {
+    "health": health,
+    "root": root,
+    "get_snippets": get_snippets,
+    "list_snippets": list_snippets,
+    "search_snippets": search_snippets,
+    "get_snippets_for_context": get_snippets_for_context,
+    "fuzzy_search": fuzzy_search,
+    "full_text_search": full_text_search,
+    "rebuild_fulltext": rebuild_fulltext,
+    "match_suffix": match_suffix,
+    "feed_keys": feed_keys,
+    "get_snippet": get_snippet,
+    "get_snippet_media": get_snippet_media,
+    "create_snippet": create_snippet,
+    "update_snippet": update_snippet,
+    "delete_snippet": delete_snippet,
+    "create_snippets": create_snippets,
+    "upsert_snippets": upsert_snippets,
+    "delete_snippets": delete_snippets,
+    "bulk_set_enabled": bulk_set_enabled,
+    "bulk_set_category": bulk_set_category,
+    "bulk_add_tags": bulk_add_tags,
+    "bulk_remove_tags": bulk_remove_tags,
+    "expand_snippet": expand_snippet,
+    "get_stats": get_stats,
+    "get_tag_facets": get_tag_facets,
+    "export_snippets": export_snippets,
+    "get_backend_metrics": get_backend_metrics,
+    "get_cache_stats": get_cache_stats,
+    "collect_blob_garbage": collect_blob_garbage,
+    "compact_versions": compact_versions,
+    "batch": batch,
+    "startup_profile": startup_profile,
+}
+
+# CLI spellings of function names
+CLI_ALIASES = {
+    "startup-profile": "startup_profile",
+    "rebuild-fulltext": "rebuild_fulltext",
+    "collect-blob-garbage": "collect_blob_garbage",
+    "compact-versions": "compact_versions",
+}
+
+# Positional CLI arguments that arrive JSON-encoded (daemon requests are already decoded)
+CLI_JSON_ARGS = {
+    "create_snippet": {0},
+    "create_snippets": {0},
+    "upsert_snippets": {0},
+    "delete_snippets": {0},
+    "bulk_set_enabled": {0, 1},
+    "bulk_set_category": {0, 1},
+    "bulk_add_tags": {0, 1},
+    "bulk_remove_tags": {0, 1},
+    "update_snippet": {1},
+    "expand_snippet": {0},
+    "batch": {0},
+    "list_snippets": {0},
+}
+
+
+class UnknownFunctionError(Exception):
+    """The requested function does not exist or was called with the wrong arguments."""
+
 
+def call_function(func: str, args: Optional[list] = None) -> Any:
+    """
+    Run a backend function by name.
+
+    Raises:
+        UnknownFunctionError: If the function does not exist or the arguments
+            do not match its signature
+    """
+    fn = FUNCTIONS.get(func)
+    args = args or []
+    if fn is None:
+        raise UnknownFunctionError(func)
+    try:
+        inspect.signature(fn).bind(*args)
+    except TypeError:
+        raise UnknownFunctionError(func)
+    return fn(*args)
+
+
+def _request_args(request: dict) -> list:
+    """Positional arguments of a request (a single non-list value is wrapped)."""
+    args = request.get("args") or []
+    return args if isinstance(args, list) else [args]
+
+
+def _call_safely(func: str, args: list) -> dict:
+    """Run a function and wrap its outcome as ``{"result": ...}`` or ``{"error": ...}``."""
+    try:
+        return {"result": call_function(func, args)}
+    except UnknownFunctionError:
+        return {"error": "Unknown function"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def handle_request(request: Any) -> dict:
+    """
+    Process one daemon request and build its response.
+
+    Args:
+        request: Decoded request ``{"id": ..., "func": ..., "args": [...]}`` or
+            ``{"id": ..., "batch": [...]}``
+
+    Returns:
+        Response with the same id and either ``result`` or ``error``
+    """
+    if not isinstance(request, dict):
+        return {"id": None, "error": "Invalid request"}
+
+    if "batch" in request:
+        return {"id": request.get("id"), **_call_safely("batch", [request["batch"]])}
+    return {"id": request.get("id"), **_call_safely(request.get("func"), _request_args(request))}
+
+
+def decode_request(raw_line: bytes) -> Any:
+    """
+    Decode one JSON-lines request.
+
+    Raises:
+        ValueError: If the line is not valid UTF-8 JSON
+    """
+    return json.loads(raw_line.decode("utf-8"))
+
+
+class StreamTracker:
+    """
+    Latest-wins bookkeeping for streamed requests.
+
+    Requests tagged with the same ``stream`` (e.g. the palette's search-as-you-type)
+    supersede each other: only the newest one is worth running. Older ones are
+    dropped while still queued and interrupted if they are already running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest: dict[str, int] = {}
+        self._sequence = 0
+
+    def register(self, stream: str) -> int:
+        """Register a new request in a stream and return its token."""
+        with self._lock:
+            self._sequence += 1
+            self._latest[stream] = self._sequence
+            return self._sequence
+
+    def is_superseded(self, stream: str, token: int) -> bool:
+        """True if a newer request arrived on the same stream."""
+        return self._latest.get(stream, token) != token
+
+    def release(self, scope: str) -> None:
+        """Forget the streams of a closed connection (names starting with ``scope``)."""
+        with self._lock:
+            for stream in [stream for stream in self._latest if stream.startswith(scope)]:
+                del self._latest[stream]
+
+
+class BackendMetrics:
+    """Thread-safe request counters reported by get_backend_metrics."""
+
+    COUNTERS = ("received", "served", "errors", "cancelled_queued", "cancelled_in_flight")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["cancelled"] = counts["cancelled_queued"] + counts["cancelled_in_flight"]
+        return counts
+
+
+streams = StreamTracker()
+metrics = BackendMetrics()
+
+# Marker for lines that are not valid JSON
+INVALID_REQUEST = object()
+
+
+def accept_request(raw_line: bytes, scope: str = "") -> tuple[Any, Optional[tuple[str, int]]]:
+    """
+    Decode a request as soon as it arrives and register it in its stream.
+
+    Registering on arrival (not on execution) is what lets a newer keystroke
+    supersede requests that are still waiting in the queue.
+
+    Args:
+        raw_line: Raw JSON line
+        scope: Prefix isolating stream names (e.g. per socket connection)
+
+    Returns:
+        Tuple (request, ticket); ticket is None for requests without ``stream``
+    """
     try:
-        if func == "health":
-            health()
-        elif func == "root":
-            root()
-        elif func == "get_snippets":
-            get_snippets()
-        elif func == "search_snippets" and args:
-            search_snippets(args[0])
-        elif func == "get_snippet" and args:
-            get_snippet(args[0])
-        elif func == "create_snippet" and args:
-            data = json.loads(args[0])
-            create_snippet(data)
-        elif func == "update_snippet" and len(args) >= 2:
-            snippet_id = args[0]
-            data = json.loads(args[1])
-            update_snippet(snippet_id, data)
-        elif func == "delete_snippet" and args:
-            delete_snippet(args[0])
-        elif func == "expand_snippet" and args:
-            data = json.loads(args[0])
-            expand_snippet(data)
-        elif func == "get_stats":
-            get_stats()
-        elif func == "export_snippets":
-            export_snippets()
+        request = decode_request(raw_line)
+    except ValueError:
+        return INVALID_REQUEST, None
+
+    ticket = None
+    if isinstance(request, dict) and request.get("stream") is not None:
+        stream = f"{scope}{request['stream']}"
+        ticket = (stream, streams.register(stream))
+    return request, ticket
+
+
+def run_request(request: Any, ticket: Optional[tuple[str, int]] = None, client: str = "") -> dict:
+    """
+    Run an accepted request, honouring latest-wins cancellation.
+
+    Superseded requests are answered with ``{"id": ..., "cancelled": true}``.
+
+    Args:
+        request: Request returned by accept_request
+        ticket: Stream ticket returned by accept_request
+        client: Scope of the sending client, for per-client state (see release_client)
+    """
+    _client_state.scope = client
+    try:
+        return _run_request(request, ticket)
+    finally:
+        _client_state.scope = ""
+
+
+def _run_request(request: Any, ticket: Optional[tuple[str, int]]) -> dict:
+    """run_request for the current client."""
+    metrics.incr("received")
+    if request is INVALID_REQUEST:
+        metrics.incr("errors")
+        return {"id": None, "error": "Invalid JSON"}
+
+    request_id = request.get("id") if isinstance(request, dict) else None
+    if ticket is None:
+        response = handle_request(request)
+    else:
+        if streams.is_superseded(*ticket):
+            metrics.incr("cancelled_queued")
+            return {"id": request_id, "cancelled": True}
+        with _get_db().interruptible(lambda: streams.is_superseded(*ticket)):
+            response = handle_request(request)
+        if streams.is_superseded(*ticket):
+            metrics.incr("cancelled_in_flight")
+            return {"id": request_id, "cancelled": True}
+
+    metrics.incr("errors" if "error" in response else "served")
+    return response
+
+
+def encode_response(response: dict) -> bytes:
+    """Encode a response as a single UTF-8 JSON line."""
+    try:
+        line = json.dumps(response, ensure_ascii=False)
+    except (TypeError, ValueError) as e:
+        line = json.dumps({"id": response.get("id"), "error": str(e)})
+    return (line + "\n").encode("utf-8")
+
+
+def serve(stdin=None, stdout=None) -> None:
+    """
+    Run the JSON-lines daemon until stdin is closed.
+
+    A reader thread drains stdin into a queue while requests are processed, so the
+    host can keep writing even while a large response is being flushed. Nothing but
+    protocol frames is written to stdout: stray prints are redirected to stderr.
+    Requests carrying a ``stream`` id follow latest-wins cancellation (see
+    StreamTracker).
+
+    Args:
+        stdin: Binary input stream (default: sys.stdin.buffer)
+        stdout: Binary output stream (default: sys.stdout.buffer)
+    """
+    stdin = stdin if stdin is not None else sys.stdin.buffer
+    stdout = stdout if stdout is not None else sys.stdout.buffer
+    requests: queue.Queue = queue.Queue()
+
+    def read_requests() -> None:
+        for raw_line in iter(stdin.readline, b""):
+            if raw_line.strip():
+                requests.put(accept_request(raw_line))
+        requests.put(None)
+
+    threading.Thread(target=read_requests, name="backend-stdin", daemon=True).start()
+
+    original_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        # Warm up before announcing readiness: imports, engine and schema checks.
+        # With a fresh expansion snapshot, expansions can be served right away
+        # and the warm-up runs in the background instead.
+        if _get_expansion_snapshot() is None:
+            _warm_up()
         else:
-            print(json.dumps({"error": "Unknown function"}))
+            threading.Thread(target=_warm_up, name="backend-warm-up", daemon=True).start()
+
+        stdout.write(encode_response({"event": "ready", "version": "0.1.0"}))
+        stdout.flush()
+
+        while True:
+            accepted = requests.get()
+            if accepted is None:
+                break
+            stdout.write(encode_response(run_request(*accepted)))
+            stdout.flush()
+    finally:
+        sys.stdout = original_stdout
+
+
+def main(argv: list[str]) -> int:
+    """CLI entry point."""
+    if len(argv) < 2:
+        print(json.dumps({"error": "No function specified"}))
+        return 1
+
+    if argv[1] == "--serve":
+        serve()
+        return 0
+
+    if argv[1] == "--listen":
+        from backend_server import run_server
+        run_server(argv[2] if len(argv) > 2 else None)
+        return 0
+
+    func = CLI_ALIASES.get(argv[1], argv[1])
+    args: list[Any] = list(argv[2:])
+
+    try:
+        for index in CLI_JSON_ARGS.get(func, ()):
+            if index < len(args):
+                args[index] = json.loads(args[index])
+        result = call_function(func, args)
+    except UnknownFunctionError:
+        result = {"error": "Unknown function"}
     except Exception as e:
-        print(json.dumps({"error": str(e)}))
\ No newline at end of file
+        result = {"error": str(e)}
+
+    print(json.dumps(result, ensure_ascii=False))
+    if pending_usage:
+        _get_manager()  # Records the usage of expansions served from the snapshot
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,121 @@
+"""
+Tests para el trie de abreviaturas.
+"""
+
+import pytest
+
+from core.abbreviations import AbbreviationTrie
+from core.database import Database
+from core.models import ScopeType, Snippet, SnippetDB, SnippetVariableDB
+from core.snippet_manager import SnippetManager
+
+
+class TestAbbreviationTrie:
+    """Tests para AbbreviationTrie."""
+
+    def test_longest_suffix_wins(self):
+        """Test que gana la abreviatura más larga al final del buffer."""
+        trie = AbbreviationTrie()
+        trie.add("short", ";f")
+        trie.add("long", ";fe")
+
+        assert trie.match_suffix("hola ;fe") == ("long", ";fe")
+        assert trie.match_suffix("hola ;f") == ("short", ";f")
+        assert trie.match_suffix("hola ;fx") is None
+        assert trie.match_suffix("") is None
+
+    def test_case_sensitive_and_exact(self):
+        """Test coincidencia exacta: solo cuenta el final del buffer."""
+        trie = AbbreviationTrie()
+        trie.add("1", "sig")
+
+        assert trie.match_suffix("Firma: sig").snippet_id == "1"
+        assert trie.match_suffix("SIG") is None
+        assert trie.match_suffix("sig ") is None
+
+    def test_scopes(self):
+        """Test que un scope específico aplicable gana a uno global."""
+        trie = AbbreviationTrie()
+        trie.add("global", ";hi")
+        trie.add("slack", ";hi", "apps", ["Slack.exe"])
+        trie.add("gmail", ";hi", "domains", ["gmail.com"])
+        trie.add("only-app", ";bye", "apps", ["slack.exe"])
+
+        assert trie.match_suffix(";hi").snippet_id == "global"
+        assert trie.match_suffix(";hi", app="slack.exe").snippet_id == "slack"
+        assert trie.match_suffix(";hi", domain="mail.gmail.com").snippet_id == "gmail"
+        assert trie.match_suffix(";hi", domain="notgmail.com").snippet_id == "global"
+        assert trie.match_suffix(";bye") is None
+        assert trie.match_suffix(";bye", app="SLACK.EXE").snippet_id == "only-app"
+
+    def test_replace_and_remove_prunes(self):
+        """Test reemplazo y borrado (el trie vacío no deja nodos)."""
+        trie = AbbreviationTrie()
+        trie.add("1", ";abc")
+        trie.add("2", ";bc")
+        trie.add("1", ";xyz")
+
+        assert trie.match_suffix(";abc") is None
+        assert trie.match_suffix("a;bc") == ("2", ";bc")
+        assert trie.match_suffix(";xyz").snippet_id == "1"
+
+        trie.remove("1")
+        trie.remove("2")
+        trie.remove("missing")
+        assert len(trie) == 0
+        assert trie._root == {}
+
+
+class TestSnippetManagerMatchSuffix:
+    """Tests de SnippetManager.match_suffix."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Fixture para gestor con base de datos vacía."""
+        db = Database(str(tmp_path / "abbr.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return SnippetManager(db)
+
+    def test_follows_writes(self, manager):
+        """Test que el trie sigue a creaciones, ediciones y borrados."""
+        created = manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Saludos"))
+        assert manager.match_suffix("texto ;fir").snippet_id == created.id
+
+        manager.update_snippet(
+            created.id, Snippet(name="Firma", abbreviation=";firma", content_text="Saludos")
+        )
+        assert manager.match_suffix("texto ;fir") is None
+        assert manager.match_suffix("texto ;firma").snippet_id == created.id
+
+        manager.update_snippet(
+            created.id, Snippet(name="Firma", abbreviation=";firma", content_text="Saludos", enabled=False)
+        )
+        assert manager.match_suffix(";firma") is None
+
+        manager.delete_snippet(created.id)
+        assert manager.match_suffix(";firma") is None
+
+    def test_scoped_snippet(self, manager):
+        """Test snippets con scope desde la base de datos."""
+        scoped = manager.create_snippet(Snippet(
+            name="Slack", abbreviation=";s", content_text="hola",
+            scope_type=ScopeType.APPS, scope_values=["slack.exe"],
+        ))
+
+        assert manager.match_suffix(";s") is None
+        assert manager.match_suffix(";s", app="slack.exe").snippet_id == scoped.id
+
+    def test_no_query_when_up_to_date(self, manager, monkeypatch):
+        """Test que con el trie al día no se abre sesión."""
+        manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Saludos"))
+        manager.match_suffix(";fir")
+        manager.wait_for_expansion_snapshot(timeout=5)  # Escribe en segundo plano tras crear
+
+        def fail():
+            raise AssertionError("match_suffix no debe consultar la base de datos")
+
+        monkeypatch.setattr(manager.db, "get_session", fail)
+        assert manager.match_suffix(";fir") is not None
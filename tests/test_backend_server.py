@@ -0,0 +1,222 @@
+"""
+Tests para el servidor RPC local del backend.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "electron-app"))
+
+import backend_server  # noqa: E402
+import python_backend  # noqa: E402
+from core.database import Database  # noqa: E402
+from core.models import SnippetDB, SnippetVariableDB  # noqa: E402
+from core.snippet_manager import SnippetManager  # noqa: E402
+
+
+class TestBackendServer:
+    """Tests para BackendServer."""
+
+    @pytest.fixture(autouse=True)
+    def backend(self, tmp_path, monkeypatch):
+        """Fixture que apunta el backend a una base de datos temporal."""
+        db = Database(str(tmp_path / "server.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        monkeypatch.setattr(python_backend, "db", db)
+        monkeypatch.setattr(python_backend, "manager", SnippetManager(db))
+        return python_backend
+
+    @staticmethod
+    async def _request_all(address: str, requests: list[dict]) -> list[dict]:
+        """Enviar peticiones en pipeline y leer todas las respuestas."""
+        host, _, port = address.rpartition(":")
+        reader, writer = await asyncio.open_connection(host, int(port))
+        writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in requests]
+        writer.close()
+        await writer.wait_closed()
+        return responses
+
+    def test_pipelined_requests_keep_order(self):
+        """Test que las respuestas llegan en el orden de las peticiones."""
+
+        async def scenario():
+            server = backend_server.BackendServer(workers=2)
+            address = await server.start("127.0.0.1:0")
+            try:
+                return await self._request_all(address, [
+                    {"id": 1, "func": "create_snippet", "args": [
+                        {"name": "Firma", "abbreviation": ";firma", "content_text": "Saludos"}
+                    ]},
+                    {"id": 2, "func": "search_snippets", "args": ["firma"]},
+                    {"id": 3, "func": "nope"},
+                    {"id": 4, "func": "health"},
+                ])
+            finally:
+                await server.close()
+
+        responses = asyncio.run(scenario())
+
+        assert [r["id"] for r in responses] == [1, 2, 3, 4]
+        assert [s["name"] for s in responses[1]["result"]] == ["Firma"]
+        assert responses[2]["error"] == "Unknown function"
+        assert responses[3]["result"] == {"status": "healthy"}
+
+    def test_slow_call_does_not_block_other_clients(self, backend, monkeypatch):
+        """Test que una llamada lenta no bloquea las búsquedas de otro cliente."""
+        release = threading.Event()
+
+        def slow_stats():
+            release.wait(5)
+            return {"done": True}
+
+        monkeypatch.setitem(python_backend.FUNCTIONS, "get_stats", slow_stats)
+
+        async def scenario():
+            server = backend_server.BackendServer(workers=1, slow_workers=1)
+            address = await server.start("127.0.0.1:0")
+            try:
+                slow = asyncio.create_task(
+                    self._request_all(address, [{"id": 1, "func": "get_stats"}])
+                )
+                fast = await asyncio.wait_for(
+                    self._request_all(address, [{"id": 2, "func": "search_snippets", "args": ["x"]}]),
+                    timeout=2,
+                )
+                assert not slow.done()
+                release.set()
+                return fast, await slow
+            finally:
+                release.set()
+                await server.close()
+
+        fast, slow = asyncio.run(scenario())
+
+        assert fast[0]["result"] == []
+        assert slow[0]["result"] == {"done": True}
+
+    def test_invalid_json(self):
+        """Test que una línea inválida recibe error y la conexión sigue viva."""
+
+        async def scenario():
+            server = backend_server.BackendServer()
+            address = await server.start("127.0.0.1:0")
+            try:
+                host, _, port = address.rpartition(":")
+                reader, writer = await asyncio.open_connection(host, int(port))
+                writer.write(b"{oops\n" + json.dumps({"id": 9, "func": "root"}).encode() + b"\n")
+                await writer.drain()
+                first = json.loads(await reader.readline())
+                second = json.loads(await reader.readline())
+                writer.close()
+                await writer.wait_closed()
+                return first, second
+            finally:
+                await server.close()
+
+        first, second = asyncio.run(scenario())
+
+        assert first == {"id": None, "error": "Invalid JSON"}
+        assert second["id"] == 9
+
+    def test_keystrokes_are_per_connection(self, backend):
+        """Test que cada conexión teclea en su propio matcher y se libera al cerrar."""
+        created = backend.create_snippet({"name": "Firma", "abbreviation": ";fir", "content_text": "Saludos"})
+
+        async def call(connection, request):
+            reader, writer = connection
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            return json.loads(await reader.readline())
+
+        async def scenario():
+            server = backend_server.BackendServer()
+            address = await server.start("127.0.0.1:0")
+            host, _, port = address.rpartition(":")
+            try:
+                first = await asyncio.open_connection(host, int(port))
+                second = await asyncio.open_connection(host, int(port))
+                await call(first, {"id": 1, "func": "feed_keys", "args": [";fi", "slack.exe"]})
+                other = await call(second, {"id": 2, "func": "feed_keys", "args": ["r\t", "outlook.exe"]})
+                own = await call(first, {"id": 3, "func": "feed_keys", "args": ["r\t", "slack.exe"]})
+                assert len(python_backend.keystroke_matchers) == 2
+                for _, writer in (first, second):
+                    writer.close()
+                    await writer.wait_closed()
+                for _ in range(100):
+                    if not python_backend.keystroke_matchers:
+                        break
+                    await asyncio.sleep(0.01)
+                return other, own
+            finally:
+                await server.close()
+
+        other, own = asyncio.run(scenario())
+
+        assert other["result"] == []
+        assert own["result"][0]["snippet_id"] == created["id"]
+        assert python_backend.keystroke_matchers == {}
+
+    def test_streams_released_on_close(self):
+        """Test que los streams de una conexión se olvidan al cerrarla."""
+
+        async def scenario():
+            server = backend_server.BackendServer()
+            address = await server.start("127.0.0.1:0")
+            try:
+                await self._request_all(address, [
+                    {"id": 1, "func": "search_snippets", "args": ["x"], "stream": "palette"},
+                ])
+                for _ in range(100):
+                    if not any(stream.startswith("conn1:") for stream in python_backend.streams._latest):
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await server.close()
+
+        asyncio.run(scenario())
+
+        assert not any(stream.startswith("conn1:") for stream in python_backend.streams._latest)
+
+    def test_disconnect_with_full_pipeline_releases_connection(self, monkeypatch):
+        """Test que si el cliente se va con la cola llena la conexión se cierra y se libera."""
+        released = []
+        monkeypatch.setattr(python_backend, "release_client", released.append)
+
+        async def broken_drain(self):
+            raise ConnectionResetError("client went away")
+
+        monkeypatch.setattr(asyncio.StreamWriter, "drain", broken_drain)
+
+        def send_and_close(address):
+            host, _, port = address.rpartition(":")
+            with socket.create_connection((host, int(port))) as client:
+                client.sendall(b"".join(
+                    json.dumps({"id": i, "func": "health"}).encode() + b"\n" for i in range(50)
+                ))
+
+        async def scenario():
+            server = backend_server.BackendServer(max_pipeline=2)
+            address = await server.start("127.0.0.1:0")
+            try:
+                await asyncio.to_thread(send_and_close, address)
+                for _ in range(200):
+                    if released:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await server.close()
+
+        asyncio.run(scenario())
+
+        assert released == ["conn1:"]
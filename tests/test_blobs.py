@@ -0,0 +1,141 @@
+"""
+Tests para el almacén de blobs de imágenes.
+"""
+
+import base64
+import os
+
+import pytest
+
+from core.blobs import make_data_url, parse_data_url
+from core.database import Database
+from core.models import BlobDB, Snippet, SnippetDB, SnippetVariableDB, SnippetVersionDB
+from core.snippet_manager import SnippetManager
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+PNG_URL = "data:image/png;base64," + base64.b64encode(PNG).decode("ascii")
+
+
+def test_parse_data_url():
+    """Test separación de data URLs."""
+    assert parse_data_url(PNG_URL) == ("image/png", PNG)
+    assert make_data_url("image/png", PNG) == PNG_URL
+    assert parse_data_url("data:image/svg+xml,<svg/>") is None
+    assert parse_data_url("data:image/png;base64,@@@") is None
+    assert parse_data_url(None) is None
+
+
+class TestBlobStore:
+    """Tests del almacén y de su uso desde SnippetManager."""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Fixture para base de datos vacía en disco."""
+        db = Database(str(tmp_path / "blobs.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return db
+
+    @pytest.fixture
+    def manager(self, db):
+        """Fixture para SnippetManager."""
+        return SnippetManager(db)
+
+    def _blob_rows(self, db):
+        with db.get_session() as session:
+            return {row.hash: row.ref_count for row in session.query(BlobDB)}
+
+    def test_put_is_content_addressed(self, db):
+        """Test que el mismo contenido se guarda una vez, con su SHA-256 como nombre."""
+        digest = db.blobs.put(PNG)
+
+        assert db.blobs.put(PNG) == digest
+        assert db.blobs.path(digest).endswith(os.path.join(digest[:2], digest))
+        assert db.blobs.read(digest) == PNG
+        with db.blobs.open(digest) as data:
+            assert data[:4] == b"\x89PNG"
+
+    def test_image_snippet_stored_as_blob(self, manager, db):
+        """Test que la imagen va al almacén y se sirve igual que llegó."""
+        created = manager.create_snippet(Snippet(name="Logo", snippet_type="image", image_data=PNG_URL))
+
+        with db.get_session() as session:
+            row = session.query(SnippetDB.image_data, SnippetDB.image_blob).filter_by(id=created.id).one()
+        assert row.image_data is None
+        assert db.blobs.read(row.image_blob) == PNG
+        assert created.image_data == PNG_URL
+        assert manager.get_snippet(created.id).image_data == PNG_URL
+        assert manager.get_snippet_media(created.id)["image_data"] == PNG_URL
+        assert self._blob_rows(db) == {row.image_blob: 1}
+
+    def test_versions_share_blob(self, manager, db):
+        """Test que versionar no copia la imagen: solo suma una referencia."""
+        created = manager.create_snippet(Snippet(name="Logo", snippet_type="image", image_data=PNG_URL))
+        manager.update_snippet(created.id, created.model_copy(update={"name": "Logo 2"}))
+
+        (digest, ref_count), = self._blob_rows(db).items()
+        assert ref_count == 2
+        with db.get_session() as session:
+            version = session.query(SnippetVersionDB).filter_by(snippet_id=created.id).one()
+            assert version.image_blob == digest
+            assert version.image_data is None
+
+        restored = manager.restore_snippet_version(created.id, version.id)
+        assert restored.image_data == PNG_URL
+
+    def test_non_canonical_data_url_stays_inline(self, manager, db):
+        """Test que lo que no se puede reconstruir byte a byte se guarda en línea."""
+        created = manager.create_snippet(
+            Snippet(name="SVG", snippet_type="image", image_data="data:image/svg+xml,<svg/>")
+        )
+
+        assert manager.get_snippet(created.id).image_data == "data:image/svg+xml,<svg/>"
+        assert self._blob_rows(db) == {}
+
+    def test_collect_garbage(self, manager, db):
+        """Test que el GC borra blobs sin referencias y ficheros huérfanos."""
+        created = manager.create_snippet(Snippet(name="Logo", snippet_type="image", image_data=PNG_URL))
+        manager.update_snippet(created.id, created.model_copy(update={"image_data": None}))
+        orphan = db.blobs.put(b"huerfano")
+
+        # Dentro del margen de gracia no se borra nada
+        assert db.blobs.collect_garbage() == {"blobs": 0, "files": 0, "bytes": 0}
+
+        with db.get_session() as session:
+            session.query(SnippetVersionDB).delete()
+            session.commit()
+        stats = db.blobs.collect_garbage(grace_seconds=-1)
+
+        assert stats == {"blobs": 1, "files": 2, "bytes": len(PNG) + len(b"huerfano")}
+        assert self._blob_rows(db) == {}
+        assert not os.path.exists(db.blobs.path(orphan))
+
+    def test_migrates_inline_images(self, tmp_path):
+        """Test migración de imágenes en línea de bases de datos anteriores."""
+        import sqlite3
+
+        from sqlalchemy.schema import CreateTable
+
+        # Esquema anterior: snippets y snippet_versions sin image_blob
+        path = str(tmp_path / "legacy.db")
+        with sqlite3.connect(path) as connection:
+            for model in (SnippetDB, SnippetVersionDB):
+                ddl = str(CreateTable(model.__table__)).splitlines()
+                connection.execute("\n".join(line for line in ddl if "image_blob" not in line).replace(", \n)", "\n)"))
+            connection.execute(
+                "INSERT INTO snippets (id, name, snippet_type, image_data, enabled) "
+                "VALUES ('legacy', 'Antiguo', 'image', ?, 1)",
+                (PNG_URL,),
+            )
+        connection.close()
+
+        reopened = Database(path)
+        snippet = SnippetManager(reopened).get_snippet("legacy")
+
+        assert snippet.image_data == PNG_URL
+        with reopened.get_session() as session:
+            row = session.query(SnippetDB.image_data, SnippetDB.image_blob).filter_by(id="legacy").one()
+        assert row.image_data is None
+        assert self._blob_rows(reopened) == {row.image_blob: 1}
@@ -0,0 +1,190 @@
+"""
+Tests para las cachés en memoria de SnippetManager.
+"""
+
+import json
+
+import pytest
+
+from core.cache import LRUCache
+from core.database import Database
+from core.models import Snippet, SnippetDB, SnippetVariable, SnippetVariableDB
+from core.snippet_manager import SnippetManager
+
+
+class TestLRUCache:
+    """Tests para LRUCache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test expulsión del menos usado y contadores."""
+        cache = LRUCache(2)
+        cache.put("a", 1, cache.generation)
+        cache.put("b", 2, cache.generation)
+        cache.get("a")
+        cache.put("c", 3, cache.generation)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+        assert len(cache) == 2
+
+    def test_stale_generation_is_not_stored(self):
+        """Test que un valor calculado antes de invalidar no se guarda."""
+        cache = LRUCache(4)
+        generation = cache.generation
+        cache.invalidate()
+        cache.put("a", 1, generation)
+
+        assert cache.get("a") is None
+        assert cache.stats()["generation"] == 1
+
+
+class TestSearchCache:
+    """Tests de la caché de search_snippets."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Fixture para gestor con base de datos vacía."""
+        db = Database(str(tmp_path / "cache.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return SnippetManager(db)
+
+    def test_repeated_query_hits(self, manager):
+        """Test que repetir la consulta no vuelve a la base de datos."""
+        manager.create_snippet(Snippet(name="Firma", content_text="Saludos"))
+
+        first = manager.search_snippets("fir")
+        second = manager.search_snippets("fir")
+        manager.search_snippets("fir", enabled_only=False)
+
+        assert [s.id for s in first] == [s.id for s in second]
+        stats = manager.get_cache_stats()["search"]
+        assert (stats["hits"], stats["misses"]) == (1, 2)
+
+    def test_writes_invalidate(self, manager):
+        """Test que crear, editar, borrar e importar invalidan la caché."""
+        created = manager.create_snippet(Snippet(name="Firma", content_text="Saludos"))
+        assert len(manager.search_snippets("fir")) == 1
+
+        manager.update_snippet(created.id, Snippet(name="Otro", content_text="Saludos"))
+        assert manager.search_snippets("fir") == []
+
+        manager.update_snippet(created.id, Snippet(name="Firma", content_text="Saludos"))
+        assert len(manager.search_snippets("fir")) == 1
+        manager.delete_snippet(created.id)
+        assert manager.search_snippets("fir") == []
+
+    def test_usage_keeps_results_cached(self, manager):
+        """Test que un uso no vacía la caché y el resultado trae el contador nuevo."""
+        created = manager.create_snippet(Snippet(name="Firma", content_text="Saludos"))
+        assert manager.search_snippets("fir")[0].usage_count == 0
+
+        manager.increment_usage(created.id)
+
+        assert manager.get_cache_stats()["search"]["size"] == 1
+        assert manager.search_snippets("fir")[0].usage_count == 1
+        assert manager.get_cache_stats()["search"]["hits"] == 1
+
+    def test_import_and_restore_version_invalidate(self, manager, tmp_path):
+        """Test invalidación desde import_from_json y restore_snippet_version."""
+        assert manager.search_snippets("importado") == []
+        export = tmp_path / "import.json"
+        export.write_text(json.dumps({"version": "1.0", "snippets": [
+            {"id": "imp-1", "name": "Importado", "content_text": "x"},
+        ]}), encoding="utf-8")
+        manager.db.import_from_json(str(export))
+        assert [s.id for s in manager.search_snippets("importado")] == ["imp-1"]
+
+        created = manager.create_snippet(Snippet(name="Version uno", content_text="1"))
+        manager.update_snippet(created.id, Snippet(name="Version dos", content_text="2"))
+        version = manager.get_snippet_versions(created.id)[-1]
+        assert manager.search_snippets("uno") == []
+        manager.restore_snippet_version(created.id, version.id)
+        assert [s.id for s in manager.search_snippets("uno")] == [created.id]
+
+    def test_results_are_copies(self, manager):
+        """Test que modificar la lista o los snippets devueltos no altera la caché."""
+        manager.create_snippet(Snippet(
+            name="Firma", content_text="Saludos", tags=["a"], variables=[SnippetVariable(key="nombre")],
+        ))
+        manager.search_snippets("fir").clear()
+        first = manager.search_snippets("fir")
+        first[0].name = "Cambiado"
+        first[0].tags.append("x")
+        first[0].variables[0].label = "Cambiada"
+
+        second = manager.search_snippets("fir")
+
+        assert len(second) == 1 and second[0] is not first[0]
+        assert (second[0].name, second[0].tags) == ("Firma", ["a"])
+        assert second[0].variables[0].label != "Cambiada"
+
+
+class TestSnippetCache:
+    """Tests de la caché de snippets hidratados."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Fixture para gestor con base de datos vacía."""
+        db = Database(str(tmp_path / "snippets.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return SnippetManager(db)
+
+    def test_byte_bound_evicts(self):
+        """Test que el límite de bytes expulsa entradas y rechaza valores enormes."""
+        cache = LRUCache(100, max_bytes=100, sizeof=len)
+        cache.put("a", "x" * 20, cache.generation)
+        cache.put("b", "x" * 20, cache.generation)
+        cache.put("huge", "x" * 60, cache.generation)  # Más de 1/4 del total
+        for key in "cdef":
+            cache.put(key, "x" * 20, cache.generation)
+
+        assert cache.get("huge") is None
+        assert cache.get("a") is None
+        assert cache.stats()["bytes"] <= 100
+        assert cache.stats()["evictions"] == 1
+
+    def test_get_snippet_served_from_cache(self, manager, monkeypatch):
+        """Test que la segunda lectura no abre sesión y devuelve una copia."""
+        created = manager.create_snippet(Snippet(name="Firma", abbreviation=";f", content_text="Saludos"))
+        manager.get_snippet(created.id).name = "Cambiado"
+        manager.get_snippet_by_abbreviation(";f")  # Construye el trie
+
+        def fail():
+            raise AssertionError("no debe consultar la base de datos")
+
+        monkeypatch.setattr(manager.db, "get_session", fail)
+        assert manager.get_snippet(created.id).name == "Firma"
+        assert manager.get_snippet_by_abbreviation(";f").id == created.id
+        assert manager.get_cache_stats()["snippets"]["hits"] == 3
+
+    def test_invalidated_on_write(self, manager):
+        """Test que editar y borrar invalidan la entrada."""
+        created = manager.create_snippet(Snippet(name="Firma", abbreviation=";f", content_text="Saludos"))
+        manager.get_snippet(created.id)
+
+        manager.update_snippet(created.id, Snippet(name="Firma", abbreviation=";f", content_text="Adiós"))
+        assert manager.get_snippet(created.id).content_text == "Adiós"
+        assert manager.get_snippet_by_abbreviation(";f").content_text == "Adiós"
+
+        manager.delete_snippet(created.id)
+        assert manager.get_snippet(created.id) is None
+        assert manager.get_snippet_by_abbreviation(";f") is None
+
+    def test_usage_keeps_entry_fresh(self, manager):
+        """Test que expandir (incrementar uso) actualiza la copia en caché."""
+        created = manager.create_snippet(Snippet(name="Firma", abbreviation=";f", content_text="Saludos"))
+        manager.get_snippet_by_abbreviation(";f")
+
+        manager.increment_usage(created.id)
+        misses = manager.get_cache_stats()["snippets"]["misses"]
+
+        assert manager.get_snippet_by_abbreviation(";f").usage_count == 1
+        assert manager.get_cache_stats()["snippets"]["misses"] == misses
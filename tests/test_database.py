@@ -143,4 +143,92 @@ class TestDatabase:
         db.close()
 
         # El engine debería estar dispuesto
-        assert db.engine is not None  # Engine object still exists but is disposed
\ No newline at end of file
+        assert db.engine is not None  # Engine object still exists but is disposed
+    def test_interruptible_aborts_query(self):
+        """Test que interruptible() aborta la consulta en curso."""
+        from sqlalchemy.exc import OperationalError
+
+        db = Database(":memory:")
+        heavy = (
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000) "
+            "SELECT count(*) FROM c"
+        )
+
+        with db.get_session() as session:
+            with db.interruptible(lambda: True):
+                with pytest.raises(OperationalError, match="interrupted"):
+                    session.connection().exec_driver_sql(heavy).scalar()
+
+        with db.get_session() as session:
+            assert session.connection().exec_driver_sql(heavy).scalar() == 1000000
+
+    def test_snapshot_shares_connection(self, tmp_path):
+        """Test que las sesiones dentro de snapshot() comparten conexión."""
+        db = Database(str(tmp_path / "snapshot.db"))
+
+        with db.snapshot():
+            with db.get_session() as first, db.get_session() as second:
+                assert first.connection().connection.dbapi_connection is \
+                    second.connection().connection.dbapi_connection
+
+            # Una sesión sin commit solo deshace su propio SAVEPOINT
+            with db.get_session() as session:
+                session.add(SettingsDB(key="kept", value="1"))
+                session.commit()
+            with db.get_session() as session:
+                session.add(SettingsDB(key="discarded", value="1"))
+                session.flush()
+
+        with db.get_session() as session:
+            assert session.query(SettingsDB).filter_by(key="kept").count() == 1
+            assert session.query(SettingsDB).filter_by(key="discarded").count() == 0
+
+    def test_snapshot_defers_change_notifications(self, tmp_path):
+        """Test que dentro de snapshot() se avisa al confirmar y no si se deshace."""
+        db = Database(str(tmp_path / "notify.db"))
+        received = []
+
+        def listener(snippet_ids):
+            received.append(snippet_ids)
+
+        db.add_change_listener(listener)
+
+        with db.snapshot():
+            db.notify_snippets_changed(["a", "b"])
+            db.notify_snippets_changed(["b", "c"])
+            assert db.snapshot_changed
+            assert received == []
+        assert received == [["a", "b", "c"]]
+
+        with db.snapshot():
+            db.notify_snippets_changed(["a"])
+            db.notify_snippets_changed(None)
+        assert received[-1] is None
+
+        with pytest.raises(RuntimeError):
+            with db.snapshot():
+                db.notify_snippets_changed(["d"])
+                raise RuntimeError("rollback")
+        assert len(received) == 2
+        assert not db.snapshot_changed
+
+    def test_count_statements(self, tmp_path):
+        """Test que count_statements cuenta las sentencias del hilo actual."""
+        import threading
+
+        db = Database(str(tmp_path / "count.db"))
+        db.get_session().close()
+
+        with db.count_statements() as outer:
+            with db.get_session() as session:
+                session.query(SettingsDB).count()
+                with db.count_statements() as inner:
+                    session.query(SnippetDB).count()
+            # Otro hilo no cuenta
+            thread = threading.Thread(target=lambda: db.get_session().query(SettingsDB).count())
+            thread.start()
+            thread.join()
+
+        assert inner.count == 1
+        assert outer.count == 2
+        assert "snippets" in inner.statements[0]
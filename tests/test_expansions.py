@@ -0,0 +1,147 @@
+"""
+Tests para la instantánea de expansiones mapeada en memoria.
+"""
+
+import random
+
+import pytest
+
+from core.abbreviations import AbbreviationTrie
+from core.database import Database
+from core.expansions import ExpansionSnapshot, make_entry, read_generation, snapshot_generation, write_snapshot
+from core.models import Snippet, SnippetDB, SnippetVariableDB
+from core.snippet_manager import SnippetManager
+from core.template_parser import TemplateParser
+
+
+def _entry(snippet_id, abbreviation, scope_type="global", scope_values=(), template="Texto"):
+    return make_entry(TemplateParser(), snippet_id, abbreviation, snippet_id, "text", template, scope_type, scope_values, 1)
+
+
+def test_match_suffix_same_as_trie(tmp_path):
+    """Test que la búsqueda binaria sobre el fichero coincide con el trie."""
+    rng = random.Random(7)
+    alphabet = ";ab€"
+    trie = AbbreviationTrie()
+    entries = []
+    for index in range(300):
+        abbreviation = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5)))
+        scope_type, scope_values = rng.choice([("global", ()), ("apps", ("Code",)), ("domains", ("google.com",))])
+        entries.append(_entry(f"s{index}", abbreviation, scope_type, scope_values))
+        trie.add(f"s{index}", abbreviation, scope_type, scope_values)
+    path = str(tmp_path / "snapshot")
+    write_snapshot(path, 3, entries)
+
+    snapshot = ExpansionSnapshot.open(path)
+    assert len(snapshot) == 300
+    assert snapshot.generation == snapshot_generation(path) == 3
+    for _ in range(500):
+        buffer = "".join(rng.choice(alphabet + "x") for _ in range(rng.randint(0, 8)))
+        context = rng.choice([{}, {"app": "code"}, {"domain": "mail.google.com"}])
+        assert snapshot.match_suffix(buffer, **context) == trie.match_suffix(buffer, **context)
+
+
+def test_lookup_scopes(tmp_path):
+    """Test desempate entre scopes en una abreviatura exacta."""
+    path = str(tmp_path / "snapshot")
+    write_snapshot(path, 1, [
+        _entry("apps", ";x", "apps", ["Code"]),
+        _entry("global", ";x"),
+        _entry("solo-dominio", ";d", "domains", ["example.com"]),
+    ])
+    snapshot = ExpansionSnapshot.open(path)
+
+    assert snapshot.lookup(";x").snippet_id == "global"
+    assert snapshot.lookup(";x", app="code").snippet_id == "apps"
+    assert snapshot.lookup(";d").snippet_id == "solo-dominio"  # Sin contexto, el primero
+    assert snapshot.lookup(";d", domain="otro.org") is None
+    assert snapshot.lookup(";nada") is None
+
+
+def test_expand_matches_parse():
+    """Test que la plantilla partida expande igual que parse()."""
+    parser = TemplateParser()
+    variables = {"nombre": "Ana", "vacia": None}
+    for template in ("Hola {{nombre}}{{|}}", "\\{{nombre}} y {{otra}} {{vacia}}", "Hoy es {{date:%Y}}", ""):
+        entry = _entry("s", ";s", template=template)
+        assert entry.expand(parser, variables) == parser.parse(template, variables)
+    assert _entry("s", ";s", template="{{time}}").parts is None
+
+
+def test_open_rejects_invalid_files(tmp_path):
+    """Test que un fichero truncado o ajeno no se abre."""
+    missing = str(tmp_path / "no-existe")
+    assert ExpansionSnapshot.open(missing) is None
+    assert snapshot_generation(missing) is None
+
+    path = tmp_path / "snapshot"
+    path.write_bytes(b"otra cosa")
+    assert ExpansionSnapshot.open(str(path)) is None
+
+    write_snapshot(str(path), 1, [_entry("s", ";s")])
+    path.write_bytes(path.read_bytes()[:30])
+    assert ExpansionSnapshot.open(str(path)) is None
+
+
+class TestManagerSnapshot:
+    """Tests de la instantánea que mantiene SnippetManager."""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Fixture para base de datos vacía en disco."""
+        db = Database(str(tmp_path / "expansions.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return db
+
+    @pytest.fixture
+    def manager(self, db):
+        """Fixture para SnippetManager."""
+        return SnippetManager(db)
+
+    def test_rewritten_after_writes(self, manager, db):
+        """Test que las escrituras dejan la instantánea obsoleta y se reescribe."""
+        first = manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Hola {{nombre}}"))
+        manager.create_snippet(Snippet(name="Apagado", abbreviation=";off", content_text="No", enabled=False))
+        manager.wait_for_expansion_snapshot()
+
+        snapshot = ExpansionSnapshot.open_fresh(db.db_path)
+        assert [entry.abbreviation for entry in snapshot.entries()] == [";fir"]
+        entry = snapshot.lookup(";fir")
+        assert (entry.snippet_id, entry.name, entry.parts) == (first.id, "Firma", ["Hola ", "nombre", ""])
+
+        manager.update_snippet(first.id, first.model_copy(update={"abbreviation": ";firma"}))
+        assert not snapshot.is_fresh(db.db_path)
+        manager.wait_for_expansion_snapshot()
+        assert ExpansionSnapshot.open_fresh(db.db_path).match_suffix("x;firma").abbreviation == ";firma"
+
+    def test_usage_does_not_rewrite(self, manager, db):
+        """Test que contar un uso no deja la instantánea obsoleta."""
+        created = manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Hola"))
+        manager.wait_for_expansion_snapshot()
+        generation = read_generation(db.db_path)
+
+        manager.increment_usage(created.id)
+
+        assert read_generation(db.db_path) == generation
+        assert manager.refresh_expansion_snapshot() is False
+        assert manager.refresh_expansion_snapshot(force=True) is True
+
+    def test_restore_discards_snapshot(self, manager, db, tmp_path):
+        """Test que restaurar un backup no deja servir la instantánea anterior."""
+        manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Hola"))
+        manager.wait_for_expansion_snapshot()
+        backup = str(tmp_path / "backup.db")
+        db.backup(backup)
+
+        db.restore(backup)
+
+        manager.wait_for_expansion_snapshot()
+        assert ExpansionSnapshot.open_fresh(db.db_path).lookup(";fir") is not None
+
+    def test_memory_database_has_no_snapshot(self):
+        """Test que las bases de datos en memoria no escriben instantánea."""
+        manager = SnippetManager(Database(":memory:"))
+        assert manager.refresh_expansion_snapshot() is False
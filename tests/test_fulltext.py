@@ -0,0 +1,108 @@
+"""
+Tests para la búsqueda de texto completo (FTS5).
+"""
+
+import pytest
+
+from core.database import Database
+from core.fulltext import (
+    FTS_IDS_TABLE, FTS_TABLE, HIGHLIGHT_END, HIGHLIGHT_START, build_match_query, html_to_text,
+)
+from core.models import Snippet, SnippetDB, SnippetVariableDB
+from core.snippet_manager import SnippetManager
+
+
+def test_html_to_text():
+    """Test extracción de texto visible de HTML."""
+    html = "<p>Hola <b>mundo</b></p><script>alert(1)</script><div>adiós &amp; gracias</div>"
+
+    assert html_to_text(html) == "Hola mundo adiós & gracias"
+
+
+def test_build_match_query_is_safe():
+    """Test que la sintaxis de FTS5 del usuario se neutraliza."""
+    assert build_match_query('reu "NEAR(x') == '"reu" "NEAR" "x"*'
+    assert build_match_query("  -- ") is None
+
+
+class TestFullTextSearch:
+    """Tests de search_snippets(full_text=True) y full_text_search."""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Fixture para base de datos vacía."""
+        db = Database(str(tmp_path / "fts.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        db.fulltext.rebuild()
+        return db
+
+    @pytest.fixture
+    def manager(self, db):
+        """Fixture para gestor de snippets."""
+        return SnippetManager(db)
+
+    def test_matches_content_ranked_by_bm25(self, manager):
+        """Test que busca en el contenido y un acierto en el nombre pesa más."""
+        body = manager.create_snippet(Snippet(name="Saludo", content_text="Gracias por la factura de marzo"))
+        name = manager.create_snippet(Snippet(name="Factura pendiente", content_text="Adjunto documento"))
+        manager.create_snippet(Snippet(name="Otro", content_text="Nada que ver"))
+
+        results = manager.search_snippets("factura", full_text=True)
+
+        assert [s.id for s in results] == [name.id, body.id]
+        assert [s.id for s in manager.search_snippets("factura")] == [name.id]
+
+    def test_html_body_accents_and_prefix(self, db):
+        """Test cuerpo HTML sin etiquetas, acentos plegados y prefijo."""
+        with db.get_session() as session:
+            session.add(SnippetDB(
+                id="rich-1", name="Rich", is_rich=True,
+                content_html="<p>Reunión <em>trimestral</em> del equipo</p>",
+            ))
+            session.commit()
+        db.notify_snippets_changed(["rich-1"])
+
+        with db.get_session() as session:
+            assert [hit.snippet_id for hit in db.fulltext.search(session, "reunion trim")] == ["rich-1"]
+            assert db.fulltext.search(session, "em") == []  # Las etiquetas no se indexan
+
+    def test_highlight_and_excerpt(self, manager):
+        """Test nombre resaltado y fragmento del contenido."""
+        manager.create_snippet(Snippet(name="Firma correo", content_text="Un saludo cordial, firma del equipo"))
+
+        match = manager.full_text_search("firma")[0]
+
+        assert match.name_highlight == f"{HIGHLIGHT_START}Firma{HIGHLIGHT_END} correo"
+        assert f"{HIGHLIGHT_START}firma{HIGHLIGHT_END}" in match.excerpt
+        assert match.rank < 0
+
+    def test_sync_on_update_delete_and_enabled(self, manager):
+        """Test que la tabla FTS sigue a las escrituras y al filtro de habilitados."""
+        created = manager.create_snippet(Snippet(name="Alpha", content_text="primer texto"))
+        manager.update_snippet(created.id, Snippet(name="Alpha", content_text="segundo texto", enabled=False))
+
+        assert manager.search_snippets("primer", full_text=True) == []
+        assert manager.search_snippets("segundo", full_text=True) == []
+        assert len(manager.search_snippets("segundo", full_text=True, enabled_only=False)) == 1
+
+        manager.delete_snippet(created.id)
+        assert manager.search_snippets("segundo", full_text=True, enabled_only=False) == []
+
+    def test_rebuild_and_upgrade(self, db, manager, tmp_path):
+        """Test reconstrucción y creación en bases de datos existentes sin tabla FTS."""
+        manager.create_snippet(Snippet(name="Persistente", content_text="texto guardado"))
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE {FTS_TABLE}")
+            conn.exec_driver_sql(f"DROP TABLE {FTS_IDS_TABLE}")
+        db.close()
+
+        reopened = Database(db.db_path)
+        assert len(SnippetManager(reopened).search_snippets("guardado", full_text=True)) == 1
+
+        with reopened.engine.begin() as conn:
+            conn.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+        assert reopened.fulltext.rebuild() == 1
+        assert len(SnippetManager(reopened).full_text_search("guardado")) == 1
@@ -0,0 +1,200 @@
+"""
+Tests para la búsqueda fuzzy de la paleta.
+"""
+
+import random
+
+import pytest
+
+from core.database import Database
+from core.fuzzy import FuzzyIndex, fold_text, fuzzy_match, usage_bonus
+from core.models import Snippet, SnippetDB, SnippetVariableDB
+from core.snippet_manager import SnippetManager
+
+
+class TestFuzzyMatch:
+    """Tests para la puntuación fuzzy."""
+
+    def test_fold_text_keeps_length(self):
+        """Test plegado de acentos y mayúsculas sin cambiar posiciones."""
+        assert fold_text("Café ÉCLAIR") == "cafe eclair"
+        assert len(fold_text("ﬁn straße")) == len("ﬁn straße")
+
+    def test_subsequence_required(self):
+        """Test que sin subsecuencia no hay coincidencia."""
+        assert fuzzy_match("xyz", "Email template") is None
+        assert fuzzy_match("mle", "Email") is None
+
+    def test_positions_and_accents(self):
+        """Test posiciones coincidentes con acentos y mayúsculas."""
+        score, positions = fuzzy_match("reunion", "Nota de Reunión")
+
+        assert positions == [8, 9, 10, 11, 12, 13, 14]
+        assert score > 0
+
+    def test_contiguous_beats_scattered(self):
+        """Test que un tramo contiguo puntúa más que letras dispersas."""
+        contiguous, _ = fuzzy_match("firm", "Firma correo")
+        scattered, _ = fuzzy_match("firm", "Fichero de informe")
+
+        assert contiguous > scattered
+
+    def test_word_boundary_bonus(self):
+        """Test bonificación en inicio de palabra y camelCase."""
+        boundary, _ = fuzzy_match("tp", "Text Plain")
+        middle, _ = fuzzy_match("tp", "output")
+        camel, camel_positions = fuzzy_match("tp", "textPlain")
+
+        assert boundary > middle
+        assert camel > middle
+        assert camel_positions == [3, 4]  # Ventana más corta: "tP"
+
+    def test_shortest_window(self):
+        """Test que se puntúa la ventana más corta que contiene la subsecuencia."""
+        _, positions = fuzzy_match("ab", "a...x ab")
+
+        assert positions == [6, 7]
+
+
+class TestFuzzyIndex:
+    """Tests para el índice fuzzy."""
+
+    def test_usage_breaks_ties(self):
+        """Test que el uso ordena coincidencias de igual relevancia."""
+        index = FuzzyIndex(("name",))
+        index.add("rare", ("Firma",), usage_count=0)
+        index.add("popular", ("Firma",), usage_count=40)
+
+        matches = index.search("firma")
+
+        assert [m.snippet_id for m in matches] == ["popular", "rare"]
+        assert matches[0].score - matches[1].score == pytest.approx(usage_bonus(40))
+
+    def test_set_usage_reorders(self):
+        """Test que cambiar el uso reordena sin reindexar."""
+        index = FuzzyIndex(("name",))
+        index.add("a", ("Firma",), usage_count=5)
+        index.add("b", ("Firma",), usage_count=1)
+        assert [m.snippet_id for m in index.search("firma")] == ["a", "b"]
+
+        index.set_usage("b", 9)
+        index.set_usage("missing", 3)
+
+        assert [m.snippet_id for m in index.search("firma")] == ["b", "a"]
+
+    def test_relevance_and_field(self):
+        """Test orden por relevancia y campo que coincide."""
+        index = FuzzyIndex(("name", "abbreviation", "tags"))
+        index.add("1", ("Saludo formal", ";sf", None))
+        index.add("2", ("Informe semanal", ";inf", "saludos"))
+
+        matches = index.search(";sf")
+
+        assert matches[0].snippet_id == "1"
+        assert matches[0].field == "abbreviation"
+        assert matches[0].positions == [0, 1, 2]
+
+    def test_enabled_only_and_removal(self):
+        """Test filtro de habilitados, reindexado y borrado."""
+        index = FuzzyIndex(("name",))
+        index.add("1", ("Alpha",), enabled=False)
+        index.add("2", ("Alpine",))
+
+        assert [m.snippet_id for m in index.search("alp")] == ["2"]
+        assert {m.snippet_id for m in index.search("alp", enabled_only=False)} == {"1", "2"}
+
+        index.add("2", ("Bravo",))
+        index.remove("1")
+        assert index.search("alp", enabled_only=False) == []
+        assert [m.snippet_id for m in index.search("bra")] == ["2"]
+
+    def test_top_k_matches_brute_force(self):
+        """Test que el top-k coincide con puntuar todo cuando no se alcanza la cota."""
+        rng = random.Random(3)
+        words = ["email", "Firma", "reunión", "Cliente", "factura", "agenda", "nota"]
+        index = FuzzyIndex(("name", "abbreviation"))
+        entries = {}
+        for i in range(300):
+            name = " ".join(rng.sample(words, 2)) + f" {i}"
+            abbreviation = f";{rng.choice(words)[:3].lower()}{i}"
+            usage = rng.choice([0, 0, 1, 5, 30])
+            index.add(str(i), (name, abbreviation), usage_count=usage)
+            entries[str(i)] = (name, abbreviation, usage)
+
+        for query in ["f", "fac", "ag 1", "rnn", "cli2", "zz"]:
+            pattern = fold_text(query)
+            expected = []
+            for snippet_id, (name, abbreviation, usage) in entries.items():
+                scores = [m[0] for m in (fuzzy_match(pattern, name), fuzzy_match(pattern, abbreviation)) if m]
+                if scores:
+                    expected.append(max(scores) + usage_bonus(usage))
+            expected = sorted(expected, reverse=True)[:10]
+
+            assert [m.score for m in index.search(query, limit=10)] == pytest.approx(expected), query
+
+    def test_scoring_budget_keeps_contiguous_hits(self):
+        """Test que con la cota alcanzada se siguen encontrando coincidencias contiguas."""
+        index = FuzzyIndex(("name",), max_scored=5)
+        for i in range(200):
+            index.add(str(i), (f"abc item {i}",), usage_count=200 - i)
+        index.add("target", ("qabcq exact",))
+
+        matches = index.search("exact", limit=1)
+
+        assert [m.snippet_id for m in matches] == ["target"]
+
+
+class TestSnippetManagerFuzzySearch:
+    """Tests de SnippetManager.fuzzy_search."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Fixture para gestor con base de datos vacía."""
+        db = Database(str(tmp_path / "fuzzy.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return SnippetManager(db)
+
+    def test_returns_hydrated_matches(self, manager):
+        """Test resultados con snippet completo, campo y posiciones."""
+        created = manager.create_snippet(Snippet(name="Firma email", abbreviation=";fe", content_text="Saludos"))
+        manager.create_snippet(Snippet(name="Factura", content_text="Importe"))
+
+        matches = manager.fuzzy_search("fem")
+
+        assert matches[0].snippet.id == created.id
+        assert matches[0].snippet.content_text == "Saludos"
+        assert matches[0].field == "name"
+        assert matches[0].positions == [0, 6, 7]
+
+    def test_follows_usage_and_writes(self, manager):
+        """Test que el orden sigue al uso y el índice a las escrituras."""
+        first = manager.create_snippet(Snippet(name="Nota", content_text="1"))
+        second = manager.create_snippet(Snippet(name="Nota dos", content_text="2"))
+        assert manager.fuzzy_search("nota")[0].snippet.id == first.id  # Nombre más corto
+
+        manager.increment_usage(second.id)
+        assert manager.fuzzy_search("nota")[0].snippet.id == second.id
+
+        manager.delete_snippet(second.id)
+        assert [m.snippet.id for m in manager.fuzzy_search("nota")] == [first.id]
+
+    def test_usage_skips_content_indexes(self, manager):
+        """Test que increment_usage no reindexa FTS ni toca otros índices."""
+        created = manager.create_snippet(Snippet(name="Nota", abbreviation=";no", content_text="1"))
+        manager.fuzzy_search("nota")
+        received = []
+
+        def listener(snippet_ids):
+            received.append(snippet_ids)
+
+        manager.db.add_change_listener(listener)
+
+        with manager.db.count_statements() as counter:
+            manager.increment_usage(created.id)
+
+        assert received == []
+        assert not any("fts" in statement for statement in counter.statements)
+        assert manager.get_snippet(created.id).usage_count == 1
@@ -0,0 +1,158 @@
+"""
+Tests para el matcher de pulsaciones (Aho-Corasick).
+"""
+
+import pytest
+
+from core.database import Database
+from core.keystrokes import BACKSPACE, AbbreviationAutomaton, KeystrokeMatcher
+from core.models import SettingsDB, Snippet, SnippetDB, SnippetVariableDB
+from core.snippet_manager import SnippetManager
+
+
+def _matcher(*abbreviations, trigger="tab"):
+    """Matcher con una abreviatura global por snippet (ID = abreviatura)."""
+    automaton = AbbreviationAutomaton((abbr, abbr, "global", []) for abbr in abbreviations)
+    return KeystrokeMatcher(automaton, trigger)
+
+
+class TestAbbreviationAutomaton:
+    """Tests del autómata."""
+
+    def test_matches_longest_first(self):
+        """Test salidas por enlaces de fallo, de la más larga a la más corta."""
+        automaton = AbbreviationAutomaton(
+            (abbr, abbr, "global", []) for abbr in ["he", "she", "hers", "e"]
+        )
+        state = 0
+        for char in "ushe":
+            state = automaton.step(state, char)
+
+        assert [length for _, length, _ in automaton.matches(state)] == [3, 2, 1]
+        assert automaton.size == 4
+
+
+class TestKeystrokeMatcher:
+    """Tests del matcher en streaming."""
+
+    def test_trigger_emits_longest(self):
+        """Test que la tecla de disparo emite la abreviatura más larga."""
+        matcher = _matcher(";f", ";fe")
+
+        events = matcher.feed_text("hola ;fe\t")
+
+        assert [(e.snippet_id, e.abbreviation, e.trigger, e.erase) for e in events] == [(";fe", ";fe", "\t", 4)]
+        assert matcher.feed_text(";f\t")[0].snippet_id == ";f"
+
+    def test_only_configured_trigger(self):
+        """Test que otros espacios no disparan y reinician la palabra."""
+        matcher = _matcher("sig", trigger="space")
+
+        assert matcher.feed_text("sig\t") == []
+        assert matcher.feed_text("sig\n") == []
+        assert [e.trigger for e in matcher.feed_text("sig ")] == [" "]
+
+    def test_word_boundaries(self):
+        """Test límites de palabra: alfanuméricas solo tras un separador."""
+        matcher = _matcher("sig", ";fe")
+
+        assert matcher.feed_text("configsig\t") == []
+        assert matcher.feed_text("(sig\t")[0].abbreviation == "sig"
+        assert matcher.feed_text("texto;fe\t")[0].abbreviation == ";fe"
+
+    def test_backspace(self):
+        """Test que el retroceso deshace el estado."""
+        matcher = _matcher("sig")
+
+        assert matcher.feed_text(f"six{BACKSPACE}g\t")[0].abbreviation == "sig"
+        assert matcher.feed_text(f"sigg{BACKSPACE}{BACKSPACE}\t") == []
+
+    def test_long_words_and_swap(self):
+        """Test palabras largas y sustitución del autómata a mitad de palabra."""
+        matcher = _matcher("sig")
+        assert matcher.feed_text("x" * 500 + ";sig\t")[0].abbreviation == "sig"
+
+        matcher.feed_text("hola ;n")
+        matcher.set_automaton(AbbreviationAutomaton([("new", ";new", "global", [])]))
+        events = matcher.feed_text("ew\t")
+
+        assert [e.snippet_id for e in events] == ["new"]
+
+    def test_scope_and_context(self):
+        """Test scopes por app y reinicio al cambiar de contexto."""
+        automaton = AbbreviationAutomaton([
+            ("global", ";hi", "global", []),
+            ("slack", ";hi", "apps", ["slack.exe"]),
+            ("mail", ";m", "domains", ["gmail.com"]),
+        ])
+        matcher = KeystrokeMatcher(automaton)
+
+        assert matcher.feed_text(";hi\t")[0].snippet_id == "global"
+        assert matcher.feed_text(";m\t") == []
+
+        matcher.set_context(app="slack.exe")
+        assert matcher.feed_text(";hi\t")[0].snippet_id == "slack"
+
+        matcher.feed_text(";")
+        matcher.set_context(domain="mail.gmail.com")
+        assert matcher.feed_text("m\t") == []  # El ";" se tecleó en otra app
+        assert matcher.feed_text(";m\t")[0].snippet_id == "mail"
+
+
+class TestSnippetManagerKeystrokeMatcher:
+    """Tests de SnippetManager.keystroke_matcher."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Fixture para gestor con base de datos vacía."""
+        db = Database(str(tmp_path / "keys.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return SnippetManager(db)
+
+    def test_rebuilds_in_background(self, manager):
+        """Test que el matcher sigue a las escrituras tras reconstruirse."""
+        created = manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Saludos"))
+        matcher = manager.keystroke_matcher()
+        assert matcher.feed_text(";fir\t")[0].snippet_id == created.id
+
+        manager.update_snippet(created.id, Snippet(name="Firma", abbreviation=";firma", content_text="Saludos"))
+        manager.wait_for_keystroke_matcher(timeout=5)
+        assert matcher.feed_text(";fir\t") == []
+        assert matcher.feed_text(";firma\t")[0].snippet_id == created.id
+
+        manager.delete_snippet(created.id)
+        manager.wait_for_keystroke_matcher(timeout=5)
+        assert matcher.feed_text(";firma\t") == []
+
+    def test_rebuilds_only_when_abbreviations_change(self, manager):
+        """Test que editar contenido o registrar usos no reconstruye el autómata."""
+        created = manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Saludos"))
+        matcher = manager.keystroke_matcher()
+        automaton = matcher.automaton
+
+        manager.update_snippet(created.id, Snippet(name="Firma", abbreviation=";fir", content_text="Un saludo"))
+        manager.increment_usage(created.id)
+        manager.wait_for_keystroke_matcher(timeout=5)
+        assert matcher.automaton is automaton
+
+        manager.update_snippet(
+            created.id, Snippet(name="Firma", abbreviation=";fir", content_text="Un saludo", enabled=False)
+        )
+        manager.wait_for_keystroke_matcher(timeout=5)
+        assert matcher.automaton is not automaton
+        assert matcher.feed_text(";fir\t") == []
+
+    def test_reads_trigger_setting(self, manager):
+        """Test que se usa abbreviation_trigger de la configuración."""
+        with manager.db.get_session() as session:
+            session.get(SettingsDB, "abbreviation_trigger").value = "enter"
+            session.commit()
+        manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Saludos"))
+
+        matcher = manager.keystroke_matcher()
+
+        assert matcher.feed_text(";fir\t") == []
+        assert matcher.feed_text(";fir\n")[0].trigger == "\n"
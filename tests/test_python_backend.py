@@ -0,0 +1,365 @@
+"""
+Tests para el backend Python de Electron (modo one-shot y daemon JSON lines).
+"""
+
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "electron-app"))
+
+import python_backend  # noqa: E402
+from core.database import Database  # noqa: E402
+from core.models import SnippetDB, SnippetVariableDB  # noqa: E402
+from core.snippet_manager import SnippetManager  # noqa: E402
+
+
+class TestPythonBackend:
+    """Tests para el despachador del backend."""
+
+    @pytest.fixture(autouse=True)
+    def backend(self, tmp_path, monkeypatch):
+        """Fixture que apunta el backend a una base de datos temporal."""
+        db = Database(str(tmp_path / "backend.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        monkeypatch.setattr(python_backend, "db", db)
+        monkeypatch.setattr(python_backend, "manager", SnippetManager(db))
+        return python_backend
+
+    def _serve(self, backend, requests: list) -> list[dict]:
+        """Ejecutar el daemon con una lista de peticiones y devolver las respuestas."""
+        stdin = io.BytesIO(
+            b"".join(
+                (r if isinstance(r, bytes) else json.dumps(r).encode("utf-8")) + b"\n"
+                for r in requests
+            )
+        )
+        stdout = io.BytesIO()
+        backend.serve(stdin, stdout)
+        return [json.loads(line) for line in stdout.getvalue().decode("utf-8").splitlines()]
+
+    def test_handle_request_unknown_function(self, backend):
+        """Test función desconocida."""
+        response = backend.handle_request({"id": 7, "func": "nope", "args": []})
+        assert response == {"id": 7, "error": "Unknown function"}
+
+    def test_handle_request_wrong_arguments(self, backend):
+        """Test argumentos que no encajan con la firma."""
+        response = backend.handle_request({"id": 1, "func": "search_snippets", "args": []})
+        assert response["error"] == "Unknown function"
+
+    def test_serve_roundtrip(self, backend):
+        """Test ciclo completo crear/buscar en modo daemon."""
+        responses = self._serve(backend, [
+            {"id": 1, "func": "health"},
+            {"id": 2, "func": "create_snippet", "args": [
+                {"name": "Firma", "abbreviation": ";firma", "content_text": "Saludos"}
+            ]},
+            {"id": 3, "func": "search_snippets", "args": ["fir"]},
+        ])
+
+        assert responses[0]["event"] == "ready"
+        by_id = {r["id"]: r for r in responses[1:]}
+        assert by_id[1]["result"] == {"status": "healthy"}
+        assert by_id[2]["result"]["abbreviation"] == ";firma"
+        assert [s["name"] for s in by_id[3]["result"]] == ["Firma"]
+
+    def test_serve_invalid_json_keeps_running(self, backend):
+        """Test que una línea inválida no detiene el daemon."""
+        responses = self._serve(backend, [b"{not json", {"id": 2, "func": "root"}])
+
+        assert responses[1] == {"id": None, "error": "Invalid JSON"}
+        assert responses[2]["result"]["message"] == "ApareText API"
+
+    def test_serve_large_response_single_line(self, backend):
+        """Test que respuestas grandes viajan en una única línea."""
+        big_text = "x" * 200_000 + "\nsegunda línea"
+        responses = self._serve(backend, [
+            {"id": 1, "func": "create_snippet", "args": [
+                {"name": "Grande", "content_text": big_text}
+            ]},
+        ])
+
+        assert responses[1]["result"]["content_text"] == big_text
+
+    def test_cli_main(self, backend, capsys):
+        """Test modo one-shot por línea de comandos."""
+        assert backend.main(["python_backend.py", "health"]) == 0
+        assert json.loads(capsys.readouterr().out) == {"status": "healthy"}
+
+        backend.main(["python_backend.py", "get_snippet"])
+        assert json.loads(capsys.readouterr().out) == {"error": "Unknown function"}
+
+    def test_latest_wins_drops_queued_requests(self, backend):
+        """Test que las búsquedas sustituidas en cola no se ejecutan."""
+        before = backend.metrics.snapshot()
+        accepted = [
+            backend.accept_request(
+                json.dumps({"id": i, "func": "search_snippets", "args": [q], "stream": "palette"}).encode()
+            )
+            for i, q in enumerate(["f", "fi", "fir"], start=1)
+        ]
+
+        responses = [backend.run_request(*item) for item in accepted]
+
+        assert responses[0] == {"id": 1, "cancelled": True}
+        assert responses[1] == {"id": 2, "cancelled": True}
+        assert responses[2] == {"id": 3, "result": []}
+        after = backend.metrics.snapshot()
+        assert after["cancelled_queued"] - before["cancelled_queued"] == 2
+        assert after["served"] - before["served"] == 1
+
+    def test_latest_wins_interrupts_in_flight(self, backend, monkeypatch):
+        """Test que una consulta en curso se interrumpe al llegar otra más nueva."""
+
+        def slow_search(query):
+            # Llega una pulsación nueva mientras la consulta está en marcha
+            backend.accept_request(
+                json.dumps({"id": 99, "func": "search_snippets", "args": ["x"], "stream": "palette"}).encode()
+            )
+            with backend.db.get_session() as session:
+                session.connection().exec_driver_sql(
+                    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 10000000) "
+                    "SELECT count(*) FROM c"
+                ).scalar()
+            return []
+
+        monkeypatch.setitem(backend.FUNCTIONS, "search_snippets", slow_search)
+        before = backend.metrics.snapshot()
+
+        response = backend.run_request(*backend.accept_request(
+            json.dumps({"id": 1, "func": "search_snippets", "args": ["f"], "stream": "palette"}).encode()
+        ))
+
+        assert response == {"id": 1, "cancelled": True}
+        after = backend.metrics.snapshot()
+        assert after["cancelled_in_flight"] - before["cancelled_in_flight"] == 1
+
+    def test_streams_are_independent(self, backend):
+        """Test que streams distintos no se cancelan entre sí."""
+        first = backend.accept_request(b'{"id": 1, "func": "health", "stream": "a"}')
+        second = backend.accept_request(b'{"id": 2, "func": "health", "stream": "b"}')
+
+        assert backend.run_request(*first)["result"] == {"status": "healthy"}
+        assert backend.run_request(*second)["result"] == {"status": "healthy"}
+
+    def test_batch_results_in_order_with_item_errors(self, backend):
+        """Test batch con resultados en orden y errores por elemento."""
+        created = backend.create_snippet({"name": "Firma", "abbreviation": ";firma", "content_text": "Hola"})
+
+        response = backend.handle_request({"id": 5, "batch": [
+            {"func": "get_snippet", "args": [created["id"]]},
+            {"func": "nope"},
+            {"func": "create_snippet", "args": [{"name": ""}]},
+            {"func": "search_snippets", "args": ["firma"]},
+            "garbage",
+        ]})
+
+        assert response["id"] == 5
+        items = response["result"]
+        assert items[0]["result"]["name"] == "Firma"
+        assert items[1] == {"error": "Unknown function"}
+        assert "error" in items[2]
+        assert [s["id"] for s in items[3]["result"]] == [created["id"]]
+        assert items[4] == {"error": "Invalid request"}
+
+    def test_batch_failed_write_does_not_undo_others(self, backend):
+        """Test que un fallo en un elemento no deshace las escrituras de los demás."""
+        response = backend.handle_request({"id": 1, "batch": [
+            {"func": "create_snippet", "args": [{"name": "Uno", "content_text": "1"}]},
+            {"func": "update_snippet", "args": ["missing", {"name": ""}]},
+            {"func": "create_snippet", "args": [{"name": "Dos", "content_text": "2"}]},
+        ]})
+
+        assert "error" in response["result"][1]
+        names = sorted(s["name"] for s in backend.get_snippets())
+        assert names == ["Dos", "Uno"]
+
+    def test_batch_cli(self, backend, capsys):
+        """Test batch desde la línea de comandos."""
+        backend.main(["python_backend.py", "batch", json.dumps([{"func": "health"}, {"func": "root"}])])
+
+        items = json.loads(capsys.readouterr().out)
+        assert items[0] == {"result": {"status": "healthy"}}
+        assert items[1]["result"]["version"] == "0.1.0"
+
+    def test_fuzzy_search(self, backend):
+        """Test búsqueda fuzzy con posiciones serializadas."""
+        backend.create_snippet({"name": "Firma email", "content_text": "Saludos"})
+
+        matches = backend.fuzzy_search("fem", "5")
+
+        assert matches[0]["snippet"]["name"] == "Firma email"
+        assert matches[0]["field"] == "name"
+        assert matches[0]["positions"] == [0, 6, 7]
+
+    def test_match_suffix(self, backend):
+        """Test coincidencia de abreviatura al final del buffer."""
+        created = backend.create_snippet({"name": "Firma", "abbreviation": ";fir", "content_text": "Saludos"})
+
+        assert backend.match_suffix("hola ;fir") == {"snippet_id": created["id"], "abbreviation": ";fir"}
+        assert backend.match_suffix("hola ;fi") is None
+
+    def test_feed_keys(self, backend):
+        """Test expansión al pulsar la tecla de disparo."""
+        created = backend.create_snippet({"name": "Firma", "abbreviation": ";fir", "content_text": "Saludos"})
+
+        assert backend.feed_keys("hola ;fi") == []
+        assert backend.feed_keys("r\t") == [
+            {"snippet_id": created["id"], "abbreviation": ";fir", "trigger": "\t", "erase": 5}
+        ]
+
+    def test_search_session(self, backend):
+        """Test búsqueda con sesión nombrada: refina al ampliar la consulta."""
+        backend.create_snippet({"name": "Firma", "content_text": "Saludos"})
+        backend.create_snippet({"name": "Fichero", "content_text": "Datos"})
+
+        assert len(backend.search_snippets("fi", "false", None, None, "palette")) == 2
+        assert [s["name"] for s in backend.search_snippets("fir", "false", None, None, "palette")] == ["Firma"]
+        assert backend.search_sessions[("", "palette")].stats() == {"refined": 1, "full": 1}
+
+    def test_search_sessions_bounded_and_released(self, backend, monkeypatch):
+        """Test que las sesiones de búsqueda son por cliente, acotadas y se liberan."""
+        monkeypatch.setattr(backend, "search_sessions", backend.OrderedDict())
+        monkeypatch.setattr(backend, "MAX_SEARCH_SESSIONS", 2)
+        for client, name in (("conn1:", "palette"), ("conn2:", "palette"), ("conn1:", "sidebar")):
+            backend.run_request({"id": 1, "func": "search_snippets", "args": ["x", "false", None, None, name]},
+                                None, client)
+
+        assert list(backend.search_sessions) == [("conn2:", "palette"), ("conn1:", "sidebar")]
+        backend.release_client("conn1:")
+        assert list(backend.search_sessions) == [("conn2:", "palette")]
+
+    def test_full_text_search(self, backend):
+        """Test búsqueda en el contenido desde el backend."""
+        created = backend.create_snippet({"name": "Saludo", "content_text": "Gracias por la factura"})
+
+        assert backend.search_snippets("factura") == []
+        assert [s["id"] for s in backend.search_snippets("factura", "true")] == [created["id"]]
+        assert backend.full_text_search("factu")[0]["excerpt"].startswith("Gracias por la \x02factura")
+        assert backend.rebuild_fulltext() == {"available": True, "indexed": 1}
+
+    def test_health_does_not_import_orm(self):
+        """Test que health no carga SQLAlchemy ni Pydantic."""
+        import subprocess
+
+        code = (
+            "import sys\n"
+            "import python_backend\n"
+            "assert python_backend.call_function('health') == {'status': 'healthy'}\n"
+            "assert 'sqlalchemy' not in sys.modules\n"
+            "assert 'pydantic' not in sys.modules\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.join(os.path.dirname(__file__), "..", "electron-app"),
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, result.stderr
+
+    def test_expansions_served_from_snapshot(self, tmp_path):
+        """Test que la primera expansión sale de la instantánea sin cargar el ORM."""
+        import subprocess
+
+        from core.models import Snippet
+
+        home = tmp_path / "home"
+        (home / ".aparetext").mkdir(parents=True)
+        db = Database(str(home / ".aparetext" / "aparetext.db"))
+        created = SnippetManager(db).create_snippet(
+            Snippet(name="Firma", abbreviation=";fir", content_text="Hola {{nombre}}")
+        )
+        SnippetManager(db).refresh_expansion_snapshot()
+        request = {"abbreviation": ";fir", "variables": {"nombre": "Ana"}}
+        run = {
+            "cwd": os.path.join(os.path.dirname(__file__), "..", "electron-app"),
+            "env": {**os.environ, "HOME": str(home)},
+            "capture_output": True,
+            "text": True,
+        }
+
+        code = (
+            "import sys\n"
+            "import python_backend\n"
+            "print(python_backend.call_function('match_suffix', ['hola ;fir'])['snippet_id'])\n"
+            f"print(python_backend.call_function('expand_snippet', [{request!r}])['expanded'])\n"
+            "assert 'sqlalchemy' not in sys.modules\n"
+            "assert 'pydantic' not in sys.modules\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], **run)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.splitlines() == [created.id, "Hola Ana"]
+
+        # El modo one-shot registra el uso después de responder
+        result = subprocess.run(
+            [sys.executable, "python_backend.py", "expand_snippet", json.dumps(request)], **run
+        )
+        assert json.loads(result.stdout) == {"expanded": "Hola Ana"}
+        with db.get_session() as session:
+            assert session.get(SnippetDB, created.id).usage_count == 1
+
+    def test_parse_importtime(self, backend):
+        """Test parseo de la salida de -X importtime."""
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   json.decoder\n"
+            "import time:       300 |        420 | json\n"
+        )
+
+        entries = backend._parse_importtime(output)
+
+        assert entries == [
+            {"module": "json.decoder", "depth": 1, "self_ms": 0.12, "cumulative_ms": 0.12},
+            {"module": "json", "depth": 0, "self_ms": 0.3, "cumulative_ms": 0.42},
+        ]
+
+    def test_get_snippet_media(self, backend):
+        """Test lectura aparte de la imagen que las búsquedas omiten."""
+        image = "data:image/png;base64,AAAA"
+        created = backend.create_snippet({"name": "Logo", "snippet_type": "image", "image_data": image})
+
+        assert backend.search_snippets("logo")[0]["image_data"] is None
+        assert backend.get_snippet_media(created["id"]) == {"image_data": image, "thumbnail": None}
+
+    def test_bulk_functions(self, backend):
+        """Test escrituras masivas desde el backend, con un resultado por elemento."""
+        created = backend.create_snippets([{"id": "a", "name": "Uno"}, {"name": ""}])
+        assert [(item["id"], item["status"]) for item in created] == [("a", "created"), (None, "error")]
+
+        upserted = backend.upsert_snippets([{"id": "a", "name": "Uno bis"}, {"id": "b", "name": "Dos"}])
+        assert [item["status"] for item in upserted] == ["updated", "created"]
+        assert backend.get_snippet("a")["name"] == "Uno bis"
+
+        deleted = backend.delete_snippets(["a", "b", "c"])
+        assert [item["status"] for item in deleted] == ["deleted", "deleted", "not_found"]
+
+    def test_bulk_mutations(self, backend):
+        """Test cambios masivos por lista de IDs o por filtro desde el backend."""
+        backend.create_snippets([{"id": "a", "name": "Uno", "tags": ["x"]}, {"id": "b", "name": "Dos"}])
+
+        assert backend.bulk_set_enabled(False, {"where": {"tags": ["x"]}}) == {"matched": 1, "changed": 1}
+        assert backend.bulk_set_category("Work", {"snippet_ids": ["a", "b"]}) == {"matched": 2, "changed": 2}
+        assert backend.bulk_add_tags(["y"], {"snippet_ids": ["b"], "versioned": True})["changed"] == 1
+        assert backend.get_snippet("a")["enabled"] is False
+        assert backend.get_snippet("b")["tags"] == ["y"]
+
+    def test_collect_blob_garbage(self, backend):
+        """Test GC del almacén de imágenes desde el backend."""
+        assert backend.collect_blob_garbage() == {"blobs": 0, "files": 0, "bytes": 0}
+
+    def test_compact_versions(self, backend):
+        """Test compactación del historial desde el backend."""
+        backend.create_snippets([{"id": "a", "name": "Uno"}])
+        backend.upsert_snippets([{"id": "a", "name": "Uno bis"}])
+        backend.upsert_snippets([{"id": "a", "name": "Uno ter"}])
+
+        stats = backend.compact_versions()
+
+        assert stats["deleted"] == 0 and stats["snippets"] >= 1
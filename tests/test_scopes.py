@@ -0,0 +1,130 @@
+"""
+Tests para el índice de scopes (app y dominio).
+"""
+
+import pytest
+
+from core.database import Database
+from core.models import ScopeType, Snippet, SnippetDB, SnippetVariableDB
+from core.scopes import ScopeIndex, domain_labels, scope_matches
+from core.snippet_manager import SnippetManager
+
+
+def test_domain_labels():
+    """Test etiquetas invertidas normalizadas."""
+    assert domain_labels("Mail.Google.com.") == ["com", "google", "mail"]
+
+
+def test_scope_matches():
+    """Test reglas de scope por app y por sufijo de dominio."""
+    assert scope_matches("global", [], None, None)
+    assert scope_matches("domains", ["github.com"], None, "GitHub.com")
+    assert scope_matches("domains", ["google.com"], None, "mail.google.com")
+    assert not scope_matches("domains", ["github.com"], None, "github.com.evil.io")
+    assert not scope_matches("domains", ["gmail.com"], None, "notgmail.com")
+    assert not scope_matches("apps", ["code.exe"], None, "code.exe")
+    assert scope_matches("apps", ["Slack.exe"], "slack.exe", None)
+
+
+class TestScopeIndex:
+    """Tests para ScopeIndex."""
+
+    @pytest.fixture
+    def index(self):
+        """Índice con snippets globales, por app y por dominio."""
+        index = ScopeIndex()
+        index.add("g", "global")
+        index.add("slack", "apps", ["Slack.exe"])
+        index.add("google", "domains", ["google.com"])
+        index.add("mail", "domains", ["mail.google.com", "outlook.com"])
+        return index
+
+    def test_lookup(self, index):
+        """Test búsqueda por app y sufijo de dominio."""
+        assert index.lookup(app="SLACK.EXE") == {"slack"}
+        assert index.lookup(domain="mail.google.com") == {"google", "mail"}
+        assert index.lookup(domain="docs.google.com") == {"google"}
+        assert index.lookup(domain="google.com.evil.io") == set()
+        assert index.lookup(app="slack.exe", domain="outlook.com") == {"slack", "mail"}
+        assert index.lookup() == set()
+        assert index.matches("g", set())
+
+    def test_replace_and_remove_prunes(self, index):
+        """Test reemplazo de scope y poda del trie."""
+        index.add("google", "global")
+        assert index.lookup(domain="docs.google.com") == set()
+        assert index.matches("google", set())
+
+        for snippet_id in ("g", "slack", "google", "mail"):
+            index.remove(snippet_id)
+        assert len(index) == 0
+        assert index._domains == {}
+        assert index._apps == {}
+
+
+class TestSnippetManagerContext:
+    """Tests del filtrado por contexto en SnippetManager."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Gestor con un snippet global, uno por app y uno por dominio."""
+        db = Database(str(tmp_path / "scopes.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        manager = SnippetManager(db)
+        manager.create_snippet(Snippet(name="Firma global", abbreviation=";f", content_text="g"))
+        manager.create_snippet(Snippet(
+            name="Firma slack", abbreviation=";f", content_text="s",
+            scope_type=ScopeType.APPS, scope_values=["slack.exe"],
+        ))
+        manager.create_snippet(Snippet(
+            name="Firma google", abbreviation=";fg", content_text="d",
+            scope_type=ScopeType.DOMAINS, scope_values=["google.com"],
+        ))
+        return manager
+
+    def test_get_snippets_for_context(self, manager):
+        """Test globales más los del contexto."""
+        names = lambda snippets: sorted(s.name for s in snippets)  # noqa: E731
+
+        assert names(manager.get_snippets_for_context()) == ["Firma global"]
+        assert names(manager.get_snippets_for_context(app="Slack.exe")) == ["Firma global", "Firma slack"]
+        assert names(manager.get_snippets_for_context(domain="mail.google.com")) == ["Firma global", "Firma google"]
+
+    def test_search_with_context(self, manager):
+        """Test filtro de contexto en las rutas de búsqueda."""
+        assert len(manager.search_snippets("firma")) == 3
+        assert sorted(s.name for s in manager.search_snippets("firma", domain="docs.google.com")) == [
+            "Firma global", "Firma google",
+        ]
+        assert [s.name for s in manager.search_snippets("slack", domain="google.com")] == []
+
+        manager.use_search_index = False
+        assert len(manager.search_snippets("firma", app="slack.exe")) == 2
+
+    def test_search_with_many_context_ids(self, manager, monkeypatch):
+        """Test filtro en Python cuando hay demasiados IDs para un IN."""
+        monkeypatch.setattr("core.snippet_manager.MAX_IN_PARAMS", 0)
+        manager.use_search_index = False
+
+        assert sorted(s.name for s in manager.search_snippets("firma", app="slack.exe")) == [
+            "Firma global", "Firma slack",
+        ]
+        assert len(manager.get_snippets_for_context(app="slack.exe")) == 2
+
+    def test_abbreviation_with_context(self, manager):
+        """Test que el scope específico gana a la abreviatura global."""
+        assert manager.get_snippet_by_abbreviation(";f", app="slack.exe").name == "Firma slack"
+        assert manager.get_snippet_by_abbreviation(";f", app="code.exe").name == "Firma global"
+        assert manager.get_snippet_by_abbreviation(";fg", app="code.exe") is None
+        assert manager.match_suffix("x ;fg", domain="mail.google.com").abbreviation == ";fg"
+
+    def test_index_follows_scope_changes(self, manager):
+        """Test que el índice sigue a los cambios de scope."""
+        slack = manager.search_snippets("slack")[0]
+        manager.update_snippet(slack.id, slack.model_copy(update={"scope_values": ["teams.exe"]}))
+
+        assert "Firma slack" in [s.name for s in manager.search_snippets("firma", app="teams.exe")]
+        assert "Firma slack" not in [s.name for s in manager.get_snippets_for_context(app="slack.exe")]
@@ -0,0 +1,137 @@
+"""
+Tests para el índice de trigramas en memoria.
+"""
+
+import json
+import random
+
+import pytest
+
+from core.database import Database
+from core.models import Snippet, SnippetDB, SnippetVariableDB
+from core.search_index import TrigramIndex, fold_ascii
+from core.snippet_manager import SnippetManager
+
+
+class TestTrigramIndex:
+    """Tests para la clase TrigramIndex."""
+
+    def test_fold_ascii_only_touches_ascii(self):
+        """Test que solo se pliegan mayúsculas ASCII, como en SQLite."""
+        assert fold_ascii("ÁbC É") == "Ábc É"
+
+    def test_search_substring(self):
+        """Test búsqueda de subcadenas en varios campos."""
+        index = TrigramIndex()
+        index.add("1", ("Email Template", "mail", "email,work"))
+        index.add("2", ("Firma", ";firma", None))
+
+        assert index.search("templ") == ["1"]
+        assert index.search("FIRM") == ["2"]
+        assert index.search("ma") == ["1", "2"]  # Consultas cortas: recorrido completo
+        assert index.search("zzz") == []
+
+    def test_no_cross_field_matches(self):
+        """Test que una coincidencia no puede cruzar dos campos."""
+        index = TrigramIndex()
+        index.add("1", ("abc", "def", None))
+
+        assert index.search("cde") == []
+
+    def test_update_and_remove(self):
+        """Test reindexado y borrado."""
+        index = TrigramIndex()
+        index.add("1", ("alpha", None, None))
+        index.add("1", ("bravo", None, None))
+
+        assert index.search("alpha") == []
+        assert index.search("bravo") == ["1"]
+        assert len(index) == 1
+
+        index.remove("1")
+        assert index.search("bravo") == []
+        assert "1" not in index
+
+    def test_compaction_keeps_results(self):
+        """Test que la compactación conserva los documentos vivos."""
+        index = TrigramIndex()
+        index.COMPACT_MIN_DEAD = 4
+        for i in range(10):
+            index.add(str(i), (f"item {i}", None, None))
+        for i in range(8):
+            index.remove(str(i))
+
+        assert sorted(index.search("item")) == ["8", "9"]
+        assert len(index._docs) < 10
+        assert index._dead < 4
+
+
+class TestSnippetManagerSearchIndex:
+    """Tests de search_snippets con índice frente a ilike."""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Fixture para base de datos vacía."""
+        db = Database(str(tmp_path / "index.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return db
+
+    def test_index_matches_ilike_semantics(self, db):
+        """Test que el índice devuelve lo mismo que la consulta ilike."""
+        rng = random.Random(7)
+        words = ["Email", "firma", "Café", "ÉCLAIR", "report", "Meeting", "x", "nota"]
+        indexed = SnippetManager(db)
+        for i in range(120):
+            indexed.create_snippet(Snippet(
+                name=" ".join(rng.sample(words, 2)) + f" {i}",
+                abbreviation=rng.choice([None, f";{rng.choice(words).lower()}{i}"]),
+                content_text="body",
+                tags=rng.sample(["work", "Mail", "é", "misc"], rng.randint(0, 2)),
+                enabled=rng.random() > 0.2,
+            ))
+        plain = SnippetManager(db, use_search_index=False)
+
+        queries = ["e", "ma", "MAIL", "firm", "café", "CAFÉ", "éclair", "Éclair",
+                   "ing 1", "ork,m", "1", "zzz", "a_l", "%"]
+        for query in queries:
+            for enabled_only in (True, False):
+                expected = {s.id for s in plain.search_snippets(query, enabled_only=enabled_only)}
+                actual = {s.id for s in indexed.search_snippets(query, enabled_only=enabled_only)}
+                assert actual == expected, query
+
+    def test_index_follows_writes(self, db):
+        """Test mantenimiento incremental en create/update/delete/import."""
+        manager = SnippetManager(db)
+        created = manager.create_snippet(Snippet(name="Alpha", content_text="a"))
+        assert [s.id for s in manager.search_snippets("alph")] == [created.id]
+
+        manager.update_snippet(created.id, Snippet(name="Bravo", content_text="a"))
+        assert manager.search_snippets("alph") == []
+        assert [s.id for s in manager.search_snippets("brav")] == [created.id]
+
+        other = manager.create_snippet(Snippet(name="Charlie", content_text="c"))
+        assert [s.id for s in manager.search_snippets("charl")] == [other.id]
+
+        manager.delete_snippet(other.id)
+        assert manager.search_snippets("charl") == []
+
+    def test_index_follows_import(self, db, tmp_path):
+        """Test que import_from_json actualiza el índice."""
+        manager = SnippetManager(db)
+        manager.create_snippet(Snippet(name="Existing", content_text="e"))
+        assert manager.search_snippets("delta") == []
+
+        export_path = tmp_path / "import.json"
+        export_path.write_text(json.dumps({
+            "version": "1.0.0",
+            "snippets": [{"id": "imported-1", "name": "Delta import", "content_text": "d"}],
+        }), encoding="utf-8")
+        db.import_from_json(str(export_path))
+
+        assert [s.id for s in manager.search_snippets("delta")] == ["imported-1"]
+
+        db.import_from_json(str(export_path), replace=True)
+        assert manager.search_snippets("exist") == []
@@ -0,0 +1,80 @@
+"""
+Tests para la sesión de búsqueda con refinamiento incremental.
+"""
+
+import pytest
+
+from core.database import Database
+from core.models import Snippet, SnippetDB, SnippetVariableDB
+from core.search_session import matches_query
+from core.snippet_manager import SnippetManager
+
+
+def test_matches_query_like_ilike():
+    """Test misma semántica que ilike: subcadena y mayúsculas ASCII."""
+    snippet = Snippet(name="Firma Email", abbreviation=";FE", content_text="x", tags=["trabajo", "correo"])
+
+    assert matches_query(snippet, "irma e")
+    assert matches_query(snippet, ";fe")
+    assert matches_query(snippet, "bajo,cor")
+    assert not matches_query(snippet, "saludo")
+
+
+class TestSearchSession:
+    """Tests de SearchSession."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Gestor con unos cuantos snippets."""
+        db = Database(str(tmp_path / "session.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        manager = SnippetManager(db)
+        for name in ["Firma", "Firmado", "Fichero", "Informe"]:
+            manager.create_snippet(Snippet(name=name, content_text=name))
+        return manager
+
+    def _names(self, snippets):
+        return sorted(s.name for s in snippets)
+
+    def test_refines_when_query_extends(self, manager, monkeypatch):
+        """Test que ampliar la consulta filtra en memoria."""
+        session = manager.search_session()
+        assert self._names(session.search("fi")) == ["Fichero", "Firma", "Firmado"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("no debe volver a buscar")
+
+        monkeypatch.setattr(manager, "search_snippets", fail)
+        assert self._names(session.search("fir")) == ["Firma", "Firmado"]
+        assert self._names(session.search("firmad")) == ["Firmado"]
+        assert session.stats() == {"refined": 2, "full": 1}
+
+    def test_falls_back_on_backspace_edit_and_filters(self, manager):
+        """Test búsqueda completa al borrar, editar o cambiar filtros."""
+        session = manager.search_session()
+        session.search("firm")
+
+        assert self._names(session.search("fir")) == ["Firma", "Firmado"]
+        assert self._names(session.search("inf")) == ["Informe"]
+        assert session.search("info", full_text=True) is not None
+        assert session.stats() == {"refined": 0, "full": 4}
+
+    def test_falls_back_after_write(self, manager):
+        """Test que una escritura obliga a buscar entero."""
+        session = manager.search_session()
+        session.search("fi")
+        manager.create_snippet(Snippet(name="Firmeza", content_text="x"))
+
+        assert "Firmeza" in self._names(session.search("fir"))
+        assert session.stats()["refined"] == 0
+
+    def test_refined_matches_full_search(self, manager):
+        """Test que el resultado refinado coincide con la búsqueda completa."""
+        session = manager.search_session()
+        session.search("")
+        for query in ["i", "in", "inf", "info"]:
+            assert self._names(session.search(query)) == self._names(manager.search_snippets(query)), query
+        assert session.stats()["refined"] == 4
@@ -2,6 +2,8 @@
 Tests para el módulo SnippetManager.
 """
 
+import threading
+
 import pytest
 from unittest.mock import Mock
 from datetime import datetime, UTC
@@ -207,6 +209,59 @@ class TestSnippetManager:
         result = manager.update_snippet("nonexistent-id", snippet)
         assert result is None
 
+    def test_update_snippet_noop_writes_nothing(self, manager, db):
+        """Test que guardar sin cambios no escribe ni crea versión."""
+        image = "data:image/png;base64,iVBORw0KGgo="
+        created = manager.create_snippet(Snippet(
+            name="Logo", snippet_type="image", image_data=image, tags=["a"],
+            variables=[SnippetVariable(key="nombre", label="Nombre")],
+        ))
+        current = manager.get_snippet(created.id)
+
+        with db.count_statements() as counter:
+            result = manager.update_snippet(created.id, current)
+
+        writes = [sql for sql in counter.statements if sql.split()[0] in ("INSERT", "UPDATE", "DELETE")]
+        assert writes == []
+        assert result == current
+        assert manager.get_snippet_versions(created.id) == []
+
+    def test_update_snippet_writes_changed_columns(self, manager, db):
+        """Test que cambiar enabled solo escribe esa columna (y la versión)."""
+        created = manager.create_snippet(Snippet(
+            name="Firma", content_text="Hola", variables=[SnippetVariable(key="nombre")],
+        ))
+
+        with db.count_statements() as counter:
+            updated = manager.update_snippet(created.id, created.model_copy(update={"enabled": False}))
+
+        (update,) = [sql for sql in counter.statements if sql.startswith("UPDATE snippets ")]
+        assert update.startswith("UPDATE snippets SET enabled=?, updated_at=?")
+        variable_writes = ("INSERT INTO snippet_variables", "UPDATE snippet_variables", "DELETE FROM snippet_variables")
+        assert not any(sql.startswith(variable_writes) for sql in counter.statements)
+        assert updated.enabled is False
+        assert updated.variables[0].id == created.variables[0].id
+        assert len(manager.get_snippet_versions(created.id)) == 1
+
+    def test_update_snippet_variables_by_key(self, manager):
+        """Test que las variables se actualizan en su sitio por key."""
+        created = manager.create_snippet(Snippet(name="Vars", variables=[
+            SnippetVariable(key="a"), SnippetVariable(key="b"), SnippetVariable(key="c"),
+        ]))
+        ids = {var.key: var.id for var in created.variables}
+
+        updated = manager.update_snippet(created.id, created.model_copy(update={"variables": [
+            SnippetVariable(key="a", label="A"), SnippetVariable(key="c"), SnippetVariable(key="d"),
+        ]}))
+
+        assert [(var.key, var.label) for var in updated.variables] == [("a", "A"), ("c", None), ("d", None)]
+        assert (updated.variables[0].id, updated.variables[1].id) == (ids["a"], ids["c"])
+
+        reordered = manager.update_snippet(created.id, updated.model_copy(
+            update={"variables": list(reversed(updated.variables))}
+        ))
+        assert [var.key for var in reordered.variables] == ["d", "c", "a"]
+
     def test_delete_snippet_existing(self, manager):
         """Test eliminar snippet existente."""
         # Crear snippet
@@ -393,4 +448,187 @@ class TestSnippetManager:
             assert converted.name == "Test Snippet"
             assert converted.abbreviation == "test"
             assert converted.tags == ["tag1", "tag2"]
-            assert converted.category == "test_category"
\ No newline at end of file
+            assert converted.category == "test_category"
+
+    def test_db_to_pydantic_trusted_matches_validated(self, manager):
+        """Test que la hidratación sin validar da lo mismo que validar."""
+        created = manager.create_snippet(Snippet(
+            name="Dominios",
+            abbreviation=";dom",
+            content_text="Hola {{nombre}}",
+            tags=["a", "b"],
+            scope_type=ScopeType.DOMAINS,
+            scope_values=["example.com"],
+            variables=[SnippetVariable(key="nombre", label="Nombre", options=["x"])],
+        ))
+
+        with manager.db.get_session() as session:
+            snippet_db = session.query(SnippetDB).filter_by(id=created.id).first()
+            trusted = manager._db_to_pydantic(snippet_db)
+            session.expire(snippet_db)  # Fila expirada: se leen los atributos con getattr
+            expired = manager._db_to_pydantic(snippet_db)
+
+        validated = Snippet.model_validate(trusted.model_dump())
+        assert trusted == validated == expired
+        assert trusted.model_dump(mode="json") == validated.model_dump(mode="json")
+        assert trusted.variables[0].snippet_id == created.id
+
+    def test_inbound_data_still_validated(self, manager):
+        """Test que los datos que llegan de fuera se siguen validando."""
+        with pytest.raises(ValueError):
+            Snippet(name="", content_text="x")
+        with pytest.raises(ValueError):
+            Snippet(name="Con espacios", abbreviation="a b", content_text="x")
+
+    def test_list_snippets_summary_pages(self, manager):
+        """Test listado paginado con proyección summary."""
+        for i in range(7):
+            manager.create_snippet(Snippet(
+                name=f"Snippet {i}",
+                abbreviation=f"s{i}",
+                content_text=f"Content {i}",
+                tags=["tag"],
+                usage_count=i % 3,
+            ))
+
+        seen = []
+        cursor = None
+        while True:
+            page = manager.list_snippets(order_by="usage_count", descending=True, limit=3, cursor=cursor)
+            assert page["total"] == 7
+            seen.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert len(seen) == 7
+        assert len({item.id for item in seen}) == 7
+        counts = [item.usage_count for item in seen]
+        assert counts == sorted(counts, reverse=True)
+        assert seen[0].tags == ["tag"]
+        assert not hasattr(seen[0], "content_text")
+
+    def test_list_snippets_by_name_and_created_at(self, manager):
+        """Test orden por nombre y fecha de creación con cursores."""
+        for name in ["delta", "alpha", "charlie", "bravo"]:
+            manager.create_snippet(Snippet(name=name, content_text=name))
+
+        first = manager.list_snippets(order_by="name", limit=2)
+        second = manager.list_snippets(order_by="name", limit=2, cursor=first["next_cursor"])
+        assert [s.name for s in first["items"] + second["items"]] == ["alpha", "bravo", "charlie", "delta"]
+        assert second["next_cursor"] is None
+
+        by_date = manager.list_snippets(order_by="created_at", limit=1)
+        names = [by_date["items"][0].name]
+        while by_date["next_cursor"]:
+            by_date = manager.list_snippets(order_by="created_at", limit=1, cursor=by_date["next_cursor"])
+            names.extend(s.name for s in by_date["items"])
+        assert names == ["delta", "alpha", "charlie", "bravo"]
+
+    def test_list_snippets_full_and_filters(self, manager):
+        """Test proyección full, enabled_only y validación de parámetros."""
+        manager.create_snippet(Snippet(name="On", content_text="x"))
+        manager.create_snippet(Snippet(name="Off", content_text="y", enabled=False))
+
+        page = manager.list_snippets(fields="full", enabled_only=True)
+        assert page["total"] == 1
+        assert isinstance(page["items"][0], Snippet)
+        assert page["items"][0].content_text == "x"
+
+        with pytest.raises(ValueError):
+            manager.list_snippets(order_by="content_text")
+        with pytest.raises(ValueError):
+            manager.list_snippets(cursor="not-a-cursor")
+
+    def _add_snippets_with_variables(self, manager, count):
+        for i in range(count):
+            manager.create_snippet(Snippet(
+                name=f"Snippet {i}",
+                content_text="Hola {{nombre}}",
+                variables=[SnippetVariable(key="nombre")],
+            ))
+
+    def test_get_all_snippets_fixed_statement_count(self, manager, db):
+        """Test que get_all_snippets carga las variables en bloque (sin N+1)."""
+        self._add_snippets_with_variables(manager, 2)
+        with db.count_statements() as few:
+            manager.get_all_snippets()
+        self._add_snippets_with_variables(manager, 20)
+        with db.count_statements() as many:
+            snippets = manager.get_all_snippets()
+
+        assert len(snippets) == 22
+        assert all(s.variables[0].key == "nombre" for s in snippets)
+        assert many.count == few.count
+
+    def test_get_snippet_versions_fixed_statement_count(self, manager, db):
+        """Test que las variables de las versiones se cargan en bloque."""
+        created = manager.create_snippet(Snippet(
+            name="Versionado", content_text="v0 {{nombre}}", variables=[SnippetVariable(key="nombre")],
+        ))
+
+        def save_versions(first, count):
+            for i in range(first, first + count):
+                current = manager.get_snippet(created.id)
+                manager.update_snippet(created.id, current.model_copy(update={"content_text": f"v{i} {{{{nombre}}}}"}))
+
+        save_versions(1, 2)
+        with db.count_statements() as few:
+            manager.get_snippet_versions(created.id)
+        save_versions(3, 10)
+        with db.count_statements() as many:
+            versions = manager.get_snippet_versions(created.id)
+
+        assert len(versions) >= 12
+        assert all(v.variables[0].key == "nombre" for v in versions)
+        assert many.count == few.count
+
+    def test_media_columns_deferred_in_searches(self, manager, db):
+        """Test que búsquedas y listados no leen image_data ni thumbnail."""
+        image = "data:image/png;base64," + "A" * 10_000
+        created = manager.create_snippet(Snippet(name="Foto logo", snippet_type="image", image_data=image))
+
+        with db.count_statements() as counter:
+            found = manager.search_snippets("logo")
+            page = manager.list_snippets(fields="full")
+            versions = manager.get_snippet_versions(created.id)
+
+        assert found[0].image_data is None
+        assert page["items"][0].image_data is None
+        assert all(v.image_data is None for v in versions)
+        assert not any("image_data" in statement for statement in counter.statements)
+
+        # Vistas de detalle: se cargan
+        assert manager.get_snippet(created.id).image_data == image
+        assert manager.get_all_snippets()[0].image_data == image
+        assert manager.get_snippet_media(created.id) == {"image_data": image, "thumbnail": None}
+        assert manager.get_snippet_media("missing") is None
+
+    def test_snapshot_writes_reach_indexes_after_commit(self, manager, db):
+        """Test que lo escrito en un snapshot llega a índices de otros hilos al confirmarse."""
+        # Índices ya construidos, como en un backend en marcha
+        assert manager.search_snippets("firma") == []
+        assert manager.match_suffix("hola ;fir") is None
+        written = threading.Event()
+        checked = threading.Event()
+        inside = []
+
+        def batch():
+            with db.snapshot():
+                manager.create_snippet(Snippet(name="Firma", abbreviation=";fir", content_text="Saludos"))
+                inside.extend(s.name for s in manager.search_snippets("firma"))
+                written.set()
+                checked.wait(5)
+
+        thread = threading.Thread(target=batch)
+        thread.start()
+        assert written.wait(5)
+        # Mientras el lote sigue abierto los demás hilos no lo ven (ni lo dan por indexado)
+        assert manager.search_snippets("firma") == []
+        assert manager.match_suffix("hola ;fir") is None
+        checked.set()
+        thread.join(5)
+
+        assert inside == ["Firma"]
+        assert [s.name for s in manager.search_snippets("firma")] == ["Firma"]
+        assert manager.match_suffix("hola ;fir").abbreviation == ";fir"
@@ -0,0 +1,175 @@
+"""
+Tests para las escrituras masivas del SnippetManager.
+"""
+
+import pytest
+
+from core.database import Database
+from core.models import (
+    Snippet, SnippetDB, SnippetTagDB, SnippetVariable, SnippetVariableDB, SnippetVersionDB,
+    SnippetVersionVariableDB,
+)
+from core.snippet_manager import SnippetManager
+
+
+class TestSnippetManagerBulk:
+    """Tests de create_snippets, upsert_snippets y delete_snippets."""
+
+    @pytest.fixture
+    def db(self):
+        """Fixture para base de datos en memoria sin snippets."""
+        db = Database(":memory:")
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetTagDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return db
+
+    @pytest.fixture
+    def manager(self, db):
+        """Fixture para SnippetManager."""
+        return SnippetManager(db)
+
+    def test_create_snippets_outcomes(self, manager):
+        """Test que los elementos inválidos no impiden crear los demás."""
+        existing = manager.create_snippet(Snippet(name="Existente"))
+
+        outcomes = manager.create_snippets([
+            {"id": "a", "name": "Firma", "abbreviation": ";fir", "tags": ["email", "work"],
+             "content_text": "Hola {{nombre}}", "variables": [{"key": "nombre"}]},
+            {"id": "b", "name": ""},
+            {"id": "a", "name": "Repetido"},
+            {"id": existing.id, "name": "Otra vez"},
+            Snippet(id="c", name="Modelo"),
+        ])
+
+        assert [(o.index, o.id, o.status) for o in outcomes] == [
+            (0, "a", "created"),
+            (1, "b", "error"),
+            (2, "a", "error"),
+            (3, existing.id, "error"),
+            (4, "c", "created"),
+        ]
+        assert outcomes[1].error.startswith("name:")
+        assert outcomes[2].error == "Duplicate id in batch"
+        assert outcomes[3].error == "Snippet already exists"
+
+        created = manager.get_snippet("a")
+        assert created.tags == ["email", "work"]
+        assert [var.key for var in created.variables] == ["nombre"]
+        assert manager.search_snippets("", tags=["work"])[0].id == "a"
+        assert manager.match_suffix("x ;fir").snippet_id == "a"
+
+    def test_create_snippets_uses_executemany(self, manager, db):
+        """Test que el número de sentencias no crece con el tamaño del lote."""
+        def batch(prefix):
+            return [
+                {"id": f"{prefix}{i}", "name": f"S{i}", "tags": ["t"], "variables": [{"key": "v"}]}
+                for i in range(50)
+            ]
+
+        with db.count_statements() as small:
+            manager.create_snippets(batch("x")[:5])
+        with db.count_statements() as large:
+            manager.create_snippets(batch("y"))
+
+        assert large.count == small.count
+
+    def test_upsert_snippets(self, manager, db):
+        """Test que upsert actualiza los existentes (con versión) y crea el resto."""
+        existing = manager.create_snippet(Snippet(
+            name="Firma", tags=["old"], usage_count=3,
+            variables=[SnippetVariable(key="nombre")],
+        ))
+
+        outcomes = manager.upsert_snippets([
+            {"id": existing.id, "name": "Firma nueva", "tags": ["new"], "variables": [{"key": "cargo"}]},
+            {"id": "nuevo", "name": "Nuevo"},
+        ])
+
+        assert [o.status for o in outcomes] == ["updated", "created"]
+        updated = manager.get_snippet(existing.id)
+        assert (updated.name, updated.tags, updated.usage_count) == ("Firma nueva", ["new"], 3)
+        assert [var.key for var in updated.variables] == ["cargo"]
+        assert manager.search_snippets("", tags=["old"]) == []
+
+        (version,) = manager.get_snippet_versions(existing.id)
+        assert (version.version_number, version.name, version.change_reason) == (1, "Firma", "Actualización masiva")
+        assert [var.key for var in version.variables] == ["nombre"]
+
+    def test_delete_snippets(self, manager, db):
+        """Test borrado masivo con sus filas dependientes."""
+        first = manager.create_snippet(Snippet(name="Uno", tags=["t"], variables=[SnippetVariable(key="v")]))
+        manager.update_snippet(first.id, first.model_copy(update={"name": "Uno bis"}))
+        second = manager.create_snippet(Snippet(name="Dos"))
+
+        outcomes = manager.delete_snippets([first.id, "no-existe", second.id, first.id])
+
+        assert [o.status for o in outcomes] == ["deleted", "not_found", "deleted", "not_found"]
+        assert manager.get_snippet(first.id) is None
+        with db.get_session() as session:
+            for model in (SnippetDB, SnippetVariableDB, SnippetTagDB, SnippetVersionDB, SnippetVersionVariableDB):
+                assert session.query(model).count() == 0
+
+    def test_bulk_set_enabled_and_category(self, manager, db):
+        """Test cambios de columna por IDs: solo cuentan (y se versionan) los que cambian."""
+        first = manager.create_snippet(Snippet(name="Uno", category="A"))
+        second = manager.create_snippet(Snippet(name="Dos", category="B", enabled=False))
+
+        result = manager.bulk_set_enabled(False, snippet_ids=[first.id, second.id, "no-existe"], versioned=True)
+
+        assert result == {"matched": 2, "changed": 1}
+        assert manager.get_snippet(first.id).enabled is False
+        (version,) = manager.get_snippet_versions(first.id)
+        assert (version.enabled, version.change_reason) == (True, "Deshabilitado en bloque")
+        assert manager.get_snippet_versions(second.id) == []
+
+        assert manager.bulk_set_category("C", snippet_ids=[first.id, second.id]) == {"matched": 2, "changed": 2}
+        assert {s.category for s in manager.search_snippets("", enabled_only=False)} == {"C"}
+        assert manager.bulk_set_category(None, snippet_ids=[first.id])["changed"] == 1
+        assert manager.get_snippet(first.id).category is None
+
+    def test_bulk_by_filter(self, manager):
+        """Test que ``where`` elige con los filtros de search_snippets (incluidos deshabilitados)."""
+        work = manager.create_snippet(Snippet(name="Firma trabajo", tags=["work"], enabled=False))
+        manager.create_snippet(Snippet(name="Firma casa", tags=["home"]))
+
+        assert manager.bulk_set_enabled(True, where={"tags": ["work"]}) == {"matched": 1, "changed": 1}
+        assert manager.get_snippet(work.id).enabled is True
+        assert manager.bulk_set_category("Firmas", where={"query": "Firma"})["changed"] == 2
+
+        with pytest.raises(ValueError):
+            manager.bulk_set_enabled(True)
+        with pytest.raises(ValueError):
+            manager.bulk_set_enabled(True, snippet_ids=[work.id], where={})
+
+    def test_bulk_tags(self, manager, db):
+        """Test añadir y quitar tags: CSV y filas de snippet_tags coherentes."""
+        first = manager.create_snippet(Snippet(name="Uno", tags=["a"]))
+        second = manager.create_snippet(Snippet(name="Dos", tags=["a", "b"]))
+
+        assert manager.bulk_add_tags(["b", "c"], snippet_ids=[first.id, second.id]) == {"matched": 2, "changed": 2}
+        assert manager.get_snippet(first.id).tags == ["a", "b", "c"]
+        assert manager.get_snippet(second.id).tags == ["a", "b", "c"]
+        assert manager.bulk_add_tags(["c"], snippet_ids=[first.id])["changed"] == 0
+
+        assert manager.bulk_remove_tags(["a"], where={"tags": ["b"]}, versioned=True)["changed"] == 2
+        assert manager.search_snippets("", tags=["a"]) == []
+        assert {s.id for s in manager.search_snippets("", tags=["c"])} == {first.id, second.id}
+        (version,) = manager.get_snippet_versions(first.id)
+        assert (version.tags, version.change_reason) == (["a", "b", "c"], "Tags quitados en bloque: a")
+        with db.get_session() as session:
+            rows = session.query(SnippetTagDB.tag, SnippetTagDB.snippet_id).all()
+        assert sorted(rows) == sorted((tag, s) for s in (first.id, second.id) for tag in ("b", "c"))
+
+    def test_bulk_mutations_use_few_statements(self, manager, db):
+        """Test que el número de sentencias no crece con el número de snippets."""
+        manager.create_snippets([{"id": f"s{i}", "name": f"S{i}", "tags": ["t"]} for i in range(50)])
+
+        with db.count_statements() as small:
+            manager.bulk_add_tags(["x"], snippet_ids=[f"s{i}" for i in range(5)], versioned=True)
+        with db.count_statements() as large:
+            manager.bulk_add_tags(["y"], snippet_ids=[f"s{i}" for i in range(50)], versioned=True)
+
+        assert large.count == small.count
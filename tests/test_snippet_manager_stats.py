@@ -320,4 +320,26 @@ class TestSnippetManagerStats:
             assert stats["by_day"][day_name] == expected_count
 
         # Verificar que el día más activo es Wednesday
-        assert stats["productivity_metrics"]["most_active_day"] == "Wednesday"
\ No newline at end of file
+        assert stats["productivity_metrics"]["most_active_day"] == "Wednesday"
+
+    def test_get_usage_stats_fixed_statement_count(self, manager, db):
+        """Test que el número de consultas no crece con los snippets más usados."""
+        def add_used_snippets(count):
+            with db.get_session() as session:
+                for i in range(count):
+                    snippet = SnippetDB(name=f"S{i}", content_text="x")
+                    session.add(snippet)
+                    session.flush()
+                    session.add(UsageLogDB(snippet_id=snippet.id, source="desktop"))
+                session.commit()
+
+        add_used_snippets(2)
+        with db.count_statements() as few:
+            manager.get_usage_stats()
+        add_used_snippets(20)
+        with db.count_statements() as many:
+            stats = manager.get_usage_stats()
+
+        assert len(stats["top_snippets"]) == 10
+        assert many.count == few.count
+
@@ -0,0 +1,87 @@
+"""
+Tests para la tabla normalizada de tags.
+"""
+
+import sqlite3
+
+import pytest
+
+from core.database import Database
+from core.models import Snippet, SnippetDB, SnippetTagDB, SnippetVariableDB, parse_tag_csv
+from core.snippet_manager import SnippetManager
+
+
+def test_parse_tag_csv():
+    """Test tags únicos, sin espacios ni vacíos."""
+    assert parse_tag_csv(" email, trabajo,,email ") == ["email", "trabajo"]
+    assert parse_tag_csv(None) == []
+
+
+class TestTagTable:
+    """Tests de snippet_tags y del filtrado por tags."""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Fixture para base de datos vacía."""
+        db = Database(str(tmp_path / "tags.db"))
+        with db.get_session() as session:
+            session.query(SnippetTagDB).delete()
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return db
+
+    @pytest.fixture
+    def manager(self, db):
+        """Gestor con tres snippets etiquetados."""
+        manager = SnippetManager(db)
+        manager.create_snippet(Snippet(name="A", content_text="a", tags=["email", "trabajo"]))
+        manager.create_snippet(Snippet(name="B", content_text="b", tags=["mail"]))
+        manager.create_snippet(Snippet(name="C", content_text="c", tags=["email"], enabled=False))
+        return manager
+
+    def _tag_rows(self, db) -> set[tuple[str, str]]:
+        with db.get_session() as session:
+            return {(row.tag, row.snippet_id) for row in session.query(SnippetTagDB)}
+
+    def test_exact_match_any_and_all(self, manager):
+        """Test que "mail" no coincide con "email" y semántica AND/OR."""
+        names = lambda snippets: sorted(s.name for s in snippets)  # noqa: E731
+
+        assert names(manager.search_snippets("", tags=["mail"])) == ["B"]
+        assert names(manager.search_snippets("", tags=["mail", "trabajo"])) == ["A", "B"]
+        assert names(manager.search_snippets("", tags=["email", "trabajo"], tag_mode="all")) == ["A"]
+        assert names(manager.search_snippets("", tags=["email"], enabled_only=False)) == ["A", "C"]
+        with pytest.raises(ValueError):
+            manager.search_snippets("", tags=["email"], tag_mode="some")
+
+    def test_rows_follow_writes(self, db, manager):
+        """Test que las filas siguen a ediciones y borrados."""
+        snippet = manager.search_snippets("B")[0]
+
+        manager.update_snippet(snippet.id, snippet.model_copy(update={"tags": ["mail", "nuevo"]}))
+        assert {tag for tag, snippet_id in self._tag_rows(db) if snippet_id == snippet.id} == {"mail", "nuevo"}
+
+        manager.delete_snippet(snippet.id)
+        assert all(snippet_id != snippet.id for _, snippet_id in self._tag_rows(db))
+
+    def test_tag_facets(self, manager):
+        """Test recuento por tag en un solo GROUP BY."""
+        assert manager.get_tag_facets() == [
+            {"tag": "email", "count": 2},
+            {"tag": "mail", "count": 1},
+            {"tag": "trabajo", "count": 1},
+        ]
+        assert manager.get_tag_facets(enabled_only=True)[0] == {"tag": "email", "count": 1}
+
+    def test_backfill_existing_database(self, db, manager):
+        """Test que una base de datos sin snippet_tags se rellena desde el CSV."""
+        expected = self._tag_rows(db)
+        db.close()
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute("DROP TABLE snippet_tags")
+
+        reopened = Database(db.db_path)
+
+        assert self._tag_rows(reopened) == expected
+        assert len(SnippetManager(reopened).search_snippets("", tags=["email"], enabled_only=False)) == 2
@@ -338,4 +338,25 @@ Atentamente,
 
         # Verificar cursor al final
         assert cursor_pos > 0
-        assert result[cursor_pos:].strip() == "Atentamente,\nJuan Pérez"
\ No newline at end of file
+        assert result[cursor_pos:].strip() == "Atentamente,\nJuan Pérez"
+
+    def test_import_without_sqlalchemy(self):
+        """Test que TemplateParser se importa sin cargar SQLAlchemy ni Pydantic."""
+        import subprocess
+        import sys
+        from pathlib import Path
+
+        code = (
+            "import sys\n"
+            "from core.template_parser import TemplateParser\n"
+            "assert TemplateParser().parse('{{x}}', {'x': 1}) == '1'\n"
+            "assert 'sqlalchemy' not in sys.modules\n"
+            "assert 'pydantic' not in sys.modules\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, result.stderr
@@ -0,0 +1,188 @@
+"""
+Tests para el historial de versiones con deltas inversos.
+"""
+
+import random
+import sqlite3
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from core.database import Database
+from core.models import Snippet, SnippetDB, SnippetVariable, SnippetVariableDB, SnippetVersionDB, SnippetVersionVariableDB
+from core.snippet_manager import SnippetManager
+from core.versions import (
+    DELTA_COLUMNS, KEYFRAME_INTERVAL, VersionRetention, apply_delta, diff_text, encode_history, make_delta,
+    patch_text,
+)
+
+
+def _state(**values):
+    state = {column: None for column in DELTA_COLUMNS}
+    state["variables"] = []
+    state.update(values)
+    return state
+
+
+def test_diff_text_roundtrip():
+    """Test que patch_text(base, diff_text(base, target)) devuelve target."""
+    rng = random.Random(3)
+    words = ["hola", "{{nombre}}", "\n", "  ", "<p>", "</p>", "adiós", "€"]
+    for _ in range(200):
+        base = "".join(rng.choice(words) + rng.choice(["", " "]) for _ in range(rng.randint(0, 30)))
+        target = "".join(rng.choice(words) + rng.choice(["", " "]) for _ in range(rng.randint(0, 30)))
+        assert patch_text(base, diff_text(base, target)) == target
+
+
+def test_make_and_apply_delta():
+    """Test que el delta guarda solo lo que cambia y reconstruye la versión."""
+    body = "Estimado cliente,\n" + "texto largo del cuerpo " * 50
+    base = _state(content_text=body + "Saludos", enabled=True, tags="a,b",
+                  variables=[{"id": "x", "key": "nombre", "label": "Nombre"}])
+    state = _state(content_text=body + "Un saludo", enabled=True, tags="a",
+                   variables=[{"id": "y", "key": "nombre", "label": "Nombre"}])
+
+    delta = make_delta(state, base)
+
+    assert delta["set"] == {"tags": "a"}
+    assert list(delta["patch"]) == ["content_text"]
+    assert "variables" not in delta  # Los IDs no cuentan como cambio
+    rebuilt = apply_delta(base, delta)
+    assert {column: rebuilt[column] for column in DELTA_COLUMNS} == {column: state[column] for column in DELTA_COLUMNS}
+    assert [var["key"] for var in rebuilt["variables"]] == ["nombre"]
+
+
+def test_encode_history_keyframes():
+    """Test que la más reciente y una de cada KEYFRAME_INTERVAL quedan completas."""
+    states = [_state(name=str(index), content_text=f"v{index}") for index in range(2 * KEYFRAME_INTERVAL + 1)]
+    encoded = encode_history(states)
+    assert [position for position, delta in enumerate(encoded) if delta is None] == [
+        0, KEYFRAME_INTERVAL, 2 * KEYFRAME_INTERVAL,
+    ]
+
+
+def test_retention_keep():
+    """Test últimas N, recientes enteras y una por día/semana de las antiguas."""
+    now = datetime(2026, 3, 20, 12, tzinfo=UTC)
+    versions = [
+        (10, now - timedelta(days=1)),
+        (9, now - timedelta(days=9, hours=1)),
+        (8, now - timedelta(days=9, hours=2)),  # Mismo día que la 9
+        (7, now - timedelta(days=10)),
+        (6, (now - timedelta(days=60)).replace(tzinfo=None)),  # Sin zona, como las devuelve SQLite
+        (5, now - timedelta(days=60, hours=1)),  # Misma semana que la 6
+        (4, now - timedelta(days=100)),
+    ]
+    retention = VersionRetention(keep_last=1, daily_after_days=7, weekly_after_days=30)
+
+    assert retention.keep(versions, now) == {10, 9, 7, 6, 4}
+    assert VersionRetention(keep_last=0).keep(versions, now) == {number for number, _ in versions}
+
+
+def test_retention_from_settings():
+    """Test lectura de la política desde la configuración."""
+    settings = {"version_keep_last": "5", "version_daily_after_days": "x"}
+    retention = VersionRetention.from_settings(lambda key, default: settings.get(key, default))
+    assert retention == VersionRetention(keep_last=5)
+
+
+class TestManagerVersions:
+    """Tests de la compactación del historial en SnippetManager."""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        """Fixture para base de datos vacía en disco."""
+        db = Database(str(tmp_path / "versions.db"))
+        with db.get_session() as session:
+            session.query(SnippetVariableDB).delete()
+            session.query(SnippetDB).delete()
+            session.commit()
+        return db
+
+    @pytest.fixture
+    def manager(self, db):
+        """Fixture para SnippetManager."""
+        return SnippetManager(db)
+
+    def _edit(self, manager, snippet_id, count):
+        for index in range(count):
+            current = manager.get_snippet(snippet_id)
+            variables = [SnippetVariable(key="nombre", label=f"Nombre {index % 3}")]
+            manager.update_snippet(snippet_id, current.model_copy(update={
+                "content_text": "Hola {{nombre}}, " + "texto repetido " * 40 + f"versión {index}",
+                "category": f"c{index % 2}",
+                "variables": variables,
+            }))
+
+    def test_compaction_keeps_history(self, manager, db):
+        """Test que el historial compactado se reconstruye igual que se guardó."""
+        created = manager.create_snippet(Snippet(name="Firma", content_text="Hola"))
+        count = 2 * KEYFRAME_INTERVAL
+        self._edit(manager, created.id, count)
+        manager.wait_for_version_compaction()
+
+        versions = manager.get_snippet_versions(created.id)
+
+        assert [v.version_number for v in versions] == list(range(count, 0, -1))
+        assert versions[-1].content_text == "Hola" and versions[-1].variables == []
+        for version in versions[:-1]:
+            index = version.version_number - 2
+            assert version.content_text.endswith(f"versión {index}")
+            assert version.category == f"c{index % 2}"
+            assert [(var.key, var.label) for var in version.variables] == [("nombre", f"Nombre {index % 3}")]
+        with db.get_session() as session:
+            assert session.query(SnippetVersionDB).filter(SnippetVersionDB.delta.is_(None)).count() == 2
+            deltas = session.query(SnippetVersionDB.content_text).filter(SnippetVersionDB.delta.isnot(None)).all()
+            assert deltas == [(None,)] * (count - 2)
+            assert session.query(SnippetVersionVariableDB).count() == 2
+        assert manager.compact_versions(retention=VersionRetention(keep_last=0)) == {
+            "snippets": 1, "deleted": 0, "rewritten": 0,
+        }
+
+    def test_background_compaction_and_restore(self, manager, db):
+        """Test que las versiones nuevas se compactan solas y se restauran desde un delta."""
+        created = manager.create_snippet(Snippet(name="Firma", content_text="Hola", tags=["a"]))
+        self._edit(manager, created.id, 4)
+        manager.wait_for_version_compaction()
+
+        with db.get_session() as session:
+            first = session.query(SnippetVersionDB).filter_by(snippet_id=created.id, version_number=2).one()
+            assert first.delta is not None
+
+        restored = manager.restore_snippet_version(created.id, first.id)
+
+        assert restored.content_text.endswith("versión 0")
+        assert (restored.category, restored.tags) == ("c0", ["a"])
+        assert [(var.key, var.label) for var in restored.variables] == [("nombre", "Nombre 0")]
+
+    def test_retention_drops_and_reencodes(self, manager, db):
+        """Test que la retención borra versiones y las que quedan se siguen reconstruyendo."""
+        created = manager.create_snippet(Snippet(name="Firma", content_text="Hola"))
+        self._edit(manager, created.id, 6)
+        manager.wait_for_version_compaction()
+        expected = manager.get_snippet_versions(created.id)[:3]
+        old = datetime.now(UTC) - timedelta(days=60)
+        with db.get_session() as session:
+            session.query(SnippetVersionDB).filter(SnippetVersionDB.version_number <= 3).update({"created_at": old})
+            session.commit()
+
+        stats = manager.compact_versions([created.id], VersionRetention(keep_last=3))
+
+        assert stats["deleted"] == 2  # De las 3 antiguas (misma semana) queda la última
+        versions = manager.get_snippet_versions(created.id)
+        assert [v.version_number for v in versions] == [6, 5, 4, 3]
+        assert [v.content_text for v in versions[:3]] == [v.content_text for v in expected]
+
+    def test_legacy_schema_gets_delta_column(self, tmp_path):
+        """Test que una base de datos anterior recibe la columna delta."""
+        path = str(tmp_path / "legacy.db")
+        Database(path).get_session().close()
+        with sqlite3.connect(path) as connection:
+            connection.execute("ALTER TABLE snippet_versions DROP COLUMN delta")
+
+        db = Database(path)
+        db.get_session().close()
+
+        with sqlite3.connect(path) as connection:
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(snippet_versions)")}
+        assert "delta" in columns